@@ -5,6 +5,7 @@ Uses DBSCAN machine learning algorithm to cluster nearby delivery locations
 from sklearn.cluster import DBSCAN
 import numpy as np
 from geopy.distance import geodesic
+from utils.distance import EARTH_RADIUS_KM, distances_between
 
 class DemandClusterer:
     """
@@ -12,21 +13,36 @@ class DemandClusterer:
     This is a real machine learning algorithm that finds dense regions in space
     """
     
-    def __init__(self, max_distance_km=2.0, min_cluster_size=2):
+    # 'euclidean': DBSCAN on raw lat/lng degrees (fast, distorted away from the equator)
+    # 'haversine': DBSCAN on radians with great-circle distance and a BallTree index
+    METRICS = ('euclidean', 'haversine')
+    
+    def __init__(self, max_distance_km=2.0, min_cluster_size=2, metric='euclidean',
+                 exact_radius=False):
         """
         Initialize the clusterer
         
         Args:
             max_distance_km (float): Maximum distance between points in a cluster
             min_cluster_size (int): Minimum number of points to form a cluster
+            metric (str): 'euclidean' or 'haversine' (see METRICS)
+            exact_radius (bool): Measure cluster radii with geopy's ellipsoidal
+                geodesic instead of vectorized haversine (slower, ~0.5% closer)
         """
+        if metric not in self.METRICS:
+            raise ValueError(f"metric must be one of {', '.join(self.METRICS)}")
+        
         self.max_distance_km = max_distance_km
         self.min_cluster_size = min_cluster_size
+        self.metric = metric
+        self.exact_radius = exact_radius
         
         # Convert km to approximate degrees (rough conversion: 1 degree ≈ 111 km)
         self.epsilon_degrees = max_distance_km / 111.0
+        # Exact conversion to an angle on the sphere for the haversine metric
+        self.epsilon_radians = max_distance_km / EARTH_RADIUS_KM
     
-    def cluster_deliveries(self, locations):
+    def cluster_deliveries(self, locations, labels=None):
         """
         Cluster delivery locations using DBSCAN machine learning algorithm
         
@@ -36,6 +52,8 @@ class DemandClusterer:
                     {'lat': 35.7796, 'lng': -78.6382, 'group_id': 1, 'group_name': 'Pizza Lovers'},
                     {'lat': 35.7806, 'lng': -78.6392, 'group_id': 2, 'group_name': 'Sushi Station'}
                 ]
+            labels (array-like): DBSCAN labels from fit_labels() for these same
+                locations (e.g. from a cache); skips the DBSCAN fit
         
         Returns:
             list: Clusters with grouped locations and metadata
@@ -65,51 +83,106 @@ class DemandClusterer:
         # Extract coordinates for DBSCAN
         coords = np.array([[loc['lat'], loc['lng']] for loc in locations])
         
+        if labels is None:
+            labels = self._fit(coords)
+        
+        return self._build_clusters(locations, coords, np.asarray(labels))
+    
+    def fit_labels(self, locations):
+        """
+        Run DBSCAN only, returning one cluster label per location (-1 for noise)
+        
+        Args:
+            locations (list): Location dicts as for cluster_deliveries()
+        
+        Returns:
+            ndarray: Labels aligned with locations
+        """
+        return self._fit(np.array([[loc['lat'], loc['lng']] for loc in locations]))
+    
+    def _fit(self, coords):
         # Apply DBSCAN machine learning clustering
         # eps: maximum distance between two samples for them to be in same cluster
         # min_samples: minimum number of samples in a cluster
-        clustering = DBSCAN(
-            eps=self.epsilon_degrees,
-            min_samples=self.min_cluster_size,
-            metric='euclidean'
-        ).fit(coords)
+        clustering = self._dbscan().fit(
+            np.radians(coords) if self.metric == 'haversine' else coords
+        )
+        return clustering.labels_
+    
+    def _build_clusters(self, locations, coords, labels):
+        """
+        Group locations by DBSCAN label and compute each cluster's centroid and radius
         
-        # Group locations by cluster label
-        clusters_dict = {}
-        for idx, label in enumerate(clustering.labels_):
-            if label not in clusters_dict:
-                clusters_dict[label] = []
-            clusters_dict[label].append(locations[idx])
+        Centroids and radii are computed in one vectorized pass over coords;
+        clusters are returned in order of first appearance of their label.
         
-        # Build result with cluster metadata
-        result = []
-        for label, group_locs in clusters_dict.items():
-            # Calculate cluster center (centroid)
-            center_lat = np.mean([loc['lat'] for loc in group_locs])
-            center_lng = np.mean([loc['lng'] for loc in group_locs])
-            
-            # Calculate cluster radius (max distance from center)
-            radius_km = self._calculate_cluster_radius(
-                (center_lat, center_lng),
-                group_locs
+        Args:
+            locations (list): Location dicts, aligned with coords
+            coords (ndarray): (n, 2) array of [lat, lng] in degrees
+            labels (ndarray): DBSCAN labels, -1 for noise
+        
+        Returns:
+            list: Cluster dicts as documented in cluster_deliveries()
+        """
+        unique_labels, first_seen, inverse = np.unique(
+            labels, return_index=True, return_inverse=True
+        )
+        counts = np.bincount(inverse)
+        center_lats = np.bincount(inverse, weights=coords[:, 0]) / counts
+        center_lngs = np.bincount(inverse, weights=coords[:, 1]) / counts
+        
+        # Split location indices into per-cluster runs
+        members = np.split(np.argsort(inverse, kind='stable'), np.cumsum(counts)[:-1])
+        
+        if self.exact_radius:
+            radii = [
+                self._calculate_cluster_radius(
+                    (center_lats[k], center_lngs[k]),
+                    [locations[i] for i in members[k]]
+                )
+                for k in range(len(unique_labels))
+            ]
+        else:
+            # Distance from every point to its own cluster's centroid, then max per cluster
+            distances = distances_between(
+                coords[:, 0], coords[:, 1], center_lats[inverse], center_lngs[inverse]
             )
-            
-            cluster_info = {
-                'cluster_id': int(label),
-                'groups': group_locs,
+            radii = np.zeros(len(unique_labels))
+            np.maximum.at(radii, inverse, distances)
+        
+        result = []
+        for k in np.argsort(first_seen):
+            label = int(unique_labels[k])
+            result.append({
+                'cluster_id': label,
+                'groups': [locations[i] for i in members[k]],
                 'center': {
-                    'lat': float(center_lat),
-                    'lng': float(center_lng)
+                    'lat': float(center_lats[k]),
+                    'lng': float(center_lngs[k])
                 },
-                'size': len(group_locs),
-                'radius_km': round(radius_km, 2),
+                'size': int(counts[k]),
+                'radius_km': round(float(radii[k]), 2),
                 'is_noise': label == -1  # DBSCAN marks outliers as -1
-            }
-            
-            result.append(cluster_info)
+            })
         
         return result
     
+    def _dbscan(self):
+        """Build the DBSCAN estimator for the configured metric"""
+        if self.metric == 'haversine':
+            # Expects [lat, lng] in radians; eps is an angle, i.e. km / earth radius
+            return DBSCAN(
+                eps=self.epsilon_radians,
+                min_samples=self.min_cluster_size,
+                metric='haversine',
+                algorithm='ball_tree'
+            )
+        return DBSCAN(
+            eps=self.epsilon_degrees,
+            min_samples=self.min_cluster_size,
+            metric='euclidean'
+        )
+    
     def _calculate_cluster_radius(self, center, locations):
         """
         Calculate the radius of a cluster (max distance from center to any point)
@@ -0,0 +1,219 @@
+"""
+Learned ETA Model
+Fits per-restaurant prep times, an hour-of-week travel pace curve and a
+per-stop cost from recorded deliveries
+"""
+import os
+from datetime import timezone
+
+import numpy as np
+from scipy import sparse
+from sklearn.linear_model import Ridge
+
+HOURS_PER_WEEK = 168
+
+# Where the trained artifact lives unless ETA_MODEL_PATH says otherwise
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'artifacts', 'eta_model.npz')
+
+
+def hour_of_week(dt):
+    """
+    Slot 0-167 for a datetime's own wall-clock time: Monday 00:00 is 0, Sunday 23:00 is 167
+
+    The same slots as TrafficTable, so pass times in the delivery's local
+    zone; rush hour follows local time, not UTC.
+    """
+    return dt.weekday() * 24 + dt.hour
+
+
+def local_hour_of_week(dt, tz=None):
+    """
+    hour_of_week() of a stored timestamp, read in the zone tz
+
+    Args:
+        dt (datetime): Timestamp; naive values are taken as UTC
+        tz (tzinfo): Zone of the deliveries (default: the server's local zone)
+    """
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return hour_of_week(dt.astimezone(tz))
+
+
+class LearnedETAModel:
+    """
+    ETA model fitted from delivery history
+
+    Splits a delivery into the same three parts as ETAPredictor:
+        prep   = prep minutes for the restaurant (shrunk towards the global mean)
+        travel = distance_km * pace[hour_of_week]  (minutes per km)
+        stops  = num_stops * stop_mins
+    Inference is plain NumPy indexing, so it is cheap for single and batch calls.
+    """
+
+    def __init__(self, default_prep_mins, restaurant_ids, restaurant_prep_mins,
+                 pace_mins_per_km, stop_mins, samples=0):
+        """
+        Args:
+            default_prep_mins (float): Prep time for restaurants without history
+            restaurant_ids (array-like): Restaurant ids with a fitted prep time
+            restaurant_prep_mins (array-like): Prep minutes aligned with restaurant_ids
+            pace_mins_per_km (array-like): 168 travel paces, one per hour of the week
+            stop_mins (float): Minutes added per delivery stop
+            samples (int): Number of deliveries the model was fitted on
+        """
+        order = np.argsort(np.asarray(restaurant_ids, dtype=np.int64))
+        self.default_prep_mins = float(default_prep_mins)
+        self.restaurant_ids = np.asarray(restaurant_ids, dtype=np.int64)[order]
+        self.restaurant_prep_mins = np.asarray(restaurant_prep_mins, dtype=np.float64)[order]
+        self.pace_mins_per_km = np.asarray(pace_mins_per_km, dtype=np.float64)
+        self.stop_mins = float(stop_mins)
+        self.samples = int(samples)
+
+        if self.pace_mins_per_km.shape != (HOURS_PER_WEEK,):
+            raise ValueError(f"pace_mins_per_km must have {HOURS_PER_WEEK} entries")
+
+    @classmethod
+    def fit(cls, restaurant_ids, prep_mins, distances_km, num_stops, hours_of_week, travel_mins,
+            alpha=1.0, prior_weight=5):
+        """
+        Fit the model from delivery history (one entry per delivery in every array)
+
+        Args:
+            restaurant_ids (array-like): Restaurant id per delivery (None allowed)
+            prep_mins (array-like): Minutes from order to pickup
+            distances_km (array-like): Delivery distance
+            num_stops (array-like): Stops on the run
+            hours_of_week (array-like): hour_of_week() of the pickup
+            travel_mins (array-like): Minutes from pickup to delivery
+            alpha (float): Ridge penalty pulling each hour's pace towards the overall pace
+            prior_weight (int): Pseudo-deliveries at the global mean added to each
+                restaurant's prep average
+
+        Returns:
+            LearnedETAModel
+        """
+        prep = np.asarray(prep_mins, dtype=np.float64)
+        distances = np.asarray(distances_km, dtype=np.float64)
+        stops = np.asarray(num_stops, dtype=np.float64)
+        slots = np.asarray(hours_of_week, dtype=np.int64)
+        travel = np.asarray(travel_mins, dtype=np.float64)
+        n = len(prep)
+        if n == 0:
+            raise ValueError("No deliveries to fit")
+
+        # Prep: per-restaurant means shrunk towards the global mean
+        default_prep = prep.mean()
+        rids = np.array([-1 if r is None else r for r in restaurant_ids], dtype=np.int64)
+        known = rids >= 0
+        ids, inverse = np.unique(rids[known], return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(ids))
+        sums = np.bincount(inverse, weights=prep[known], minlength=len(ids))
+        restaurant_prep = (sums + prior_weight * default_prep) / (counts + prior_weight)
+
+        # Travel: minutes ~ distance * (pace + pace_delta[slot]) + stops * stop_cost.
+        # The penalty keeps sparse hours close to the overall pace.
+        rows = np.arange(n)
+        features = sparse.hstack([
+            sparse.csr_matrix(distances[:, None]),
+            sparse.csr_matrix((distances, (rows, slots)), shape=(n, HOURS_PER_WEEK)),
+            sparse.csr_matrix(stops[:, None]),
+        ]).tocsr()
+        ridge = Ridge(alpha=alpha, fit_intercept=False).fit(features, travel)
+        coef = ridge.coef_
+        pace = np.clip(coef[0] + coef[1:1 + HOURS_PER_WEEK], 0.0, None)
+        stop_mins = max(coef[-1], 0.0)
+
+        return cls(default_prep, ids, restaurant_prep, pace, stop_mins, samples=n)
+
+    @classmethod
+    def fit_from_records(cls, records, tz=None, **fit_kwargs):
+        """
+        Fit from delivery records, skipping incomplete or out-of-order ones
+
+        Args:
+            records (iterable): (restaurant_id, distance_km, num_stops, ordered_at,
+                picked_up_at, delivered_at) tuples, e.g. rows of the deliveries table
+            tz (tzinfo): Local zone of the deliveries; pickups are bucketed by
+                their wall-clock hour there (default: the server's local zone)
+            **fit_kwargs: Passed to fit()
+
+        Returns:
+            LearnedETAModel
+        """
+        columns = ([], [], [], [], [], [])
+        for restaurant_id, distance_km, num_stops, ordered_at, picked_up_at, delivered_at in records:
+            if picked_up_at is None or delivered_at is None or distance_km is None:
+                continue
+            prep = (picked_up_at - ordered_at).total_seconds() / 60
+            travel = (delivered_at - picked_up_at).total_seconds() / 60
+            if prep < 0 or travel < 0:
+                continue
+            for column, value in zip(columns, (
+                restaurant_id, prep, distance_km, num_stops or 1, local_hour_of_week(picked_up_at, tz), travel
+            )):
+                column.append(value)
+        return cls.fit(*columns, **fit_kwargs)
+
+    def predict_components(self, restaurant_ids, distances_km, num_stops, hours_of_week):
+        """
+        Predict prep, travel and stop minutes for a batch of trips
+
+        Args:
+            restaurant_ids (array-like or None): Restaurant per trip; None/-1 or
+                unknown ids use the default prep time
+            distances_km, num_stops, hours_of_week (array-like): Broadcastable per-trip inputs
+
+        Returns:
+            tuple: (prep_mins, travel_mins, stop_mins) float64 arrays
+        """
+        distances = np.asarray(distances_km, dtype=np.float64)
+        stops = np.broadcast_to(np.asarray(num_stops, dtype=np.float64), distances.shape)
+        slots = np.broadcast_to(np.asarray(hours_of_week, dtype=np.int64), distances.shape)
+
+        prep = np.full(distances.shape, self.default_prep_mins)
+        if restaurant_ids is not None and len(self.restaurant_ids):
+            rids = np.broadcast_to(
+                np.array([-1 if r is None else r for r in np.atleast_1d(restaurant_ids)],
+                         dtype=np.int64),
+                distances.shape
+            )
+            pos = np.clip(np.searchsorted(self.restaurant_ids, rids), 0, len(self.restaurant_ids) - 1)
+            found = self.restaurant_ids[pos] == rids
+            prep = np.where(found, self.restaurant_prep_mins[pos], prep)
+
+        travel = distances * self.pace_mins_per_km[slots % HOURS_PER_WEEK]
+        return prep, travel, stops * self.stop_mins
+
+    def traffic_factor(self, hour_slot):
+        """Pace in one hour-of-week slot relative to the median hour (1.0 = typical)"""
+        typical = np.median(self.pace_mins_per_km)
+        if typical <= 0:
+            return 1.0
+        return float(self.pace_mins_per_km[hour_slot % HOURS_PER_WEEK] / typical)
+
+    def save(self, path):
+        """Write the model as a plain .npz artifact (no pickled objects)"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                default_prep_mins=self.default_prep_mins,
+                restaurant_ids=self.restaurant_ids,
+                restaurant_prep_mins=self.restaurant_prep_mins,
+                pace_mins_per_km=self.pace_mins_per_km,
+                stop_mins=self.stop_mins,
+                samples=self.samples,
+            )
+
+    @classmethod
+    def load(cls, path):
+        """Read an artifact written by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                default_prep_mins=data['default_prep_mins'],
+                restaurant_ids=data['restaurant_ids'],
+                restaurant_prep_mins=data['restaurant_prep_mins'],
+                pace_mins_per_km=data['pace_mins_per_km'],
+                stop_mins=data['stop_mins'],
+                samples=data['samples'],
+            )
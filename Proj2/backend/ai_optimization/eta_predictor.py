@@ -2,18 +2,54 @@
 ETA Predictor Module
 Predicts delivery ETAs based on distance, stops, and traffic conditions
 """
-from datetime import datetime, timedelta
+import os
+from datetime import datetime
+import numpy as np
+from ai_optimization.eta_model import DEFAULT_MODEL_PATH, LearnedETAModel, hour_of_week
+from ai_optimization.traffic import TrafficTable
 
 class ETAPredictor:
     """Predicts delivery ETAs using distance and traffic factors"""
     
-    def __init__(self):
-        # Configuration constants
+    def __init__(self, model=None, traffic_table=None):
+        """
+        Args:
+            model (LearnedETAModel): Trained model to use; None keeps the
+                constant model below
+            traffic_table (TrafficTable): Hour-of-week factors for the constant
+                model; defaults to $TRAFFIC_TABLE_PATH or the built-in rush hours
+        """
+        # Configuration constants (the fallback model)
         self.base_speed_kmh = 25  # Average delivery speed in km/h
         self.prep_time_mins = 15   # Restaurant preparation time
         self.stop_time_mins = 3    # Time per delivery stop
+        self.model = model
+        self.traffic_table = traffic_table or TrafficTable.from_env()
+    
+    @classmethod
+    def from_artifact(cls, path=None):
+        """
+        Build a predictor from a trained model artifact if one is available
+        
+        Args:
+            path (str): Artifact path; defaults to $ETA_MODEL_PATH or DEFAULT_MODEL_PATH
+        
+        Returns:
+            ETAPredictor: Learned model if the artifact loads, constant model otherwise
+        """
+        path = path or os.getenv('ETA_MODEL_PATH', DEFAULT_MODEL_PATH)
+        try:
+            return cls(LearnedETAModel.load(path))
+        except (OSError, KeyError, ValueError):
+            return cls()
+    
+    @property
+    def model_source(self):
+        """'learned' when a trained model is loaded, else 'constant'"""
+        return 'learned' if self.model is not None else 'constant'
     
-    def predict_eta(self, distance_km, num_stops=1, traffic_factor=1.0):
+    def predict_eta(self, distance_km, num_stops=1, traffic_factor=1.0, restaurant_id=None,
+                    when=None, time_of_day=False):
         """
         Predict delivery ETA
         
@@ -21,89 +57,118 @@ class ETAPredictor:
             distance_km (float): Total delivery distance in kilometers
             num_stops (int): Number of delivery stops
             traffic_factor (float): Traffic multiplier (1.0 = normal, >1.0 = slower)
+            restaurant_id (int): Restaurant preparing the order (learned model only)
+            when (datetime): Pickup time, timezone-aware in the delivery's local
+                zone; defaults to now in the server's zone
+            time_of_day (bool): Apply the hour-of-week traffic factor for `when`
+                (rush hours) and report it as adjusted_for_rush_hour
         
         Returns:
             dict: ETA information including time, breakdown, and confidence
         """
-        # Calculate travel time accounting for traffic
-        travel_time_hours = (distance_km / self.base_speed_kmh) * traffic_factor
-        travel_time_mins = travel_time_hours * 60
+        return self.predict_eta_batch(
+            [distance_km], [num_stops], [traffic_factor], restaurant_ids=[restaurant_id],
+            when=when, time_of_day=time_of_day
+        )[0]
+    
+    def predict_components(self, distances_km, num_stops=1, traffic_factors=1.0,
+                           restaurant_ids=None, when=None, time_of_day=False):
+        """
+        Unrounded prep, travel and stop minutes for many trips
         
-        # Calculate total time
-        total_time_mins = (
-            self.prep_time_mins + 
-            travel_time_mins + 
-            (num_stops * self.stop_time_mins)
-        )
+        Same inputs as predict_eta_batch(); used directly by callers that need
+        raw minutes (e.g. travel times between every pair of route stops).
+        
+        Returns:
+            tuple: (prep_mins, travel_mins, stop_mins, time_of_day_factor); the
+                first three are float64 arrays shaped like distances_km
+        """
+        distances = np.asarray(distances_km, dtype=np.float64)
+        stops = np.broadcast_to(np.asarray(num_stops, dtype=np.int64), distances.shape)
+        factors = np.broadcast_to(np.asarray(traffic_factors, dtype=np.float64), distances.shape)
         
-        # Calculate ETA timestamp
-        eta_time = datetime.now() + timedelta(minutes=total_time_mins)
+        when = when or datetime.now().astimezone()
+        time_factor = 1.0
         
-        return {
-            'eta': eta_time.isoformat(),
-            'total_minutes': int(total_time_mins),
-            'breakdown': {
-                'prep_time': self.prep_time_mins,
-                'travel_time': int(travel_time_mins),
-                'stop_time': num_stops * self.stop_time_mins
-            },
-            'confidence': 'high' if traffic_factor == 1.0 else 'medium',
-            'traffic_status': self._get_traffic_status(traffic_factor)
-        }
-    
-    def _get_traffic_status(self, traffic_factor):
-        """Convert traffic factor to human-readable status"""
-        if traffic_factor <= 1.0:
-            return 'normal'
-        elif traffic_factor <= 1.3:
-            return 'moderate'
+        if self.model is None:
+            if time_of_day:
+                time_factor = self.traffic_table.factor_at(when)
+            prep_mins = np.full(distances.shape, float(self.prep_time_mins))
+            travel_mins = distances / self.base_speed_kmh * factors * time_factor * 60
+            stop_mins = stops * float(self.stop_time_mins)
         else:
-            return 'heavy'
+            # The learned pace is already specific to the hour of the week;
+            # its ratio to a typical hour is only reported
+            slot = hour_of_week(when)
+            prep_mins, travel_mins, stop_mins = self.model.predict_components(
+                restaurant_ids, distances, stops, slot
+            )
+            travel_mins = travel_mins * factors
+            if time_of_day:
+                time_factor = self.model.traffic_factor(slot)
+        return prep_mins, travel_mins, stop_mins, time_factor
     
-    def adjust_for_time_of_day(self, base_eta, hour=None):
+    def predict_eta_batch(self, distances_km, num_stops=1, traffic_factors=1.0,
+                          restaurant_ids=None, when=None, time_of_day=False):
         """
-        Adjust ETA based on time of day (rush hours)
+        Predict ETAs for many trips at once
+        
+        Evaluated with NumPy over whole arrays; every ETA is measured from a
+        single "now".
         
         Args:
-            base_eta (dict): Base ETA prediction
-            hour (int): Hour of day (0-23), defaults to current hour
+            distances_km (array-like): Delivery distance per trip in kilometers
+            num_stops (int or array-like): Stops per trip (broadcast if scalar)
+            traffic_factors (float or array-like): Traffic multiplier per trip
+            restaurant_ids (array-like): Restaurant per trip (learned model only)
+            when (datetime): Pickup time, as for predict_eta()
+            time_of_day (bool): Apply the hour-of-week traffic factor, as for predict_eta()
         
         Returns:
-            dict: Adjusted ETA with time-of-day factor applied
+            list: One dict per trip, in input order
         """
-        if hour is None:
-            hour = datetime.now().hour
-        
-        # Define rush hour multipliers
-        if 7 <= hour <= 9 or 17 <= hour <= 19:
-            # Morning/evening rush hour
-            traffic_factor = 1.3
-        elif 11 <= hour <= 13:
-            # Lunch rush
-            traffic_factor = 1.2
-        else:
-            # Normal hours
-            traffic_factor = 1.0
-        
-        # Recalculate with traffic factor
-        adjusted_travel = base_eta['breakdown']['travel_time'] * traffic_factor
-        adjusted_total = (
-            base_eta['breakdown']['prep_time'] + 
-            adjusted_travel + 
-            base_eta['breakdown']['stop_time']
+        distances = np.asarray(distances_km, dtype=np.float64)
+        factors = np.broadcast_to(np.asarray(traffic_factors, dtype=np.float64), distances.shape)
+        prep_mins, travel_mins, stop_mins, time_factor = self.predict_components(
+            distances, num_stops, factors, restaurant_ids, when, time_of_day
         )
+        total_mins = prep_mins + travel_mins + stop_mins
+        
+        effective = factors * time_factor
+        now = np.datetime64(datetime.now(), 'us')
+        etas = np.datetime_as_string(now + (total_mins * 60e6).astype('timedelta64[us]'))
+        statuses = np.select([effective <= 1.0, effective <= 1.3], ['normal', 'moderate'], 'heavy')
+        # Time-of-day estimates are never reported as high confidence
+        confidences = np.where((factors == 1.0) & (not time_of_day), 'high', 'medium')
         
-        adjusted_eta_time = datetime.now() + timedelta(minutes=adjusted_total)
+        extra = {}
+        if time_of_day:
+            extra = {
+                'adjusted_for_rush_hour': time_factor > 1.0,
+                'time_of_day_factor': round(time_factor, 2)
+            }
         
-        return {
-            'eta': adjusted_eta_time.isoformat(),
-            'total_minutes': int(adjusted_total),
-            'breakdown': {
-                'prep_time': base_eta['breakdown']['prep_time'],
-                'travel_time': int(adjusted_travel),
-                'stop_time': base_eta['breakdown']['stop_time']
-            },
-            'confidence': 'medium',
-            'traffic_status': self._get_traffic_status(traffic_factor),
-            'adjusted_for_rush_hour': traffic_factor > 1.0
-        }
\ No newline at end of file
+        return [
+            {
+                'eta': eta,
+                'total_minutes': total,
+                'breakdown': {
+                    'prep_time': prep,
+                    'travel_time': travel,
+                    'stop_time': stop
+                },
+                'confidence': confidence,
+                'traffic_status': status,
+                'model': self.model_source,
+                **extra
+            }
+            for eta, total, prep, travel, stop, confidence, status in zip(
+                etas.tolist(),
+                total_mins.astype(np.int64).tolist(),
+                prep_mins.astype(np.int64).tolist(),
+                travel_mins.astype(np.int64).tolist(),
+                np.asarray(stop_mins).astype(np.int64).tolist(),
+                confidences.tolist(),
+                statuses.tolist()
+            )
+        ]
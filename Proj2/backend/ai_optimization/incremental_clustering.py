@@ -0,0 +1,449 @@
+"""
+Incremental Clustering Module
+Keeps DBSCAN clusters of active group locations up to date as groups are
+created, moved or expire, instead of reclustering every location per request
+"""
+import heapq
+import itertools
+import threading
+import time
+
+import numpy as np
+from sklearn.cluster import DBSCAN
+from sklearn.neighbors import BallTree
+
+from utils.distance import EARTH_RADIUS_KM, distances_from
+from utils.spatial_index import KM_PER_DEGREE, GridCellIndex
+
+
+class IncrementalClusterer:
+    """
+    Online DBSCAN over group locations using great-circle (haversine) distance
+
+    Yields the same clusters as DemandClusterer(metric='haversine') run on the
+    same points, up to cluster numbering and the usual DBSCAN ambiguity of a
+    border point within reach of two clusters. load() seeds the state from one
+    batch DBSCAN fit; after that each change only touches the points within
+    reach of the point that changed, and lookups are dict reads.
+    """
+
+    def __init__(self, max_distance_km=2.0, min_cluster_size=2):
+        """
+        Initialize the clusterer
+
+        Args:
+            max_distance_km (float): Maximum distance between points in a cluster
+            min_cluster_size (int): Minimum number of points to form a cluster
+        """
+        self.max_distance_km = max_distance_km
+        self.min_cluster_size = min_cluster_size
+
+        # Cells about one eps wide, so a neighbour search touches ~9 cells
+        self._index = GridCellIndex(cell_size_deg=max(max_distance_km / KM_PER_DEGREE, 0.001))
+        self._lock = threading.RLock()
+        self._journal = None  # (method, args) recorded while load() runs
+        self.clear()
+
+    # Attributes swapped in wholesale by load()
+    _STATE = (
+        '_points', '_names', '_cells', '_counts', '_labels',
+        '_clusters', '_expiry', '_expiry_heap', '_cluster_ids'
+    )
+
+    def clear(self):
+        """Drop all points; loaded is reset so callers know to reload"""
+        with self._lock:
+            self.loaded = False
+            self.loaded_at = None  # time.monotonic() of the last load()
+            self._points = {}      # group_id -> (lat, lng)
+            self._names = {}       # group_id -> group name
+            self._cells = {}       # grid cell key -> set of group_ids
+            self._counts = {}      # group_id -> groups within max_distance_km (excluding itself)
+            self._labels = {}      # group_id -> cluster_id; noise points are absent
+            self._clusters = {}    # cluster_id -> set of group_ids
+            self._expiry = {}      # group_id -> expiry timestamp (epoch seconds)
+            self._expiry_heap = []
+            self._cluster_ids = itertools.count()
+
+    def load(self, groups):
+        """
+        Replace the current state with a full set of points
+
+        Labels come from one batch DBSCAN fit and neighbour counts from one
+        BallTree query, so a load costs about as much as batch clustering.
+        The new state is built without holding the lock and swapped in at the
+        end, so lookups keep answering from the old state in the meantime.
+        Upserts and removes made while groups is being read are replayed onto
+        the new state before the swap, so none are lost to the reload.
+
+        Args:
+            groups (iterable): (group_id, lat, lng, group_name, expires_at) tuples
+        """
+        with self._lock:
+            self._journal = []
+        try:
+            fresh = IncrementalClusterer(self.max_distance_km, self.min_cluster_size)
+            fresh._bulk_load(groups)
+            with self._lock:
+                for method, args in self._journal:
+                    getattr(fresh, method)(*args)
+                for name in self._STATE:
+                    setattr(self, name, getattr(fresh, name))
+                self.loaded = True
+                self.loaded_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._journal = None
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, group_id):
+        return group_id in self._points
+
+    # ------------------- UPDATES -------------------
+
+    def upsert(self, group_id, lat, lng, group_name=None, expires_at=None):
+        """
+        Add a group location or move an existing one
+
+        Args:
+            group_id: Group identifier
+            lat, lng (float): Location in degrees
+            group_name (str): Name reported in cluster listings
+            expires_at (float): Epoch seconds after which expire() drops the group
+        """
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append(('upsert', (group_id, lat, lng, group_name, expires_at)))
+            point = (float(lat), float(lng))
+            previous = self._points.get(group_id)
+            if previous != point:
+                if previous is not None:
+                    self._delete(group_id)
+                self._insert(group_id, point)
+
+            self._names[group_id] = group_name
+            if expires_at is not None and self._expiry.get(group_id) != expires_at:
+                self._expiry[group_id] = expires_at
+                heapq.heappush(self._expiry_heap, (expires_at, group_id))
+            elif expires_at is None:
+                self._expiry.pop(group_id, None)
+
+    def remove(self, group_id):
+        """
+        Drop a group; returns False if it was not tracked
+        """
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append(('remove', (group_id,)))
+            if group_id not in self._points:
+                return False
+            self._delete(group_id)
+            self._names.pop(group_id, None)
+            self._expiry.pop(group_id, None)
+            return True
+
+    def expire(self, now):
+        """
+        Drop every group whose expiry is at or before now
+
+        Args:
+            now (float): Current time in epoch seconds
+
+        Returns:
+            int: Number of groups removed
+        """
+        removed = 0
+        with self._lock:
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                expires_at, group_id = heapq.heappop(self._expiry_heap)
+                # Skip heap entries superseded by a later upsert
+                if self._expiry.get(group_id) == expires_at:
+                    self.remove(group_id)
+                    removed += 1
+        return removed
+
+    # ------------------- LOOKUPS -------------------
+
+    def cluster_id(self, group_id):
+        """
+        Get a group's cluster id: -1 for noise, None if the group is not tracked
+        """
+        if group_id not in self._points:
+            return None
+        return self._labels.get(group_id, -1)
+
+    def labels(self):
+        """Snapshot of group_id -> cluster_id (-1 for noise) for every tracked group"""
+        with self._lock:
+            return {group_id: self._labels.get(group_id, -1) for group_id in self._points}
+
+    def locations(self):
+        """Tracked groups as cluster_deliveries() input dicts, ordered by group_id"""
+        with self._lock:
+            return [
+                {
+                    'lat': self._points[group_id][0],
+                    'lng': self._points[group_id][1],
+                    'group_id': group_id,
+                    'group_name': self._names.get(group_id)
+                }
+                for group_id in sorted(self._points)
+            ]
+
+    def cluster_for(self, group_id):
+        """
+        Get the cluster containing a group, in DemandClusterer.cluster_deliveries() format
+
+        Noise points come back as a single-member cluster with is_noise=True.
+
+        Returns:
+            dict: Cluster info, or None if the group is not tracked
+        """
+        with self._lock:
+            if group_id not in self._points:
+                return None
+            label = self._labels.get(group_id)
+            members = sorted(self._clusters[label]) if label is not None else [group_id]
+
+            coords = np.array([self._points[m] for m in members])
+            center_lat, center_lng = coords.mean(axis=0)
+            radius_km = distances_from(center_lat, center_lng, coords[:, 0], coords[:, 1]).max()
+
+            return {
+                'cluster_id': label if label is not None else -1,
+                'groups': [
+                    {
+                        'lat': self._points[m][0],
+                        'lng': self._points[m][1],
+                        'group_id': m,
+                        'group_name': self._names.get(m)
+                    }
+                    for m in members
+                ],
+                'center': {'lat': float(center_lat), 'lng': float(center_lng)},
+                'size': len(members),
+                'radius_km': round(float(radius_km), 2),
+                'is_noise': label is None
+            }
+
+    # ------------------- INTERNALS -------------------
+
+    def _is_core(self, group_id):
+        # DBSCAN counts the point itself towards min_samples
+        return self._counts[group_id] + 1 >= self.min_cluster_size
+
+    def _bulk_load(self, groups):
+        """Fill an empty clusterer from scratch with one batch DBSCAN fit"""
+        for group_id, lat, lng, group_name, expires_at in groups:
+            self._points[group_id] = (float(lat), float(lng))
+            self._names[group_id] = group_name
+            if expires_at is not None:
+                self._expiry[group_id] = expires_at
+            else:
+                self._expiry.pop(group_id, None)
+        if not self._points:
+            return
+
+        group_ids = list(self._points)
+        coords = np.radians(np.array([self._points[g] for g in group_ids]))
+        eps = self.max_distance_km / EARTH_RADIUS_KM
+        counts = BallTree(coords, metric='haversine').query_radius(coords, eps, count_only=True)
+        labels = DBSCAN(
+            eps=eps,
+            min_samples=self.min_cluster_size,
+            metric='haversine',
+            algorithm='ball_tree'
+        ).fit(coords).labels_
+
+        cluster_ids = {}
+        for group_id, count, label in zip(group_ids, counts.tolist(), labels.tolist()):
+            self._cells.setdefault(self._index.cell_for(*self._points[group_id]), set()).add(group_id)
+            self._counts[group_id] = count - 1  # the query counts the point itself
+            if label != -1:
+                if label not in cluster_ids:
+                    cluster_ids[label] = next(self._cluster_ids)
+                self._set_label(group_id, cluster_ids[label])
+
+        self._expiry_heap = [(expires_at, group_id) for group_id, expires_at in self._expiry.items()]
+        heapq.heapify(self._expiry_heap)
+
+    def _find_neighbors(self, group_id, lat, lng):
+        """Tracked groups within max_distance_km of (lat, lng), excluding group_id"""
+        cells = self._index.cells_within(lat, lng, self.max_distance_km)
+        if cells is None:
+            candidates = [g for g in self._points if g != group_id]
+        else:
+            candidates = [g for cell in cells for g in self._cells.get(cell, ()) if g != group_id]
+        if not candidates:
+            return []
+
+        coords = np.array([self._points[g] for g in candidates])
+        distances = distances_from(lat, lng, coords[:, 0], coords[:, 1])
+        return [g for g, d in zip(candidates, distances) if d <= self.max_distance_km]
+
+    def _set_label(self, group_id, label):
+        self._labels[group_id] = label
+        self._clusters.setdefault(label, set()).add(group_id)
+
+    def _unlabel(self, group_id):
+        label = self._labels.pop(group_id, None)
+        if label is not None:
+            self._clusters[label].discard(group_id)
+            if not self._clusters[label]:
+                del self._clusters[label]
+
+    def _insert(self, group_id, point):
+        """
+        Add a point and update the labels around it
+
+        Only points within reach of the new point can change: it may turn
+        some neighbours into core points, and each new core point either
+        starts a cluster or joins (and merges) the clusters of the core
+        points next to it.
+        """
+        neighbors = self._find_neighbors(group_id, *point)
+        self._points[group_id] = point
+        self._cells.setdefault(self._index.cell_for(*point), set()).add(group_id)
+        self._counts[group_id] = len(neighbors)
+
+        new_cores = [group_id] if self._is_core(group_id) else []
+        for other in neighbors:
+            self._counts[other] += 1
+            if self._counts[other] + 1 == self.min_cluster_size:
+                new_cores.append(other)
+
+        # A new core point's old border label is re-derived from its core neighbours
+        for core in new_cores:
+            self._unlabel(core)
+        for core in new_cores:
+            self._connect_core(core, neighbors if core == group_id else None)
+        if not self._is_core(group_id):
+            self._attach_border(group_id, neighbors)
+
+    def _connect_core(self, group_id, neighbors=None):
+        """Label a core point with the cluster of its core neighbours, merging them if needed"""
+        if neighbors is None:
+            neighbors = self._find_neighbors(group_id, *self._points[group_id])
+
+        labels = {self._labels[g] for g in neighbors if g in self._labels and self._is_core(g)}
+        if labels:
+            # Fold the smaller clusters into the largest one
+            target = max(labels, key=lambda label: len(self._clusters[label]))
+            for label in labels - {target}:
+                for member in self._clusters.pop(label):
+                    self._labels[member] = target
+                    self._clusters[target].add(member)
+        else:
+            target = next(self._cluster_ids)
+        self._set_label(group_id, target)
+
+        # Noise within reach of a core point becomes a border point
+        for other in neighbors:
+            if other not in self._labels and not self._is_core(other):
+                self._set_label(other, target)
+
+    def _attach_border(self, group_id, neighbors=None):
+        """Give a non-core point the cluster of a neighbouring core point, or make it noise"""
+        if neighbors is None:
+            neighbors = self._find_neighbors(group_id, *self._points[group_id])
+
+        labels = {self._labels[g] for g in neighbors if g in self._labels and self._is_core(g)}
+        current = self._labels.get(group_id)
+        if current in labels:
+            return
+        self._unlabel(group_id)
+        if labels:
+            self._set_label(group_id, min(labels))
+
+    def _delete(self, group_id):
+        """
+        Remove a point and update the labels around it
+
+        Neighbours that drop below min_cluster_size stop being core points.
+        A cluster that lost core points is only split if the core points
+        around them can no longer reach each other, which a search from one
+        of them usually confirms within a step or two.
+        """
+        point = self._points.pop(group_id)
+        cell = self._index.cell_for(*point)
+        self._cells[cell].discard(group_id)
+        if not self._cells[cell]:
+            del self._cells[cell]
+
+        neighbors = self._find_neighbors(group_id, *point)
+        was_core = self._is_core(group_id)
+        del self._counts[group_id]
+        label = self._labels.get(group_id)
+        self._unlabel(group_id)
+
+        lost_cores = [group_id] if was_core else []
+        for other in neighbors:
+            self._counts[other] -= 1
+            if self._counts[other] + 2 == self.min_cluster_size:
+                lost_cores.append(other)
+        if not lost_cores:
+            return
+
+        # Core points next to a lost core may have relied on it to stay connected;
+        # non-core points next to one may have relied on it for their label
+        seeds = {}
+        recheck = set()
+        for core in lost_cores:
+            if core == group_id:
+                core_neighbors, core_label = neighbors, label
+            else:
+                core_neighbors, core_label = self._find_neighbors(core, *self._points[core]), self._labels[core]
+                recheck.add(core)
+            for other in core_neighbors:
+                if self._is_core(other):
+                    seeds.setdefault(core_label, set()).add(other)
+                else:
+                    recheck.add(other)
+
+        for core in lost_cores:
+            if core != group_id:
+                self._unlabel(core)
+        for core_label, core_seeds in seeds.items():
+            self._split(core_label, core_seeds)
+        for other in recheck:
+            self._attach_border(other)
+
+    def _split(self, label, seeds):
+        """Give each group of seed core points that can no longer reach each other its own cluster"""
+        remaining = {g for g in seeds if self._labels.get(g) == label}
+        if len(remaining) < 2:
+            return
+
+        cores, _ = self._expand(next(iter(remaining)), stop_when=remaining)
+        remaining -= cores
+        while remaining:
+            cores, borders = self._expand(remaining.pop())
+            remaining -= cores
+            target = next(self._cluster_ids)
+            for core in cores:
+                self._unlabel(core)
+                self._set_label(core, target)
+            for border in borders:
+                self._attach_border(border)
+
+    def _expand(self, start, stop_when=None):
+        """
+        Core points reachable from a core point, and the non-core points next to them
+
+        Stops early once every group in stop_when has been reached.
+        """
+        cores, borders = {start}, set()
+        stack = [start]
+        while stack:
+            current = stack.pop()
+            for other in self._find_neighbors(current, *self._points[current]):
+                if not self._is_core(other):
+                    borders.add(other)
+                elif other not in cores:
+                    cores.add(other)
+                    stack.append(other)
+            if stop_when is not None and stop_when <= cores:
+                break
+        return cores, borders
@@ -0,0 +1,286 @@
+"""
+Location Service
+Caches pairwise distances between restaurants, groups and users so routing
+and other optimizers do not recompute them on every request
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import dijkstra
+from sklearn.neighbors import BallTree
+
+from ai_optimization.eta_predictor import ETAPredictor
+from utils.distance import EARTH_RADIUS_KM, distance_matrix
+
+
+class HaversineProvider:
+    """Great-circle distances; the default provider"""
+
+    symmetric = True
+
+    def distances(self, points_a, points_b):
+        """(n, m) kilometres between (lat, lng) rows of points_a and points_b"""
+        return distance_matrix(points_a, points_b)
+
+
+class RoadGraphProvider:
+    """
+    Shortest-path distances over a local road graph
+
+    Points are snapped to their nearest graph node; the straight-line snap
+    distance at each end is added to the path length. Pairs with no path
+    come back as inf.
+    """
+
+    def __init__(self, node_coords, edges, directed=False):
+        """
+        Args:
+            node_coords (array-like): (n, 2) node (lat, lng) in degrees
+            edges (array-like): (k, 3) rows of (from_node, to_node, length_km)
+            directed (bool): Edges are one-way
+        """
+        self.node_coords = np.asarray(node_coords, dtype=np.float64).reshape(-1, 2)
+        edges = np.asarray(edges, dtype=np.float64).reshape(-1, 3)
+        n = len(self.node_coords)
+        self.graph = sparse.csr_matrix(
+            (edges[:, 2], (edges[:, 0].astype(np.int64), edges[:, 1].astype(np.int64))), shape=(n, n)
+        )
+        self.directed = directed
+        self.symmetric = not directed
+        self._tree = BallTree(np.radians(self.node_coords), metric='haversine')
+
+    def _snap(self, points):
+        """Nearest node and snap distance in km for each (lat, lng) row"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        dist, idx = self._tree.query(np.radians(points), k=1)
+        return idx[:, 0], dist[:, 0] * EARTH_RADIUS_KM
+
+    def distances(self, points_a, points_b):
+        """(n, m) kilometres between (lat, lng) rows of points_a and points_b"""
+        nodes_a, snap_a = self._snap(points_a)
+        nodes_b, snap_b = self._snap(points_b)
+        sources, inverse = np.unique(nodes_a, return_inverse=True)
+        paths = dijkstra(self.graph, directed=self.directed, indices=sources)
+        return paths[inverse][:, nodes_b] + snap_a[:, None] + snap_b[None, :]
+
+
+class LocationService:
+    """
+    Registry of tracked points with a cached float32 distance matrix
+
+    Points are keyed by tuples such as ('user', 7), ('group', 3) or
+    ('restaurant', 1). Matrix rows are filled lazily the first time a point is
+    used as an origin. When a point moves, only its own row and column are
+    recomputed; every other cached distance is kept. Once max_points are
+    tracked, the least recently used point is forgotten to make room.
+    """
+
+    def __init__(self, provider=None, max_points=4096, initial_capacity=64):
+        """
+        Args:
+            provider: Object with distances(points_a, points_b) -> (n, m) km and
+                a symmetric flag; defaults to HaversineProvider
+            max_points (int): Most points kept (the matrix is max_points^2 float32)
+            initial_capacity (int): Starting matrix size; doubles as needed
+        """
+        self.provider = provider or HaversineProvider()
+        self.max_points = max_points
+        self._initial_capacity = min(initial_capacity, max_points)
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Forget every point and cached distance"""
+        with self._lock:
+            capacity = self._initial_capacity
+            self._slots = OrderedDict()  # key -> slot, least recently used first
+            self._free = list(range(capacity - 1, -1, -1))
+            self._coords = np.zeros((capacity, 2), dtype=np.float64)
+            self._matrix = np.zeros((capacity, capacity), dtype=np.float32)
+            self._row_valid = np.zeros(capacity, dtype=bool)
+            self.rows_computed = 0
+            self.columns_recomputed = 0
+            self.evictions = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, key):
+        return key in self._slots
+
+    def set_point(self, key, lat, lng):
+        """
+        Track a point, or move it if it is already tracked
+
+        Returns:
+            bool: True if the point is new or its coordinates changed
+        """
+        with self._lock:
+            return self._set_point(key, lat, lng)
+
+    def remove_point(self, key):
+        """Stop tracking a point (no-op if unknown)"""
+        with self._lock:
+            slot = self._slots.pop(key, None)
+            if slot is not None:
+                self._row_valid[slot] = False
+                self._free.append(slot)
+
+    def point(self, key):
+        """(lat, lng) of a tracked point, or None"""
+        with self._lock:
+            slot = self._slots.get(key)
+            return None if slot is None else tuple(self._coords[slot].tolist())
+
+    def matrix(self, keys_a, keys_b=None):
+        """
+        Distances in km between tracked points
+
+        Args:
+            keys_a (list): Origin keys
+            keys_b (list): Destination keys; defaults to keys_a
+
+        Returns:
+            ndarray: (len(keys_a), len(keys_b)) float32 copy
+
+        Raises:
+            KeyError: If a key is not tracked
+        """
+        with self._lock:
+            return self._matrix_for(keys_a, keys_a if keys_b is None else keys_b)
+
+    def track(self, points):
+        """
+        Track (or move) a set of points and return their distance matrix
+
+        Done under one lock, so concurrent callers cannot evict any of the
+        points between registering them and reading the matrix.
+
+        Args:
+            points (list): (key, lat, lng) tuples
+
+        Returns:
+            ndarray: (n, n) float32 km between the points, in input order
+
+        Raises:
+            ValueError: If there are more points than max_points
+        """
+        if len(points) > self.max_points:
+            raise ValueError(f"At most {self.max_points} points can be tracked at once")
+        with self._lock:
+            for key, lat, lng in points:
+                self._set_point(key, lat, lng)
+            keys = [key for key, _, _ in points]
+            return self._matrix_for(keys, keys)
+
+    def duration_matrix(self, keys_a, keys_b=None, eta_predictor=None, when=None):
+        """
+        Driving minutes between tracked points, from ETAPredictor travel times
+
+        Args:
+            keys_a, keys_b (list): As for matrix()
+            eta_predictor (ETAPredictor): Travel time model; defaults to a new one
+            when (datetime): Departure time for time-of-day factors
+
+        Returns:
+            ndarray: float32 minutes, same shape as matrix()
+        """
+        eta_predictor = eta_predictor or ETAPredictor()
+        distances = self.matrix(keys_a, keys_b)
+        _, travel, _, _ = eta_predictor.predict_components(distances, when=when, time_of_day=True)
+        return travel.astype(np.float32)
+
+    def stats(self):
+        """Counters and sizing for monitoring"""
+        with self._lock:
+            return {
+                'points': len(self._slots),
+                'capacity': len(self._coords),
+                'max_points': self.max_points,
+                'matrix_bytes': self._matrix.nbytes,
+                'rows_computed': self.rows_computed,
+                'columns_recomputed': self.columns_recomputed,
+                'evictions': self.evictions
+            }
+
+    def _set_point(self, key, lat, lng):
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._slots.move_to_end(key)
+            if self._coords[slot, 0] == lat and self._coords[slot, 1] == lng:
+                return False
+        else:
+            slot = self._allocate(key)
+        self._coords[slot] = (lat, lng)
+        self._refresh_column(slot)
+        return True
+
+    def _matrix_for(self, keys_a, keys_b):
+        rows = self._lookup(keys_a)
+        cols = self._lookup(keys_b)
+        missing = np.unique(rows[~self._row_valid[rows]])
+        if len(missing):
+            active = self._active_slots()
+            self._matrix[np.ix_(missing, active)] = self.provider.distances(
+                self._coords[missing], self._coords[active]
+            )
+            self._row_valid[missing] = True
+            self.rows_computed += len(missing)
+        return self._matrix[np.ix_(rows, cols)]
+
+    def _lookup(self, keys):
+        """Slots for keys, marking them recently used"""
+        slots = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            slots[i] = self._slots[key]
+            self._slots.move_to_end(key)
+        return slots
+
+    def _active_slots(self):
+        return np.fromiter(self._slots.values(), dtype=np.int64, count=len(self._slots))
+
+    def _allocate(self, key):
+        """Reserve a slot for a new key, growing or evicting as needed"""
+        if not self._free:
+            if len(self._coords) < self.max_points:
+                self._grow(min(len(self._coords) * 2, self.max_points))
+            else:
+                _, slot = self._slots.popitem(last=False)
+                self._row_valid[slot] = False
+                self._free.append(slot)
+                self.evictions += 1
+        slot = self._free.pop()
+        self._slots[key] = slot
+        self._row_valid[slot] = False
+        return slot
+
+    def _grow(self, capacity):
+        old = len(self._coords)
+        coords = np.zeros((capacity, 2), dtype=np.float64)
+        coords[:old] = self._coords
+        matrix = np.zeros((capacity, capacity), dtype=np.float32)
+        matrix[:old, :old] = self._matrix
+        row_valid = np.zeros(capacity, dtype=bool)
+        row_valid[:old] = self._row_valid
+        self._coords, self._matrix, self._row_valid = coords, matrix, row_valid
+        self._free.extend(range(capacity - 1, old - 1, -1))
+
+    def _refresh_column(self, slot):
+        """
+        Recompute the distances into a new or moved point for every cached row
+
+        Its own row is left to be filled lazily. For a symmetric provider the
+        column is computed once and reused for the row.
+        """
+        self._row_valid[slot] = False
+        valid = np.flatnonzero(self._row_valid)
+        if len(valid):
+            column = self.provider.distances(self._coords[valid], self._coords[slot:slot + 1])[:, 0]
+            self._matrix[valid, slot] = column
+            self.columns_recomputed += 1
+            if self.provider.symmetric and len(valid) == len(self._slots) - 1:
+                self._matrix[slot, valid] = column
+                self._matrix[slot, slot] = 0.0
+                self._row_valid[slot] = True
@@ -0,0 +1,241 @@
+"""
+Route Optimization Module
+Orders the drop-offs of a pooled delivery run with OR-Tools
+"""
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from ortools.constraint_solver import pywrapcp, routing_enums_pb2
+
+from ai_optimization.eta_predictor import ETAPredictor
+from utils.distance import distance_matrix
+
+# Objective weight of one second past a stop's deadline, in metres of driving;
+# high enough that the solver only accepts lateness it cannot avoid
+LATE_PENALTY_PER_SECOND = 100
+
+
+class RouteOptimizer:
+    """
+    Solves the open vehicle routing problem with time windows for one restaurant
+
+    Each vehicle starts at the restaurant once the food is prepared and ends at
+    its last drop-off. Arc costs are metres; travel and hand-off times come from
+    ETAPredictor. Deadlines are soft: a route that cannot meet every deadline is
+    still returned, with the late stops flagged.
+    """
+
+    def __init__(self, eta_predictor=None, time_limit_ms=1000, guided_local_search=False):
+        """
+        Args:
+            eta_predictor (ETAPredictor): Source of prep, travel and stop times
+            time_limit_ms (int): Solver wall-clock limit per call
+            guided_local_search (bool): Keep improving until the time limit
+                instead of stopping at the first local optimum
+        """
+        self.eta_predictor = eta_predictor or ETAPredictor()
+        self.time_limit_ms = time_limit_ms
+        self.guided_local_search = guided_local_search
+
+    def optimize(self, restaurant, stops, num_vehicles=1, when=None, previous=None,
+                 distances_km=None, time_limit_ms=None):
+        """
+        Find a stop order for each vehicle
+
+        Args:
+            restaurant (dict): {"lat", "lng", "restaurant_id" (optional)}
+            stops (list): Drop-offs as {"stop_id", "lat", "lng", "group_id",
+                "deadline" (aware datetime, optional)}; stop_id must be unique
+            num_vehicles (int): Drivers available for the run
+            when (datetime): Order time the schedule starts from; defaults to now
+            previous (dict): Earlier result of optimize() for (mostly) the same
+                stops, used as the starting solution
+            distances_km (array-like): Precomputed (n+1, n+1) matrix with the
+                restaurant first and stops in input order; haversine if omitted
+            time_limit_ms (int): Override the solver time limit for this call
+
+        Returns:
+            dict: {"routes": [{"vehicle", "stops", "total_km"}], "total_km",
+                "late_stops", "warm_started", "solve_ms", "model"}
+        """
+        if not stops:
+            raise ValueError("At least one stop is required")
+        if num_vehicles < 1:
+            raise ValueError("num_vehicles must be at least 1")
+        stop_ids = [stop['stop_id'] for stop in stops]
+        if len(set(stop_ids)) != len(stop_ids):
+            raise ValueError("stop_id values must be unique")
+
+        when = when or datetime.now().astimezone()
+        restaurant_id = restaurant.get('restaurant_id')
+        n = len(stops)
+
+        if distances_km is None:
+            points = [(restaurant['lat'], restaurant['lng'])] + [(s['lat'], s['lng']) for s in stops]
+            distances_km = distance_matrix(points, points)
+        distances_km = np.asarray(distances_km, dtype=np.float64)
+        if distances_km.shape != (n + 1, n + 1):
+            raise ValueError(f"distances_km must be {n + 1}x{n + 1}")
+
+        prep_mins, travel_mins, stop_mins, time_factor = self.eta_predictor.predict_components(
+            distances_km, 1, 1.0, restaurant_ids=[restaurant_id], when=when, time_of_day=True
+        )
+        prep_secs = int(round(float(prep_mins.flat[0]) * 60))
+        stop_secs = int(round(float(stop_mins.flat[0]) * 60))
+
+        # Nodes: 0 = restaurant, 1..n = stops, n + 1 = free end point (open routes)
+        end = n + 1
+        metres = np.zeros((n + 2, n + 2), dtype=np.int64)
+        metres[:end, :end] = np.rint(distances_km * 1000)
+        # Time to reach a stop includes handing the order over there
+        seconds = np.zeros((n + 2, n + 2), dtype=np.int64)
+        seconds[:end, :end] = np.rint(travel_mins * 60)
+        seconds[:end, 1:end] += stop_secs
+        np.fill_diagonal(seconds, 0)
+
+        manager = pywrapcp.RoutingIndexManager(
+            n + 2, num_vehicles, [0] * num_vehicles, [end] * num_vehicles
+        )
+        routing = pywrapcp.RoutingModel(manager)
+        routing.SetArcCostEvaluatorOfAllVehicles(routing.RegisterTransitMatrix(metres.tolist()))
+
+        horizon = prep_secs + int(seconds.max()) * (n + 1) + 1
+        routing.AddDimension(routing.RegisterTransitMatrix(seconds.tolist()), 0, horizon, False, 'Time')
+        time_dimension = routing.GetDimensionOrDie('Time')
+        for vehicle in range(num_vehicles):
+            time_dimension.CumulVar(routing.Start(vehicle)).SetValue(prep_secs)
+
+        deadlines = [None] * n
+        for node, stop in enumerate(stops, start=1):
+            if stop.get('deadline') is None:
+                continue
+            deadline = max(int((stop['deadline'] - when).total_seconds()), 0)
+            deadlines[node - 1] = deadline
+            time_dimension.SetCumulVarSoftUpperBound(
+                manager.NodeToIndex(node), deadline, LATE_PENALTY_PER_SECOND
+            )
+
+        params = pywrapcp.DefaultRoutingSearchParameters()
+        params.first_solution_strategy = (
+            routing_enums_pb2.FirstSolutionStrategy.PARALLEL_CHEAPEST_INSERTION
+        )
+        if self.guided_local_search:
+            params.local_search_metaheuristic = (
+                routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
+            )
+        params.time_limit.FromMilliseconds(time_limit_ms or self.time_limit_ms)
+
+        start = time.perf_counter()
+        initial = None
+        if previous:
+            initial = routing.ReadAssignmentFromRoutes(
+                self._initial_routes(previous, stop_ids, num_vehicles, manager), True
+            )
+        if initial is not None:
+            solution = routing.SolveFromAssignmentWithParameters(initial, params)
+        else:
+            solution = routing.SolveWithParameters(params)
+        solve_ms = (time.perf_counter() - start) * 1000
+        if solution is None:
+            raise RuntimeError("No route found within the time limit")
+
+        routes = []
+        for vehicle in range(num_vehicles):
+            index = solution.Value(routing.NextVar(routing.Start(vehicle)))
+            nodes = []
+            while not routing.IsEnd(index):
+                nodes.append(manager.IndexToNode(index))
+                index = solution.Value(routing.NextVar(index))
+            if nodes:
+                arrivals = [solution.Value(time_dimension.CumulVar(manager.NodeToIndex(node)))
+                            for node in nodes]
+                routes.append((vehicle, nodes, arrivals))
+
+        timing = (prep_secs, stop_secs, time_factor)
+        return self._build_result(
+            routes, stops, deadlines, distances_km, timing, when, initial is not None, solve_ms
+        )
+
+    @staticmethod
+    def _initial_routes(previous, stop_ids, num_vehicles, manager):
+        """
+        Map a previous result onto the current nodes
+
+        Stops that are gone are dropped; new stops are appended to the
+        shortest route so the starting solution visits every stop.
+        """
+        node_of = {stop_id: node for node, stop_id in enumerate(stop_ids, start=1)}
+        routes = [[] for _ in range(num_vehicles)]
+        seen = set()
+        for route in previous.get('routes', []):
+            vehicle = route['vehicle']
+            if vehicle >= num_vehicles:
+                continue
+            for stop in route['stops']:
+                node = node_of.get(stop['stop_id'])
+                if node is not None and node not in seen:
+                    routes[vehicle].append(node)
+                    seen.add(node)
+        for node in range(1, len(stop_ids) + 1):
+            if node not in seen:
+                min(routes, key=len).append(node)
+        return [[manager.NodeToIndex(node) for node in route] for route in routes]
+
+    def _build_result(self, routes, stops, deadlines, distances_km, timing, when,
+                      warm_started, solve_ms):
+        """
+        Attach leg distances and ETAs to the routes
+
+        ETAs are the solver's own arrival times (the ones deadlines were
+        checked against), split into prep, travel and hand-off minutes.
+        """
+        prep_secs, stop_secs, time_factor = timing
+        result_routes = []
+        late_stops = 0
+        for vehicle, nodes, arrivals in routes:
+            path = [0] + nodes
+            route_legs = distances_km[path[:-1], path[1:]]
+            route_cumulative = np.cumsum(route_legs)
+            route_stops = []
+            for i, (node, arrival) in enumerate(zip(nodes, arrivals)):
+                stop = stops[node - 1]
+                deadline = deadlines[node - 1]
+                on_time = deadline is None or arrival <= deadline
+                late_stops += not on_time
+                handoff_secs = (i + 1) * stop_secs
+                route_stops.append({
+                    'stop_id': stop['stop_id'],
+                    'group_id': stop.get('group_id'),
+                    'sequence': i + 1,
+                    'leg_km': round(float(route_legs[i]), 2),
+                    'cumulative_km': round(float(route_cumulative[i]), 2),
+                    'arrival_minutes': round(arrival / 60, 1),
+                    'on_time': on_time,
+                    'eta': {
+                        'eta': (when + timedelta(seconds=arrival)).isoformat(),
+                        'total_minutes': arrival // 60,
+                        'breakdown': {
+                            'prep_time': prep_secs // 60,
+                            'travel_time': (arrival - prep_secs - handoff_secs) // 60,
+                            'stop_time': handoff_secs // 60
+                        },
+                        'model': self.eta_predictor.model_source,
+                        'adjusted_for_rush_hour': time_factor > 1.0,
+                        'time_of_day_factor': round(time_factor, 2)
+                    }
+                })
+            result_routes.append({
+                'vehicle': vehicle,
+                'stops': route_stops,
+                'total_km': round(float(route_cumulative[-1]), 2)
+            })
+
+        return {
+            'routes': result_routes,
+            'total_km': round(sum(route['total_km'] for route in result_routes), 2),
+            'late_stops': late_stops,
+            'warm_started': warm_started,
+            'solve_ms': round(solve_ms, 1),
+            'model': self.eta_predictor.model_source
+        }
@@ -0,0 +1,67 @@
+"""
+Traffic Factor Table
+Hour-of-week travel time multipliers for the constant ETA model
+"""
+import json
+import os
+
+import numpy as np
+
+from ai_optimization.eta_model import HOURS_PER_WEEK, hour_of_week
+
+# Multipliers by hour of day used when no table is configured:
+# morning/evening rush hour and the lunch rush
+DEFAULT_HOURLY_FACTORS = [
+    1.3 if 7 <= hour <= 9 or 17 <= hour <= 19 else 1.2 if 11 <= hour <= 13 else 1.0
+    for hour in range(24)
+]
+
+
+class TrafficTable:
+    """
+    168 travel-time multipliers, one per local hour of the week
+
+    Slot 0 is Monday 00:00-00:59 and slot 167 is Sunday 23:00-23:59, in the
+    wall-clock time of the datetime being looked up (rush hour is local).
+    """
+
+    def __init__(self, factors):
+        """
+        Args:
+            factors (array-like): 168 hour-of-week multipliers, or 24 hour-of-day
+                multipliers repeated for every day
+        """
+        factors = np.asarray(factors, dtype=np.float64)
+        if factors.shape == (24,):
+            factors = np.tile(factors, 7)
+        if factors.shape != (HOURS_PER_WEEK,):
+            raise ValueError(f"Traffic table needs 24 or {HOURS_PER_WEEK} factors, got {factors.size}")
+        if not np.all(factors > 0):
+            raise ValueError("Traffic factors must be positive")
+        self.factors = factors
+
+    @classmethod
+    def default(cls):
+        """Fixed rush-hour table (7-9 and 17-19 at 1.3x, 11-13 at 1.2x) on every day"""
+        return cls(DEFAULT_HOURLY_FACTORS)
+
+    @classmethod
+    def from_file(cls, path):
+        """Load a JSON list of 24 or 168 factors"""
+        with open(path) as f:
+            return cls(json.load(f))
+
+    @classmethod
+    def from_env(cls):
+        """Table from $TRAFFIC_TABLE_PATH if set, otherwise the default table"""
+        path = os.getenv('TRAFFIC_TABLE_PATH')
+        return cls.from_file(path) if path else cls.default()
+
+    @staticmethod
+    def slot(when):
+        """Hour-of-week slot for a datetime's own wall-clock time"""
+        return hour_of_week(when)
+
+    def factor_at(self, when):
+        """Multiplier for the given (local) datetime"""
+        return float(self.factors[self.slot(when)])
@@ -2,6 +2,7 @@ from flask import Flask, send_from_directory
 from extensions import db, cors, jwt, migrate
 from routes import bp as api_bp
 from config import Config
+from commands import register_commands
 import os
 
 def create_app(config_override=None):
@@ -33,11 +34,13 @@ def create_app(config_override=None):
         app,
         resources={r"/api/*": {"origins": "http://localhost:3000"}},
         supports_credentials=True,
+        expose_headers=["X-Next-Cursor"],
     )
     jwt.init_app(app)
 
     # Register blueprints
     app.register_blueprint(api_bp)
+    register_commands(app)
 
     # Initialize database
     with app.app_context():
@@ -0,0 +1,104 @@
+"""
+Benchmark for DemandClusterer metrics
+
+Times the DBSCAN fit on synthetic delivery points spread over the continental
+US, once with the euclidean-on-degrees metric and once with the haversine
+BallTree metric, and reports how many clusters each finds. Only the fit is
+timed; building the per-cluster metadata is measured separately elsewhere.
+
+Also times IncrementalClusterer on a single dense pool cluster, the worst case
+for it since every point is within reach of every other: a full load(), then
+the average upsert and remove against the loaded state.
+
+Usage (from Proj2/backend):
+    python -m benchmarks.bench_clustering [n_points ...]
+
+Defaults to 10k, 100k and 1M points, and 1k, 2k and 4k dense points.
+"""
+import sys
+import time
+
+import numpy as np
+
+from ai_optimization.clustering import DemandClusterer
+from ai_optimization.incremental_clustering import IncrementalClusterer
+
+SIZES = [10_000, 100_000, 1_000_000]
+DENSE_SIZES = [1_000, 2_000, 4_000]
+DENSE_UPDATES = 50
+MAX_DISTANCE_KM = 2.0
+SEED = 15
+EXACT_RADIUS_LIMIT = 100_000
+
+
+def synthetic_points(n, rng):
+    """Uniform background plus a few dense metro hotspots, as [lat, lng] degrees"""
+    background = n * 3 // 4
+    lats = rng.uniform(25.0, 49.0, background)
+    lngs = rng.uniform(-124.0, -67.0, background)
+
+    metros = np.array([[35.78, -78.64], [40.71, -74.01], [47.61, -122.33], [29.76, -95.37]])
+    picks = metros[rng.integers(0, len(metros), n - background)]
+    spread = rng.normal(0.0, 0.3, (n - background, 2))
+    return np.vstack([np.column_stack([lats, lngs]), picks + spread])
+
+
+def run(n):
+    coords = synthetic_points(n, np.random.default_rng(SEED))
+    for metric in DemandClusterer.METRICS:
+        clusterer = DemandClusterer(max_distance_km=MAX_DISTANCE_KM, metric=metric)
+        data = np.radians(coords) if metric == 'haversine' else coords
+
+        start = time.perf_counter()
+        labels = clusterer._dbscan().fit(data).labels_
+        elapsed = time.perf_counter() - start
+
+        clusters = len(set(labels.tolist()) - {-1})
+        print(f"{n:>9,} pts  {metric:>9}: {elapsed:8.2f}s  {clusters:>7,} clusters")
+
+    locations = [
+        {'lat': lat, 'lng': lng, 'group_id': i, 'group_name': f"Pool {i}"}
+        for i, (lat, lng) in enumerate(coords.tolist())
+    ]
+    for exact in (False, True):
+        if exact and n > EXACT_RADIUS_LIMIT:
+            continue
+        clusterer = DemandClusterer(max_distance_km=MAX_DISTANCE_KM, exact_radius=exact)
+        start = time.perf_counter()
+        clusterer._build_clusters(locations, coords, labels)
+        elapsed = time.perf_counter() - start
+        mode = 'geodesic' if exact else 'vector'
+        print(f"{n:>9,} pts  {mode:>9}: {elapsed:8.2f}s  post-processing")
+
+
+def run_dense(n):
+    rng = np.random.default_rng(SEED)
+    coords = np.array([35.78, -78.64]) + rng.normal(0.0, 0.004, (n, 2))
+    clusterer = IncrementalClusterer(max_distance_km=MAX_DISTANCE_KM)
+
+    start = time.perf_counter()
+    clusterer.load((i, lat, lng, f"Pool {i}", None) for i, (lat, lng) in enumerate(coords.tolist()))
+    load_elapsed = time.perf_counter() - start
+
+    moves = np.array([35.78, -78.64]) + rng.normal(0.0, 0.004, (DENSE_UPDATES, 2))
+    start = time.perf_counter()
+    for i, (lat, lng) in enumerate(moves.tolist()):
+        clusterer.upsert(n + i, lat, lng)
+    upsert_ms = (time.perf_counter() - start) / DENSE_UPDATES * 1000
+
+    start = time.perf_counter()
+    for i in range(DENSE_UPDATES):
+        clusterer.remove(i)
+    remove_ms = (time.perf_counter() - start) / DENSE_UPDATES * 1000
+
+    print(
+        f"{n:>9,} pts      dense: {load_elapsed:8.2f}s  load, "
+        f"{upsert_ms:6.2f}ms/upsert, {remove_ms:6.2f}ms/remove"
+    )
+
+
+if __name__ == "__main__":
+    for size in [int(arg) for arg in sys.argv[1:]] or SIZES:
+        run(size)
+    for size in DENSE_SIZES:
+        run_dense(size)
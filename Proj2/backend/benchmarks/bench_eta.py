@@ -0,0 +1,55 @@
+"""
+Benchmark for ETAPredictor inference
+
+Times predict_eta (one trip) and predict_eta_batch (many trips) for the
+constant model and for a LearnedETAModel fitted on synthetic history, and
+reports microseconds per trip.
+
+Usage (from Proj2/backend):
+    python -m benchmarks.bench_eta
+"""
+import time
+
+import numpy as np
+
+from ai_optimization.eta_model import LearnedETAModel
+from ai_optimization.eta_predictor import ETAPredictor
+
+SINGLE_CALLS = 5_000
+BATCH_SIZE = 1_000
+BATCH_CALLS = 50
+SEED = 17
+
+
+def learned_model(n=50_000):
+    rng = np.random.default_rng(SEED)
+    restaurant_ids = rng.integers(1, 200, n)
+    distances = rng.uniform(0.5, 12.0, n)
+    stops = rng.integers(1, 5, n)
+    slots = rng.integers(0, 168, n)
+    prep = 10 + restaurant_ids % 15 + rng.normal(0, 2, n)
+    travel = distances * (2.0 + (slots % 24 >= 17)) + stops * 3 + rng.normal(0, 2, n)
+    return LearnedETAModel.fit(restaurant_ids, prep, distances, stops, slots, travel)
+
+
+def run(name, predictor):
+    rng = np.random.default_rng(SEED)
+    start = time.perf_counter()
+    for i in range(SINGLE_CALLS):
+        predictor.predict_eta(5.0 + i % 7, 1 + i % 3, 1.0, restaurant_id=1 + i % 200)
+    single_us = (time.perf_counter() - start) / SINGLE_CALLS * 1e6
+
+    distances = rng.uniform(0.5, 12.0, BATCH_SIZE)
+    stops = rng.integers(1, 5, BATCH_SIZE)
+    restaurant_ids = rng.integers(1, 200, BATCH_SIZE)
+    start = time.perf_counter()
+    for _ in range(BATCH_CALLS):
+        predictor.predict_eta_batch(distances, stops, 1.0, restaurant_ids=restaurant_ids)
+    batch_us = (time.perf_counter() - start) / (BATCH_CALLS * BATCH_SIZE) * 1e6
+
+    print(f"{name:>9}: single {single_us:7.1f} us/call   batch {batch_us:6.2f} us/trip")
+
+
+if __name__ == "__main__":
+    run("constant", ETAPredictor())
+    run("learned", ETAPredictor(learned_model()))
@@ -0,0 +1,181 @@
+"""
+Benchmark for /api/discovery/nearby-pools
+
+Fills a scratch SQLite database with public pools scattered over the
+continental US and measures request latency as the table grows. With the
+grid-cell index the query only touches the cells around the user, so latency
+should stay roughly flat from 1k to 1M groups.
+
+Because the pools are spread uniformly, a random search finds more of them
+as the table grows (see "avg hits"), and loading, serializing and fetching
+members for those hits is most of the extra latency. The "probe ms" column
+separates that from table size: it searches a spot outside the random area
+that always holds the same PROBE_POOLS pools. Each row also reports the time
+spent executing SQL and is followed by the EXPLAIN QUERY PLAN of the
+nearby-pools query at that size; expect SEARCH groups USING INDEX
+ix_groups_geo_cell (geo_cell=?) at every size, never a table scan.
+
+Usage (from Proj2/backend, with the usual .env present):
+    python -m benchmarks.bench_nearby_pools [sizes...]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, insert
+
+from app import create_app
+from extensions import db
+from models import Group
+from utils.spatial_index import default_index
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+QUERIES_PER_SIZE = 50
+BATCH_SIZE = 50_000
+
+# Rough continental US bounding box
+LAT_RANGE = (25.0, 49.0)
+LON_RANGE = (-124.0, -67.0)
+
+# Fixed cluster searched at every size, south of the random area
+PROBE = (20.0, -100.0)
+PROBE_POOLS = 5
+
+
+def _random_groups(count, rng):
+    next_order_time = datetime.now(timezone.utc) + timedelta(days=1)
+    for i in range(count):
+        lat = rng.uniform(*LAT_RANGE)
+        lon = rng.uniform(*LON_RANGE)
+        yield {
+            "name": f"Bench Pool {i}",
+            "organizer": "bench",
+            "delivery_type": "delivery",
+            "delivery_location": "Somewhere",
+            "latitude": lat,
+            "longitude": lon,
+            "geo_cell": default_index.cell_for(lat, lon),
+            "visibility": "public",
+            "next_order_time": next_order_time,
+        }
+
+
+def _insert_probe_pools():
+    next_order_time = datetime.now(timezone.utc) + timedelta(days=1)
+    rows = []
+    for i in range(PROBE_POOLS):
+        lat, lon = PROBE[0] + i * 0.001, PROBE[1]
+        rows.append({
+            "name": f"Probe Pool {i}",
+            "organizer": "bench",
+            "delivery_type": "delivery",
+            "delivery_location": "Somewhere",
+            "latitude": lat,
+            "longitude": lon,
+            "geo_cell": default_index.cell_for(lat, lon),
+            "visibility": "public",
+            "next_order_time": next_order_time,
+        })
+    db.session.execute(insert(Group), rows)
+    db.session.commit()
+
+
+def _insert_groups(count, rng):
+    rows = []
+    for row in _random_groups(count, rng):
+        rows.append(row)
+        if len(rows) == BATCH_SIZE:
+            db.session.execute(insert(Group), rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(Group), rows)
+    db.session.commit()
+
+
+class SqlRecorder:
+    """Times every statement run on an engine and keeps the last nearby-pools query"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.elapsed_ms = 0.0
+        self.nearby_query = None
+        self._started = None
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        self._started = time.perf_counter()
+        if "FROM groups" in statement and "geo_cell" in statement:
+            self.nearby_query = (statement, parameters)
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        self.elapsed_ms += (time.perf_counter() - self._started) * 1000
+
+    def explain(self):
+        """EXPLAIN QUERY PLAN rows for the last nearby-pools query"""
+        statement, parameters = self.nearby_query
+        with self.engine.connect() as conn:
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        return [row[-1] for row in rows]
+
+
+def run(sizes):
+    rng = random.Random(42)
+    db_path = os.path.join(tempfile.mkdtemp(), "bench_nearby_pools.db")
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}"})
+    client = app.test_client()
+
+    with app.app_context():
+        token = create_access_token(identity="1", additional_claims={"username": "bench"})
+        headers = {"Authorization": f"Bearer {token}"}
+
+        recorder = SqlRecorder(db.engine)
+        _insert_probe_pools()
+        print(
+            f"{'groups':>10} {'median ms':>10} {'p95 ms':>10} {'sql ms':>10} "
+            f"{'avg hits':>10} {'probe ms':>10}"
+        )
+        loaded = 0
+        for size in sorted(sizes):
+            _insert_groups(size - loaded, rng)
+            loaded = size
+            db.session.execute(db.text("ANALYZE"))
+
+            timings, sql_timings, hits, probe_timings = [], [], [], []
+            for _ in range(QUERIES_PER_SIZE):
+                params = {
+                    "lat": rng.uniform(*LAT_RANGE),
+                    "lon": rng.uniform(*LON_RANGE),
+                    "radius": 5.0,
+                }
+                recorder.elapsed_ms = 0.0
+                start = time.perf_counter()
+                res = client.get("/api/discovery/nearby-pools", query_string=params, headers=headers)
+                timings.append((time.perf_counter() - start) * 1000)
+                sql_timings.append(recorder.elapsed_ms)
+                hits.append(len(res.get_json()))
+
+                probe = {"lat": PROBE[0], "lon": PROBE[1], "radius": 5.0}
+                start = time.perf_counter()
+                res = client.get("/api/discovery/nearby-pools", query_string=probe, headers=headers)
+                probe_timings.append((time.perf_counter() - start) * 1000)
+                assert len(res.get_json()) == PROBE_POOLS
+
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            print(
+                f"{size:>10} {statistics.median(timings):>10.2f} {p95:>10.2f} "
+                f"{statistics.median(sql_timings):>10.2f} {statistics.mean(hits):>10.1f} "
+                f"{statistics.median(probe_timings):>10.2f}"
+            )
+            for line in recorder.explain():
+                print(f"{'':>12}{line}")
+
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
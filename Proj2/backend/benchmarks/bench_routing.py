@@ -0,0 +1,66 @@
+"""
+Benchmark for RouteOptimizer
+
+Solves synthetic pooled-delivery runs of 10-200 drop-offs around one
+restaurant, each stop due within 45-120 minutes. For every size it reports a
+cold solve, and a warm-started re-solve after a quarter of the stops moved
+slightly (as when members update their locations), with the same time limit.
+
+Usage (from Proj2/backend):
+    python -m benchmarks.bench_routing [n_stops ...]
+
+Defaults to 10, 25, 50, 100 and 200 stops.
+"""
+import sys
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from ai_optimization.routing import RouteOptimizer
+
+SIZES = [10, 25, 50, 100, 200]
+TIME_LIMIT_MS = 2000
+SEED = 19
+RESTAURANT = {"lat": 35.7796, "lng": -78.6382}
+
+
+def synthetic_stops(n, rng, when):
+    lats = RESTAURANT["lat"] + rng.normal(0.0, 0.03, n)
+    lngs = RESTAURANT["lng"] + rng.normal(0.0, 0.03, n)
+    due = rng.integers(45, 121, n)
+    return [
+        {"stop_id": i, "lat": float(lat), "lng": float(lng), "group_id": i % 8,
+         "deadline": when + timedelta(minutes=int(minutes))}
+        for i, (lat, lng, minutes) in enumerate(zip(lats, lngs, due))
+    ]
+
+
+def run(n, optimizer):
+    rng = np.random.default_rng(SEED)
+    when = datetime(2025, 11, 26, 14, 0, tzinfo=timezone.utc)
+    stops = synthetic_stops(n, rng, when)
+    vehicles = max(1, n // 10)
+
+    cold = optimizer.optimize(RESTAURANT, stops, num_vehicles=vehicles, when=when)
+
+    for i in rng.choice(n, n // 4, replace=False):
+        stops[i]["lat"] += float(rng.normal(0.0, 0.002))
+        stops[i]["lng"] += float(rng.normal(0.0, 0.002))
+    rerun = optimizer.optimize(RESTAURANT, stops, num_vehicles=vehicles, when=when)
+    warm = optimizer.optimize(RESTAURANT, stops, num_vehicles=vehicles, when=when, previous=cold)
+
+    print(
+        f"{n:>4} stops / {vehicles} vehicles: "
+        f"cold {cold['solve_ms']:7.1f} ms {cold['total_km']:7.2f} km {cold['late_stops']:3d} late | "
+        f"moved: cold {rerun['solve_ms']:7.1f} ms {rerun['total_km']:7.2f} km | "
+        f"warm {warm['solve_ms']:7.1f} ms {warm['total_km']:7.2f} km"
+    )
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    for label, guided in (("greedy descent", False), ("guided local search", True)):
+        print(f"{label} (time limit {TIME_LIMIT_MS} ms)")
+        optimizer = RouteOptimizer(time_limit_ms=TIME_LIMIT_MS, guided_local_search=guided)
+        for n in sizes:
+            run(n, optimizer)
@@ -0,0 +1,128 @@
+"""
+Maintenance CLI commands
+
+Run from the backend directory, e.g.:
+    flask --app app recount-poll-votes
+"""
+import csv
+import os
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import click
+import numpy as np
+from ai_optimization.eta_model import DEFAULT_MODEL_PATH, LearnedETAModel, local_hour_of_week
+from models import (Delivery, archive_expired_coupons, backfill_geo_cells, import_deliveries,
+                    recount_poll_votes, take_loyalty_snapshots, verify_loyalty_balances)
+
+
+@click.command("recount-poll-votes")
+def recount_poll_votes_command():
+    """Recompute poll option vote counters from poll_votes."""
+    fixed = recount_poll_votes()
+    click.echo(f"Recounted poll votes: {fixed} option(s) corrected")
+
+
+@click.command("backfill-geo-cells")
+@click.option("--batch-size", default=1000, show_default=True, help="Groups per batch.")
+def backfill_geo_cells_command(batch_size):
+    """Recompute groups.geo_cell for every group (run after sql/001_groups_geo_cell.sql)."""
+    changed = backfill_geo_cells(batch_size=batch_size)
+    click.echo(f"Backfilled geo cells: {changed} group(s) updated")
+
+
+@click.command("train-eta-model")
+@click.option("--output", default=None, help="Artifact path [default: $ETA_MODEL_PATH or ai_optimization/artifacts/eta_model.npz]")
+@click.option("--min-samples", default=50, show_default=True, help="Refuse to train on fewer completed deliveries.")
+@click.option("--timezone", "tz_name", default=None,
+              help="IANA zone whose local hours the pickups are bucketed by [default: the server's zone]")
+def train_eta_model_command(output, min_samples, tz_name):
+    """Fit the learned ETA model from recorded deliveries and save the artifact."""
+    try:
+        tz = ZoneInfo(tz_name) if tz_name else None
+    except (ZoneInfoNotFoundError, ValueError):
+        raise click.ClickException(f"Unknown timezone: {tz_name}")
+    records = (
+        Delivery.query
+        .with_entities(
+            Delivery.restaurant_id, Delivery.distance_km, Delivery.num_stops,
+            Delivery.ordered_at, Delivery.picked_up_at, Delivery.delivered_at,
+        )
+        .filter(Delivery.picked_up_at.isnot(None), Delivery.delivered_at.isnot(None))
+        .all()
+    )
+    if len(records) < min_samples:
+        raise click.ClickException(
+            f"Only {len(records)} completed deliveries; need at least {min_samples}"
+        )
+
+    model = LearnedETAModel.fit_from_records(records, tz=tz)
+    prep, travel, stops = model.predict_components(
+        [r.restaurant_id for r in records],
+        [r.distance_km for r in records],
+        [r.num_stops or 1 for r in records],
+        [local_hour_of_week(r.picked_up_at, tz) for r in records],
+    )
+    actual = np.array([(r.delivered_at - r.ordered_at).total_seconds() / 60 for r in records])
+    mae = np.abs(prep + travel + stops - actual).mean()
+
+    path = output or os.getenv("ETA_MODEL_PATH", DEFAULT_MODEL_PATH)
+    model.save(path)
+    click.echo(
+        f"Trained ETA model on {model.samples} deliveries (in-sample MAE {mae:.1f} min); "
+        f"saved to {path}. Restart the API to load it."
+    )
+
+
+@click.command("import-deliveries")
+@click.argument("csv_file", type=click.File("r"))
+@click.option("--batch-size", default=1000, show_default=True, help="Rows per INSERT.")
+def import_deliveries_command(csv_file, batch_size):
+    """Load delivery records from a CSV export, as training data for train-eta-model.
+
+    Columns: group_id, restaurant_id, distance_km, num_stops, ordered_at,
+    picked_up_at, delivered_at (ISO-8601; naive times are UTC).
+    """
+    try:
+        imported = import_deliveries(csv.DictReader(csv_file), batch_size=batch_size)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Imported {imported} delivery record(s)")
+
+
+@click.command("snapshot-loyalty-balances")
+@click.option("--batch-size", default=1000, show_default=True, help="Users per batch.")
+def snapshot_loyalty_balances_command(batch_size):
+    """Snapshot each user's ledger balance so audits only replay recent rows."""
+    written = take_loyalty_snapshots(batch_size=batch_size)
+    click.echo(f"Wrote {written} loyalty balance snapshot(s)")
+
+
+@click.command("verify-loyalty-balances")
+@click.option("--batch-size", default=1000, show_default=True, help="Users per batch.")
+def verify_loyalty_balances_command(batch_size):
+    """Check users.loyalty_points against the ledger; exits 1 if any drifted."""
+    drifted = 0
+    for user_id, stored, expected in verify_loyalty_balances(batch_size=batch_size):
+        drifted += 1
+        click.echo(f"user {user_id}: stored {stored}, ledger {expected} (drift {stored - expected:+d})")
+    click.echo(f"Loyalty balance check: {drifted} user(s) drifted")
+    if drifted:
+        raise SystemExit(1)
+
+
+@click.command("archive-expired-coupons")
+@click.option("--batch-size", default=1000, show_default=True, help="Coupons per batch.")
+def archive_expired_coupons_command(batch_size):
+    """Move unused coupons past their expiry into expired_coupons (safe to run from cron)."""
+    archived = archive_expired_coupons(batch_size=batch_size)
+    click.echo(f"Archived {archived} expired coupon(s)")
+
+
+def register_commands(app):
+    app.cli.add_command(recount_poll_votes_command)
+    app.cli.add_command(backfill_geo_cells_command)
+    app.cli.add_command(import_deliveries_command)
+    app.cli.add_command(train_eta_model_command)
+    app.cli.add_command(snapshot_loyalty_balances_command)
+    app.cli.add_command(verify_loyalty_balances_command)
+    app.cli.add_command(archive_expired_coupons_command)
@@ -1,11 +1,15 @@
 import os
+from datetime import datetime, timezone
 from flask import request, jsonify, current_app, url_for
 from werkzeug.utils import secure_filename
 from models.user import User
 from extensions import db
 from flask_jwt_extended import get_jwt
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import contains_eager, selectinload
 from models.order import GroupOrder
-from models.group import Group
+from models.group import GroupMember
+from utils.pagination import keyset_page, parse_page_size
 
 # Allowed file extensions for profile pictures
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
@@ -15,6 +19,35 @@ def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def order_stats(username):
+    """
+    Count a user's orders and how many were pooled, in one query
+
+    An order is pooled when its group has more than one member. Member
+    counts are aggregated only for the groups the user ordered from.
+
+    Returns:
+        tuple: (total_orders, pooled_orders)
+    """
+    user_groups = select(GroupOrder.group_id).where(GroupOrder.username == username)
+    member_counts = (
+        select(GroupMember.group_id, func.count(GroupMember.id).label("member_count"))
+        .where(GroupMember.group_id.in_(user_groups))
+        .group_by(GroupMember.group_id)
+        .subquery()
+    )
+    total_orders, pooled_orders = db.session.execute(
+        select(
+            func.count(GroupOrder.id),
+            func.coalesce(func.sum(case((member_counts.c.member_count > 1, 1), else_=0)), 0),
+        )
+        .select_from(GroupOrder)
+        .outerjoin(member_counts, member_counts.c.group_id == GroupOrder.group_id)
+        .where(GroupOrder.username == username)
+    ).one()
+    return total_orders, int(pooled_orders)
+
+
 def get_profile():
     """Fetch the logged-in user's profile with stats."""
     claims = get_jwt()
@@ -24,17 +57,8 @@ def get_profile():
     if not user:
         return jsonify({"message": "User not found"}), 404
 
-    # Calculate user statistics
-    total_orders = GroupOrder.query.filter_by(username=username).count()
-    
-    # Count pooled orders (orders in groups with more than 1 member)
-    pooled_orders = 0
-    user_orders = GroupOrder.query.filter_by(username=username).all()
-    
-    for order in user_orders:
-        group = Group.query.get(order.group_id)
-        if group and len(group.members) > 1:
-            pooled_orders += 1
+    # Calculate user statistics (pooled = group with more than 1 member)
+    total_orders, pooled_orders = order_stats(username)
     
     # Calculate score (50% total orders, 50% pooled orders)
     # Max score is 100
@@ -133,28 +157,56 @@ def update_profile():
 
 
 def get_past_orders():
-    """Fetch past group orders for the logged-in user."""
+    """
+    Fetch past group orders for the logged-in user, newest first
+
+    Query params (all optional):
+        since: ISO-8601 timestamp; only orders created after it are returned
+        limit, cursor: Page through the history; the next page's cursor is
+            sent in the X-Next-Cursor header. Pages hold DEFAULT_PAGE_SIZE
+            orders unless limit is given.
+    """
     claims = get_jwt()
     username = claims.get("username")
 
-    # Fetch all orders for this user
-    orders = (
-        GroupOrder.query.filter_by(username=username)
-        .order_by(GroupOrder.created_at.desc())
-        .all()
+    # Group name/restaurant via the join, items in one batched query per page
+    query = (
+        GroupOrder.query.filter(GroupOrder.username == username)
+        .outerjoin(GroupOrder.group)
+        .options(contains_eager(GroupOrder.group), selectinload(GroupOrder.items))
     )
 
-    order_list = []
-    for o in orders:
-        group = Group.query.get(o.group_id)
-        order_list.append(
-            {
-                "orderId": o.id,
-                "groupName": group.name if group else "Unknown Group",
-                "restaurantId": group.restaurant_id if group else None,
-                "items": [item.to_dict() for item in o.items],
-                "orderDate": o.created_at.isoformat() if o.created_at else None,
-            }
+    try:
+        since = request.args.get("since")
+        if since:
+            since = datetime.fromisoformat(since)
+            # created_at is stored as naive UTC
+            if since.tzinfo is not None:
+                since = since.astimezone(timezone.utc).replace(tzinfo=None)
+            query = query.filter(GroupOrder.created_at > since)
+
+        orders, next_cursor = keyset_page(
+            query,
+            GroupOrder.created_at,
+            GroupOrder.id,
+            request.args.get("cursor"),
+            parse_page_size(request.args.get("limit", type=int)),
         )
-
-    return jsonify(order_list), 200
\ No newline at end of file
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    order_list = [
+        {
+            "orderId": o.id,
+            "groupName": o.group.name if o.group else "Unknown Group",
+            "restaurantId": o.group.restaurant_id if o.group else None,
+            "items": [item.to_dict() for item in o.items],
+            "orderDate": o.created_at.isoformat() if o.created_at else None,
+        }
+        for o in orders
+    ]
+
+    response = jsonify(order_list)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response, 200
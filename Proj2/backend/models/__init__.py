@@ -1,11 +1,15 @@
-from .group import Group, GroupMember
-from .poll import Poll, PollOption, PollVote
+from .group import Group, GroupMember, backfill_geo_cells
+from .poll import Poll, PollOption, PollVote, serialize_polls, adjust_vote_count, recount_poll_votes
 from .user import User
 from .restaurant import Restaurant
 from .menu_item import MenuItem
 from .order import GroupOrder, GroupOrderItem
-from  .loyalty_ledger import LoyaltyLedger
-from .coupon import Coupon
+from  .loyalty_ledger import (LoyaltyLedger, LoyaltySnapshot, ledger_balance, ledger_balances,
+                              take_loyalty_snapshots, verify_loyalty_balances)
+from .coupon import Coupon, ExpiredCoupon, find_active_coupon, archive_expired_coupons
+from .delivery import Delivery, import_deliveries
 
-_all_ = ['User', 'Group', 'GroupMember', 'Poll', 'PollOption', 'PollVote','GroupOrder', 'GroupOrderItem', 'Restaurant'
-         ,'MenuItem',"LoyaltyLedger", "Coupon"]
+_all_ = ['User', 'Group', 'GroupMember', 'backfill_geo_cells', 'Poll', 'PollOption', 'PollVote', 'serialize_polls', 'adjust_vote_count', 'recount_poll_votes','GroupOrder', 'GroupOrderItem', 'Restaurant'
+         ,'MenuItem',"LoyaltyLedger", "LoyaltySnapshot", "ledger_balance", "ledger_balances",
+         "take_loyalty_snapshots", "verify_loyalty_balances", "Coupon", "ExpiredCoupon", "find_active_coupon", "archive_expired_coupons", "Delivery",
+         "import_deliveries"]
@@ -1,5 +1,6 @@
 from datetime import datetime
 from extensions import db
+from sqlalchemy import delete, insert, select
 
 class Coupon(db.Model):
     __tablename__ = "coupons"
@@ -14,6 +15,25 @@ class Coupon(db.Model):
     used = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Covers the rewards summary's unused-coupon list, so Postgres can
+        # answer it with an index-only scan
+        db.Index(
+            "ix_coupons_user_id_expires_at_unused",
+            "user_id",
+            "expires_at",
+            postgresql_where=db.text("used = false"),
+            postgresql_include=["code", "type", "value", "restaurant_id"],
+        ),
+        # Order-time coupon lookups only ever look for one of the user's live codes
+        db.Index(
+            "ix_coupons_user_id_code_unused",
+            "user_id",
+            "code",
+            postgresql_where=db.text("used = false"),
+        ),
+    )
+
     def is_valid(self):
         return not self.used and datetime.utcnow() < self.expires_at
     
@@ -25,4 +45,75 @@ class Coupon(db.Model):
             "restaurant_id":self.restaurant_id,
             "expires_at":self.expires_at.isoformat(),
             "used": self.used,
-        }
\ No newline at end of file
+        }
+
+
+class ExpiredCoupon(db.Model):
+    """
+    A coupon that expired unused, moved out of coupons by archive_expired_coupons
+
+    Keeps the original id and code so ledger entries that mention the code can
+    still be traced.
+    """
+    __tablename__ = "expired_coupons"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    code = db.Column(db.String(32), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    restaurant_id = db.Column(db.Integer, db.ForeignKey("restaurants.id"), nullable=True)
+    type = db.Column(db.String(20), nullable=False)
+    value = db.Column(db.Float, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "code": self.code,
+            "type": self.type,
+            "value": self.value,
+            "restaurant_id": self.restaurant_id,
+            "expires_at": self.expires_at.isoformat(),
+            "archived_at": self.archived_at.isoformat() if self.archived_at else None,
+        }
+
+
+def find_active_coupon(user_id, code):
+    """The user's unused, unexpired coupon with this code, or None (one indexed lookup)"""
+    return (Coupon.query
+            .filter_by(user_id=user_id, code=code, used=False)
+            .filter(Coupon.expires_at > datetime.utcnow())
+            .first())
+
+
+def archive_expired_coupons(batch_size=1000, now=None):
+    """
+    Move unused coupons past their expiry into expired_coupons
+
+    Keeps the unused-coupon indexes down to live coupons. Commits after each batch.
+
+    Returns:
+        int: Coupons archived
+    """
+    now = now or datetime.utcnow()
+    columns = ["id", "code", "user_id", "restaurant_id", "type", "value", "expires_at", "created_at"]
+    archived = 0
+    while True:
+        ids = db.session.execute(
+            select(Coupon.id)
+            .where(Coupon.used == False, Coupon.expires_at <= now)  # noqa: E712
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return archived
+        db.session.execute(
+            insert(ExpiredCoupon).from_select(
+                columns,
+                select(*[getattr(Coupon, name) for name in columns]).where(Coupon.id.in_(ids))
+            )
+        )
+        db.session.execute(
+            delete(Coupon).where(Coupon.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        archived += len(ids)
@@ -0,0 +1,95 @@
+from extensions import db
+from datetime import datetime, timezone
+from sqlalchemy import insert
+
+
+class Delivery(db.Model):
+    """
+    One completed (or in-flight) delivery run for a group order
+
+    The ordered/picked-up/delivered timestamps are the training data for
+    the learned ETA model (see ai_optimization/eta_model.py). The app has no
+    pickup/drop-off tracking, so rows are loaded with import_deliveries().
+    """
+    __tablename__ = "deliveries"
+
+    id = db.Column(db.Integer, primary_key=True)
+    group_id = db.Column(db.Integer, db.ForeignKey("groups.id"), nullable=False, index=True)
+    restaurant_id = db.Column(db.Integer, db.ForeignKey("restaurants.id"), nullable=True)
+    distance_km = db.Column(db.Float, nullable=False)
+    num_stops = db.Column(db.Integer, nullable=False, default=1)
+    ordered_at = db.Column(db.DateTime(timezone=True), nullable=False,
+                           default=lambda: datetime.now(timezone.utc))
+    picked_up_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    delivered_at = db.Column(db.DateTime(timezone=True), nullable=True, index=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "group_id": self.group_id,
+            "restaurant_id": self.restaurant_id,
+            "distance_km": self.distance_km,
+            "num_stops": self.num_stops,
+            "ordered_at": self.ordered_at.isoformat() if self.ordered_at else None,
+            "picked_up_at": self.picked_up_at.isoformat() if self.picked_up_at else None,
+            "delivered_at": self.delivered_at.isoformat() if self.delivered_at else None,
+        }
+
+
+def _parse_timestamp(value):
+    """ISO-8601 timestamp, or None for a blank field; naive values are taken as UTC"""
+    if value is None or not str(value).strip():
+        return None
+    parsed = datetime.fromisoformat(str(value).strip())
+    return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed
+
+
+def import_deliveries(rows, batch_size=1000):
+    """
+    Insert delivery records, e.g. a delivery provider's export, in one transaction
+
+    Args:
+        rows (iterable): Dicts with group_id, distance_km and ordered_at, plus
+            optional restaurant_id, num_stops, picked_up_at and delivered_at
+            (ISO-8601; blank fields count as missing)
+        batch_size (int): Rows per INSERT statement
+
+    Returns:
+        int: Number of deliveries inserted
+
+    Raises:
+        ValueError: If a row is malformed; nothing is inserted
+    """
+    imported = 0
+    batch = []
+    try:
+        for line, row in enumerate(rows, start=1):
+            try:
+                restaurant_id = (row.get("restaurant_id") or "").strip()
+                record = {
+                    "group_id": int(row["group_id"]),
+                    "restaurant_id": int(restaurant_id) if restaurant_id else None,
+                    "distance_km": float(row["distance_km"]),
+                    "num_stops": int(row.get("num_stops") or 1),
+                    "ordered_at": _parse_timestamp(row["ordered_at"]),
+                    "picked_up_at": _parse_timestamp(row.get("picked_up_at")),
+                    "delivered_at": _parse_timestamp(row.get("delivered_at")),
+                }
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"Row {line}: {e}")
+            if record["ordered_at"] is None:
+                raise ValueError(f"Row {line}: ordered_at is required")
+
+            batch.append(record)
+            if len(batch) >= batch_size:
+                db.session.execute(insert(Delivery), batch)
+                imported += len(batch)
+                batch = []
+        if batch:
+            db.session.execute(insert(Delivery), batch)
+            imported += len(batch)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return imported
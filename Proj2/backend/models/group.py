@@ -1,5 +1,8 @@
 from datetime import datetime, timezone
+from sqlalchemy import select, update
+from sqlalchemy.orm import validates
 from extensions import db
+from utils.spatial_index import default_index
 
 
 class Group(db.Model):
@@ -19,6 +22,8 @@ class Group(db.Model):
     longitude = db.Column(db.Float, nullable=True)
     visibility = db.Column(db.String(20), default='public')
     search_radius_km = db.Column(db.Float, default=5.0)
+    # Spatial index cell for latitude/longitude, kept in sync by _sync_geo_cell
+    geo_cell = db.Column(db.String(24), nullable=True, index=True)
 
     next_order_time = db.Column(db.DateTime(timezone=True), nullable=False)
 
@@ -42,8 +47,27 @@ class Group(db.Model):
     total_cents = db.Column(db.Integer,default=0)
     goal_reach = db.Column(db.Boolean, default=False)
 
-    def to_dict(self):
-        return {
+    __table_args__ = (
+        # Keyset pagination on GET /groups walks (created_at, id)
+        db.Index("ix_groups_created_at_id", "created_at", "id"),
+    )
+
+    @validates("latitude", "longitude")
+    def _sync_geo_cell(self, key, value):
+        lat = value if key == "latitude" else self.latitude
+        lon = value if key == "longitude" else self.longitude
+        self.geo_cell = default_index.cell_for(lat, lon)
+        return value
+
+    def to_dict(self, fields=None):
+        """
+        Serialize the group
+
+        Args:
+            fields (iterable): Optional subset of keys to include. Members are
+                only loaded when "members" is requested.
+        """
+        data = {
             "id": self.id,
             "name": self.name,
             "organizer": self.organizer,
@@ -55,13 +79,17 @@ class Group(db.Model):
             "longitude": self.longitude,
             "visibility": self.visibility,
             "searchRadiusKm": self.search_radius_km,
-            "members": [m.username for m in self.members],
             "nextOrderTime": (
                 self.next_order_time.isoformat() if self.next_order_time else None
             ),
             "createdAt": self.created_at.isoformat() if self.created_at else None,
             "updatedAt": self.updated_at.isoformat() if self.updated_at else None,
         }
+        if fields is None or "members" in fields:
+            data["members"] = [m.username for m in self.members]
+        if fields is not None:
+            data = {k: data[k] for k in fields if k in data}
+        return data
 
 
 class GroupMember(db.Model):
@@ -75,3 +103,37 @@ class GroupMember(db.Model):
     __table_args__ = (
         db.UniqueConstraint("group_id", "username", name="unique_group_member"),
     )
+
+
+def backfill_geo_cells(batch_size=1000):
+    """
+    Recompute every Group.geo_cell from its latitude/longitude, in id batches
+
+    Needed for rows written before the column existed, by bulk statements
+    (which skip the validator), or after default_index changes. Commits after
+    each batch.
+
+    Returns:
+        int: Number of groups whose cell changed
+    """
+    changed = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Group.id, Group.latitude, Group.longitude, Group.geo_cell)
+            .where(Group.id > last_id)
+            .order_by(Group.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return changed
+        fixes = [
+            {"id": group_id, "geo_cell": default_index.cell_for(lat, lon)}
+            for group_id, lat, lon, cell in rows
+            if cell != default_index.cell_for(lat, lon)
+        ]
+        if fixes:
+            db.session.execute(update(Group), fixes)
+        db.session.commit()
+        changed += len(fixes)
+        last_id = rows[-1][0]
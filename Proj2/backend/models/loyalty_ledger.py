@@ -1,5 +1,14 @@
 from extensions import db
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, select
+from .user import User
+
+# Values of LoyaltyLedger.type
+LEDGER_TYPES = ("earn", "redeem", "bonus")
+
+# Snapshots only cover ledger rows at least this old, so a transaction that
+# commits a lower ledger id late still lands in the tail after the snapshot
+SNAPSHOT_SETTLE_SECONDS = 300
 
 
 class LoyaltyLedger(db.Model):
@@ -16,6 +25,13 @@ class LoyaltyLedger(db.Model):
 
     user = db.relationship("User",backref="ledger_entries")
 
+    __table_args__ = (
+        # Balance audits sum one user's rows past a snapshot's high-water mark
+        db.Index("ix_loyalty_ledger_user_id_id", "user_id", "id"),
+        # Ledger history pages walk one user's rows newest-first by (created_at, id)
+        db.Index("ix_loyalty_ledger_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -26,4 +42,152 @@ class LoyaltyLedger(db.Model):
             "amount_cents": self.amount_cents,
             "meta": self.meta,
             "created_at": self.created_at.isoformat()
-        }
\ No newline at end of file
+        }
+
+
+class LoyaltySnapshot(db.Model):
+    """
+    A user's loyalty balance as of a point in the ledger
+
+    balance is the sum of the user's ledger points with id <= ledger_high_water.
+    Snapshots are only ever derived from the previous snapshot plus ledger rows,
+    never from User.loyalty_points, so they can be used to audit it.
+    """
+    __tablename__ = "loyalty_snapshots"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    balance = db.Column(db.Integer, nullable=False)
+    ledger_high_water = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Latest snapshot per user
+        db.Index("ix_loyalty_snapshots_user_id_id", "user_id", "id"),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "balance": self.balance,
+            "ledger_high_water": self.ledger_high_water,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+
+
+def ledger_balances(user_ids, upto=None):
+    """
+    Ledger balances for a batch of users from their latest snapshot plus the tail
+
+    Args:
+        user_ids (list): Users to compute
+        upto (int): Ignore ledger rows with a higher id (None: include all)
+
+    Returns:
+        dict: user_id -> (balance, ledger_high_water, tail_rows) for every user
+        in user_ids; users without snapshot or ledger rows get (0, 0, 0)
+    """
+    latest = (
+        select(LoyaltySnapshot.user_id, func.max(LoyaltySnapshot.id).label("id"))
+        .where(LoyaltySnapshot.user_id.in_(user_ids))
+        .group_by(LoyaltySnapshot.user_id)
+        .subquery()
+    )
+    snapshots = (
+        select(LoyaltySnapshot.user_id, LoyaltySnapshot.balance, LoyaltySnapshot.ledger_high_water)
+        .join(latest, LoyaltySnapshot.id == latest.c.id)
+        .subquery()
+    )
+
+    result = {user_id: (0, 0, 0) for user_id in user_ids}
+    for user_id, balance, high_water in db.session.execute(select(snapshots)):
+        result[user_id] = (balance, high_water, 0)
+
+    tail = (
+        select(
+            LoyaltyLedger.user_id,
+            func.sum(LoyaltyLedger.points),
+            func.max(LoyaltyLedger.id),
+            func.count(LoyaltyLedger.id),
+        )
+        .outerjoin(snapshots, snapshots.c.user_id == LoyaltyLedger.user_id)
+        .where(
+            LoyaltyLedger.user_id.in_(user_ids),
+            LoyaltyLedger.id > func.coalesce(snapshots.c.ledger_high_water, 0),
+        )
+        .group_by(LoyaltyLedger.user_id)
+    )
+    if upto is not None:
+        tail = tail.where(LoyaltyLedger.id <= upto)
+    for user_id, points, high_water, rows in db.session.execute(tail):
+        balance = result[user_id][0]
+        result[user_id] = (balance + int(points or 0), high_water, rows)
+    return result
+
+
+def ledger_balance(user_id):
+    """A single user's ledger balance: one snapshot plus the ledger rows after it"""
+    return ledger_balances([user_id])[user_id][0]
+
+
+def _user_id_batches(batch_size):
+    """Stream (user_id, loyalty_points) rows in ascending id batches (keyset on id)"""
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(User.id, User.loyalty_points)
+            .where(User.id > last_id)
+            .order_by(User.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def take_loyalty_snapshots(batch_size=1000, settle_seconds=SNAPSHOT_SETTLE_SECONDS):
+    """
+    Write a new snapshot for every user with ledger activity since their last one
+
+    Commits after each batch.
+
+    Returns:
+        int: Snapshots written
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settle_seconds)
+    upto = db.session.execute(
+        select(func.max(LoyaltyLedger.id)).where(LoyaltyLedger.created_at <= cutoff)
+    ).scalar()
+    if upto is None:
+        return 0
+
+    written = 0
+    for rows in _user_id_batches(batch_size):
+        balances = ledger_balances([user_id for user_id, _ in rows], upto=upto)
+        new = [
+            {"user_id": user_id, "balance": balance, "ledger_high_water": high_water}
+            for user_id, (balance, high_water, tail_rows) in balances.items()
+            if tail_rows
+        ]
+        if new:
+            db.session.execute(insert(LoyaltySnapshot), new)
+        db.session.commit()
+        written += len(new)
+    return written
+
+
+def verify_loyalty_balances(batch_size=1000):
+    """
+    Compare every user's stored loyalty_points with the ledger, in batches
+
+    Yields:
+        tuple: (user_id, stored_points, ledger_points) for each user that drifted
+    """
+    for rows in _user_id_batches(batch_size):
+        balances = ledger_balances([user_id for user_id, _ in rows])
+        for user_id, stored in rows:
+            expected = balances[user_id][0]
+            if (stored or 0) != expected:
+                yield user_id, stored or 0, expected
@@ -14,9 +14,12 @@ class GroupOrder(db.Model):
     items = db.relationship(
         "GroupOrderItem", backref="order", lazy=True, cascade="all, delete-orphan"
     )
+    group = db.relationship("Group", lazy=True)
 
     __table_args__ = (
         db.UniqueConstraint("group_id", "username", name="unique_group_order"),
+        # Order history pages walk one user's orders by (created_at, id)
+        db.Index("ix_group_orders_username_created_at_id", "username", "created_at", "id"),
     )
 
     def to_dict(self):
@@ -1,4 +1,6 @@
+from collections import defaultdict
 from datetime import datetime
+from sqlalchemy import func, select, update
 from extensions import db
 
 
@@ -13,13 +15,25 @@ class Poll(db.Model):
 
     # Relationships
     options = db.relationship(
-        "PollOption", backref="poll", lazy=True, cascade="all, delete-orphan"
+        "PollOption",
+        backref="poll",
+        lazy=True,
+        cascade="all, delete-orphan",
+        order_by="PollOption.id",
     )
     votes = db.relationship(
         "PollVote", backref="poll", lazy=True, cascade="all, delete-orphan"
     )
 
-    def to_dict(self):
+    def to_dict(self, voted_users=None):
+        """
+        Serialize the poll
+
+        Args:
+            voted_users (iterable): Optional usernames precomputed by serialize_polls
+        """
+        if voted_users is None:
+            voted_users = set([v.username for v in self.votes])
         return {
             "id": self.id,
             "groupId": self.group_id,
@@ -27,7 +41,7 @@ class Poll(db.Model):
             "createdBy": self.created_by,
             "createdOn": self.created_at.isoformat() if self.created_at else None,
             "options": [opt.to_dict() for opt in self.options],
-            "votedUsers": list(set([v.username for v in self.votes])),
+            "votedUsers": list(voted_users),
         }
 
 
@@ -37,12 +51,14 @@ class PollOption(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     poll_id = db.Column(db.Integer, db.ForeignKey("polls.id"), nullable=False)
     text = db.Column(db.String(200), nullable=False)
+    # Denormalized number of PollVotes for this option. Only ever changed with
+    # atomic UPDATEs (see vote_on_poll); recount_poll_votes repairs drift.
+    # Databases created before this column need sql/002_poll_options_vote_count.sql
+    # and then `flask recount-poll-votes`, or every option reads 0 votes.
+    vote_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     def to_dict(self):
-        votes_count = PollVote.query.filter_by(
-            poll_id=self.poll_id, option_id=self.id
-        ).count()
-        return {"id": self.id, "text": self.text, "votes": votes_count}
+        return {"id": self.id, "text": self.text, "votes": self.vote_count or 0}
 
 
 class PollVote(db.Model):
@@ -57,3 +73,63 @@ class PollVote(db.Model):
     __table_args__ = (
         db.UniqueConstraint("poll_id", "username", name="unique_poll_vote"),
     )
+
+
+def serialize_polls(polls):
+    """
+    Serialize several polls with a constant number of queries
+
+    Vote counts are read from PollOption.vote_count and the voters of every
+    poll come from one query. Load Poll.options eagerly (selectinload) to
+    avoid a query per poll.
+    """
+    poll_ids = [p.id for p in polls]
+    if not poll_ids:
+        return []
+
+    voted_users = defaultdict(set)
+    rows = db.session.query(PollVote.poll_id, PollVote.username).filter(
+        PollVote.poll_id.in_(poll_ids)
+    )
+    for poll_id, username in rows:
+        voted_users[poll_id].add(username)
+
+    return [p.to_dict(voted_users[p.id]) for p in polls]
+
+
+def adjust_vote_count(option_id, poll_id, delta):
+    """
+    Atomically add delta to an option's vote_count in the current transaction
+
+    Returns:
+        bool: False if the option does not belong to the poll
+    """
+    result = db.session.execute(
+        update(PollOption)
+        .where(PollOption.id == option_id, PollOption.poll_id == poll_id)
+        .values(vote_count=PollOption.vote_count + delta)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def recount_poll_votes():
+    """
+    Recompute every PollOption.vote_count from poll_votes and commit
+
+    Returns:
+        int: Number of options whose counter had drifted
+    """
+    actual = (
+        select(func.count(PollVote.id))
+        .where(PollVote.option_id == PollOption.id, PollVote.poll_id == PollOption.poll_id)
+        .scalar_subquery()
+    )
+    result = db.session.execute(
+        update(PollOption)
+        .where(PollOption.vote_count != actual)
+        .values(vote_count=actual)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
@@ -2,17 +2,220 @@
 Delivery Routes
 API endpoints for AI-powered delivery optimization
 """
-from flask import Blueprint, jsonify, request
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from flask import Blueprint, current_app, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt
+from sqlalchemy import or_
+from sqlalchemy.orm import selectinload
 from ai_optimization.eta_predictor import ETAPredictor
 from ai_optimization.clustering import DemandClusterer
+from ai_optimization.incremental_clustering import IncrementalClusterer
+from ai_optimization.location_service import LocationService
+from ai_optimization.routing import RouteOptimizer
+from models import Group, GroupMember, User
+from utils.cache import TTLCache
 
 delivery_bp = Blueprint('delivery', __name__)
 
-# Initialize ETA predictor (reuse across requests)
-eta_predictor = ETAPredictor()
+# Initialize ETA predictor (reuse across requests); uses the trained model
+# artifact when one exists (see `flask train-eta-model`)
+eta_predictor = ETAPredictor.from_artifact()
 demand_clusterer = DemandClusterer()
 
+# Upper bound on trips per /predict-eta/batch request
+MAX_ETA_BATCH = 1000
+
+# DBSCAN labels for recently seen cluster-locations inputs, keyed by
+# clustering_fingerprint(); a hit skips the DBSCAN fit entirely
+CLUSTER_CACHE_SIZE = 256
+CLUSTER_CACHE_TTL_SECONDS = 300
+CLUSTER_CACHE_PRECISION = 6  # decimal places of lat/lng (~0.1 m)
+cluster_cache = TTLCache(maxsize=CLUSTER_CACHE_SIZE, ttl_seconds=CLUSTER_CACHE_TTL_SECONDS)
+
+# Route optimizer shares the predictor so routes and ETAs agree. The last
+# plan per (restaurant, groups, vehicles) seeds the next solve for that run.
+route_optimizer = RouteOptimizer(eta_predictor)
+MAX_ROUTE_TIME_LIMIT_MS = 5000
+MAX_ROUTE_GROUPS = 20
+MAX_ROUTE_STOPS = 200
+ROUTE_PLAN_CACHE_TTL_SECONDS = 1800
+route_plans = TTLCache(maxsize=256, ttl_seconds=ROUTE_PLAN_CACHE_TTL_SECONDS)
+
+# Distances between restaurants, groups and users, kept current by
+# track_group_location() / track_user_location()
+location_service = LocationService()
+
+# Clusters of active, located groups. Loaded from the database on first use
+# and reloaded every POOL_CLUSTERS_REFRESH_SECONDS, which picks up changes made
+# by other workers or directly in the database; in between, this worker's group
+# routes keep it current via track_group_location(). Reloads run on a
+# background thread, one at a time, while requests keep using the old state.
+pool_clusters = IncrementalClusterer()
+POOL_CLUSTERS_REFRESH_SECONDS = 60
+pool_clusters_loading = threading.Lock()
+pool_clusters_reloader = None  # thread running the latest background reload
+
+
+def _parse_trip(data):
+    """
+    Read and validate one trip's ETA inputs
+    
+    Returns:
+        tuple: (distance_km, num_stops, traffic_factor, restaurant_id)
+    
+    Raises:
+        ValueError: With a client-facing message if the trip is invalid
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Each trip must be an object')
+    try:
+        distance_km = float(data.get('distance_km', 5.0))
+        num_stops = int(data.get('num_stops', 1))
+        traffic_factor = float(data.get('traffic_factor', 1.0))
+        restaurant_id = data.get('restaurant_id')
+        restaurant_id = int(restaurant_id) if restaurant_id is not None else None
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'Invalid input: {str(e)}')
+    
+    if distance_km <= 0:
+        raise ValueError('Distance must be positive')
+    if num_stops < 1:
+        raise ValueError('Must have at least 1 stop')
+    if traffic_factor < 0.5 or traffic_factor > 3.0:
+        raise ValueError('Traffic factor must be between 0.5 and 3.0')
+    return distance_km, num_stops, traffic_factor, restaurant_id
+
+
+def clustering_fingerprint(locations, max_distance_km, min_cluster_size, metric):
+    """
+    Hash everything the DBSCAN labels depend on, in input order
+    
+    Coordinates are rounded to CLUSTER_CACHE_PRECISION so float noise in
+    repeated requests still hits the cache.
+    """
+    digest = hashlib.sha256(f"{max_distance_km}|{min_cluster_size}|{metric}".encode())
+    for loc in locations:
+        lat = round(float(loc['lat']), CLUSTER_CACHE_PRECISION)
+        lng = round(float(loc['lng']), CLUSTER_CACHE_PRECISION)
+        digest.update(f";{lat},{lng},{loc['group_id']}".encode())
+    return digest.hexdigest()
+
+
+def _aware(dt):
+    """Stored datetime as an aware value; naive values (SQLite) are taken as UTC"""
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+
+def _epoch(dt):
+    """Timestamp for a stored datetime (see _aware)"""
+    return _aware(dt).timestamp()
+
+
+def load_pool_clusters():
+    """(Re)build pool_clusters from every active group that has a location"""
+    # Left unexecuted so the query runs inside load(), after it starts
+    # recording concurrent updates
+    rows = (
+        Group.query
+        .with_entities(Group.id, Group.latitude, Group.longitude, Group.name, Group.next_order_time)
+        .filter(
+            Group.latitude.isnot(None),
+            Group.longitude.isnot(None),
+            Group.next_order_time > datetime.now(timezone.utc),
+        )
+    )
+    pool_clusters.load(
+        (group_id, lat, lng, name, _epoch(next_order_time))
+        for group_id, lat, lng, name, next_order_time in rows
+    )
+
+
+def track_group_location(group):
+    """
+    Sync one committed group into location_service and pool_clusters
+
+    Call after creating a group or changing its location or nextOrderTime.
+    The clusters are left alone until first loaded, since loading reads the
+    current state anyway.
+    """
+    if group.latitude is None or group.longitude is None:
+        location_service.remove_point(('group', group.id))
+    elif ('group', group.id) in location_service:
+        location_service.set_point(('group', group.id), group.latitude, group.longitude)
+    
+    if not pool_clusters.loaded:
+        return
+    if group.latitude is None or group.longitude is None:
+        pool_clusters.remove(group.id)
+        return
+    expires_at = _epoch(group.next_order_time)
+    if expires_at <= datetime.now(timezone.utc).timestamp():
+        pool_clusters.remove(group.id)
+        return
+    pool_clusters.upsert(group.id, group.latitude, group.longitude, group.name, expires_at)
+
+
+def track_user_location(user):
+    """
+    Sync one committed user's location into location_service
+
+    Only points already in use are moved; others are added on first use.
+    """
+    key = ('user', user.id)
+    if user.latitude is None or user.longitude is None:
+        location_service.remove_point(key)
+    elif key in location_service:
+        location_service.set_point(key, user.latitude, user.longitude)
+
+
+def _reload_pool_clusters_in_background():
+    """Start a background reload of pool_clusters unless one is already running"""
+    global pool_clusters_reloader
+    if not pool_clusters_loading.acquire(blocking=False):
+        return
+    app = current_app._get_current_object()
+
+    def reload():
+        try:
+            with app.app_context():
+                load_pool_clusters()
+        finally:
+            pool_clusters_loading.release()
+
+    pool_clusters_reloader = threading.Thread(target=reload, name='pool-clusters-reload', daemon=True)
+    pool_clusters_reloader.start()
+
+
+def _refresh_pool_clusters():
+    """
+    Load pool_clusters on first use, reload it when stale and drop groups whose deadline has passed
+
+    Only the first load blocks the request; later reloads run in the background.
+    """
+    if not pool_clusters.loaded:
+        with pool_clusters_loading:
+            if not pool_clusters.loaded:
+                load_pool_clusters()
+    elif time.monotonic() - pool_clusters.loaded_at >= POOL_CLUSTERS_REFRESH_SECONDS:
+        _reload_pool_clusters_in_background()
+    pool_clusters.expire(datetime.now(timezone.utc).timestamp())
+
+
+def lookup_pool_cluster(group_id):
+    """
+    Get the cached cluster for an active group
+
+    Returns:
+        dict: Cluster info as from DemandClusterer, or None if the group is
+        unknown, expired or has no location
+    """
+    _refresh_pool_clusters()
+    return pool_clusters.cluster_for(group_id)
+
 @delivery_bp.route('/predict-eta', methods=['POST'])
 @jwt_required()
 def predict_eta():
@@ -23,7 +226,8 @@ def predict_eta():
     {
         "distance_km": 5.0,
         "num_stops": 1,
-        "traffic_factor": 1.0  (optional)
+        "traffic_factor": 1.0,  (optional)
+        "restaurant_id": 3      (optional, used by the learned model)
     }
     
     Returns:
@@ -39,29 +243,122 @@ def predict_eta():
         data = request.json
         
         # Validate inputs
-        distance_km = float(data.get('distance_km', 5.0))
-        num_stops = int(data.get('num_stops', 1))
-        traffic_factor = float(data.get('traffic_factor', 1.0))
-        
-        # Input validation
-        if distance_km <= 0:
-            return jsonify({'error': 'Distance must be positive'}), 400
-        if num_stops < 1:
-            return jsonify({'error': 'Must have at least 1 stop'}), 400
-        if traffic_factor < 0.5 or traffic_factor > 3.0:
-            return jsonify({'error': 'Traffic factor must be between 0.5 and 3.0'}), 400
+        distance_km, num_stops, traffic_factor, restaurant_id = _parse_trip(data)
         
         # Predict ETA
-        eta_info = eta_predictor.predict_eta(distance_km, num_stops, traffic_factor)
+        eta_info = eta_predictor.predict_eta(distance_km, num_stops, traffic_factor, restaurant_id)
         
         return jsonify(eta_info), 200
     
     except ValueError as e:
-        return jsonify({'error': f'Invalid input: {str(e)}'}), 400
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@delivery_bp.route('/predict-eta/batch', methods=['POST'])
+@jwt_required()
+def predict_eta_batch():
+    """
+    Predict ETAs for many trips in one request
+    
+    Request body:
+    {
+        "trips": [
+            {"distance_km": 5.0, "num_stops": 1, "traffic_factor": 1.0, "restaurant_id": 3},
+            {"distance_km": -1}
+        ]
+    }
+    
+    Returns results in input order; invalid trips get an error entry
+    instead of failing the whole batch:
+    {
+        "results": [
+            {"eta": "...", "total_minutes": 31, ...},
+            {"error": "Distance must be positive"}
+        ],
+        "count": 2,
+        "error_count": 1
+    }
+    """
+    try:
+        data = request.json or {}
+        trips = data.get('trips')
+        
+        if not isinstance(trips, list) or not trips:
+            return jsonify({'error': 'trips must be a non-empty list'}), 400
+        if len(trips) > MAX_ETA_BATCH:
+            return jsonify({'error': f'At most {MAX_ETA_BATCH} trips per request'}), 400
+        
+        results = [None] * len(trips)
+        valid_indexes, valid_trips = [], []
+        for index, trip in enumerate(trips):
+            try:
+                valid_trips.append(_parse_trip(trip))
+                valid_indexes.append(index)
+            except ValueError as e:
+                results[index] = {'error': str(e)}
+        
+        if valid_trips:
+            distances, stops, factors, restaurant_ids = zip(*valid_trips)
+            predictions = eta_predictor.predict_eta_batch(distances, stops, factors, restaurant_ids)
+            for index, prediction in zip(valid_indexes, predictions):
+                results[index] = prediction
+        
+        return jsonify({
+            'results': results,
+            'count': len(results),
+            'error_count': len(trips) - len(valid_trips)
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _parse_local_time(data):
+    """
+    Resolve the pickup time for a rush-hour prediction
+    
+    "time" (ISO-8601) wins over "hour". Naive times and bare hours are read in
+    "timezone" (IANA name) when given, otherwise in the server's local zone.
+    
+    Returns:
+        datetime: Timezone-aware pickup time in the delivery's local zone
+    
+    Raises:
+        ValueError: With a client-facing message if the inputs are invalid
+    """
+    tz_name = data.get('timezone')
+    tz = None
+    if tz_name is not None:
+        try:
+            tz = ZoneInfo(str(tz_name))
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown timezone: {tz_name}")
+    
+    now = datetime.now(tz) if tz else datetime.now().astimezone()
+    
+    if data.get('time') is not None:
+        try:
+            when = datetime.fromisoformat(str(data['time']))
+        except ValueError:
+            raise ValueError("time must be an ISO-8601 datetime")
+        if when.tzinfo is None:
+            return when.replace(tzinfo=tz) if tz else when.astimezone()
+        return when.astimezone(tz) if tz else when
+    
+    if data.get('hour') is not None:
+        try:
+            hour = int(data['hour'])
+        except (TypeError, ValueError):
+            raise ValueError("hour must be an integer")
+        if not 0 <= hour <= 23:
+            raise ValueError("hour must be between 0 and 23")
+        return now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    
+    return now
+
+
 @delivery_bp.route('/predict-eta-with-rush-hour', methods=['POST'])
 @jwt_required()
 def predict_eta_with_rush_hour():
@@ -72,7 +369,10 @@ def predict_eta_with_rush_hour():
     {
         "distance_km": 5.0,
         "num_stops": 1,
-        "hour": 18  (optional, defaults to current hour)
+        "hour": 18,                       (optional, defaults to current hour)
+        "time": "2025-01-06T18:30:00",    (optional, ISO-8601; overrides hour)
+        "timezone": "America/New_York"    (optional, zone for hour/time;
+                                           defaults to the server's zone)
     }
     """
     try:
@@ -80,16 +380,14 @@ def predict_eta_with_rush_hour():
         
         distance_km = float(data.get('distance_km', 5.0))
         num_stops = int(data.get('num_stops', 1))
-        hour = data.get('hour')
-        
-        # Get base ETA
-        base_eta = eta_predictor.predict_eta(distance_km, num_stops, 1.0)
+        when = _parse_local_time(data)
         
-        # Adjust for time of day
-        adjusted_eta = eta_predictor.adjust_for_time_of_day(base_eta, hour)
+        eta = eta_predictor.predict_eta(distance_km, num_stops, 1.0, when=when, time_of_day=True)
         
-        return jsonify(adjusted_eta), 200
+        return jsonify(eta), 200
     
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -107,7 +405,9 @@ def cluster_locations():
             {"lat": 35.7806, "lng": -78.6392, "group_id": 2, "group_name": "Sushi Station"}
         ],
         "max_distance_km": 2.0,  // optional
-        "min_cluster_size": 2    // optional
+        "min_cluster_size": 2,   // optional
+        "metric": "haversine",   // optional, "euclidean" (default) or "haversine"
+        "exact_radius": false    // optional, geodesic cluster radii (slower)
     }
     
     Returns:
@@ -122,6 +422,8 @@ def cluster_locations():
         locations = data.get('locations', [])
         max_distance_km = float(data.get('max_distance_km', 2.0))
         min_cluster_size = int(data.get('min_cluster_size', 2))
+        metric = data.get('metric', 'euclidean')
+        exact_radius = bool(data.get('exact_radius', False))
         
         # Validate inputs
         if not locations:
@@ -133,6 +435,9 @@ def cluster_locations():
         if min_cluster_size < 2:
             return jsonify({'error': 'Min cluster size must be at least 2'}), 400
         
+        if metric not in DemandClusterer.METRICS:
+            return jsonify({'error': 'Metric must be euclidean or haversine'}), 400
+        
         # Validate location format
         for loc in locations:
             if 'lat' not in loc or 'lng' not in loc or 'group_id' not in loc:
@@ -141,11 +446,19 @@ def cluster_locations():
         # Create clusterer with custom parameters
         clusterer = DemandClusterer(
             max_distance_km=max_distance_km,
-            min_cluster_size=min_cluster_size
+            min_cluster_size=min_cluster_size,
+            metric=metric,
+            exact_radius=exact_radius
         )
         
-        # Perform clustering
-        clusters = clusterer.cluster_deliveries(locations)
+        # Perform clustering, reusing labels for an identical recent request
+        key = clustering_fingerprint(locations, max_distance_km, min_cluster_size, metric)
+        labels = cluster_cache.get(key)
+        if labels is None:
+            labels = clusterer.fit_labels(locations)
+            labels.setflags(write=False)
+            cluster_cache.set(key, labels)
+        clusters = clusterer.cluster_deliveries(locations, labels=labels)
         statistics = clusterer.get_cluster_statistics(clusters)
         
         return jsonify({
@@ -153,7 +466,9 @@ def cluster_locations():
             'statistics': statistics,
             'parameters': {
                 'max_distance_km': max_distance_km,
-                'min_cluster_size': min_cluster_size
+                'min_cluster_size': min_cluster_size,
+                'metric': metric,
+                'exact_radius': exact_radius
             }
         }), 200
     
@@ -161,6 +476,62 @@ def cluster_locations():
         return jsonify({'error': str(e)}), 500
 
 
+def _my_cluster_response(my_cluster, group_id):
+    """Build the find-my-cluster payload; noise points are reported as isolated"""
+    if my_cluster is None or my_cluster.get('is_noise'):
+        return {
+            'in_cluster': False,
+            'message': 'Group is not part of any cluster (isolated location)'
+        }
+    return {
+        'in_cluster': True,
+        'cluster': my_cluster,
+        'cluster_mates': [loc['group_name'] for loc in my_cluster['groups'] if loc.get('group_id') != group_id]
+    }
+
+
+@delivery_bp.route('/active-groups-for-clustering', methods=['GET'])
+@jwt_required()
+def active_groups_for_clustering():
+    """
+    List active groups that have a location, in cluster-locations input format
+    
+    Returns:
+    {
+        "locations": [{"lat": ..., "lng": ..., "group_id": ..., "group_name": ...}],
+        "count": 2
+    }
+    """
+    try:
+        _refresh_pool_clusters()
+        locations = pool_clusters.locations()
+        return jsonify({'locations': locations, 'count': len(locations)}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@delivery_bp.route('/find-my-cluster/<int:group_id>', methods=['GET'])
+@jwt_required()
+def find_my_cluster_by_group(group_id):
+    """
+    Find which cluster an active group belongs to, using server-held locations
+    
+    Answers from the cached cluster assignments of all active located groups,
+    so the client does not upload or recluster any locations.
+    
+    Returns the same shape as POST /find-my-cluster
+    """
+    try:
+        my_cluster = lookup_pool_cluster(group_id)
+        if my_cluster is None:
+            return jsonify({'error': 'Group is not active or has no location'}), 404
+        
+        return jsonify(_my_cluster_response(my_cluster, group_id)), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @delivery_bp.route('/find-my-cluster', methods=['POST'])
 @jwt_required()
 def find_my_cluster():
@@ -170,7 +541,8 @@ def find_my_cluster():
     Request body:
     {
         "group_id": 1,
-        "all_locations": [...]
+        "all_locations": [...]  // optional; without it the server-held
+                                // active group locations are used
     }
     
     Returns cluster information for the specified group
@@ -183,43 +555,191 @@ def find_my_cluster():
         
         if not group_id:
             return jsonify({'error': 'group_id required'}), 400
+        try:
+            group_id = int(group_id)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'group_id must be an integer'}), 400
         
         if not locations:
-            return jsonify({'error': 'all_locations required'}), 400
+            my_cluster = lookup_pool_cluster(group_id)
+            if my_cluster is None:
+                return jsonify({'error': 'Group is not active or has no location'}), 404
+            return jsonify(_my_cluster_response(my_cluster, group_id)), 200
         
         # Cluster all locations
         clusters = demand_clusterer.cluster_deliveries(locations)
         
         # Find the cluster containing this group
-        my_cluster = None
-        for cluster in clusters:
-            for loc in cluster['groups']:
-                if loc.get('group_id') == group_id:
-                    my_cluster = cluster
-                    break
-            if my_cluster:
-                break
-        
-        if not my_cluster:
-            return jsonify({
-                'in_cluster': False,
-                'message': 'Group is not part of any cluster (isolated location)'
-            }), 200
+        my_cluster = next(
+            (c for c in clusters if any(loc.get('group_id') == group_id for loc in c['groups'])),
+            None
+        )
         
-        return jsonify({
-            'in_cluster': True,
-            'cluster': my_cluster,
-            'cluster_mates': [loc['group_name'] for loc in my_cluster['groups'] if loc.get('group_id') != group_id]
-        }), 200
+        return jsonify(_my_cluster_response(my_cluster, group_id)), 200
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def route_stops_for_groups(group_ids):
+    """
+    Drop-off points for the members of the given groups
+    
+    Members with a saved location get their own stop; a group whose members
+    have none is delivered to the group's own location. Every stop must be
+    reached by its group's next_order_time.
+    
+    Returns:
+        list: Stops in RouteOptimizer.optimize() format, each with the
+        location_service key of its point
+    """
+    groups = (
+        Group.query
+        .filter(Group.id.in_(group_ids))
+        .options(selectinload(Group.members))
+        .order_by(Group.id)
+        .all()
+    )
+    usernames = {m.username for g in groups for m in g.members}
+    located = {
+        username: (user_id, lat, lng)
+        for user_id, username, lat, lng in User.query
+        .with_entities(User.id, User.username, User.latitude, User.longitude)
+        .filter(User.username.in_(usernames), User.latitude.isnot(None), User.longitude.isnot(None))
+    } if usernames else {}
+    
+    stops = []
+    for group in groups:
+        deadline = _aware(group.next_order_time)
+        points = [
+            (('user', located[m.username][0]), located[m.username][1], located[m.username][2])
+            for m in sorted(group.members, key=lambda m: m.username) if m.username in located
+        ]
+        if not points and group.latitude is not None and group.longitude is not None:
+            points = [(('group', group.id), group.latitude, group.longitude)]
+        stops.extend(
+            {'stop_id': f"{group.id}-{i}", 'lat': lat, 'lng': lng, 'group_id': group.id,
+             'deadline': deadline, 'location_key': key}
+            for i, (key, lat, lng) in enumerate(points, start=1)
+        )
+    return stops
+
+
+def groups_visible_to(username, group_ids):
+    """The subset of group_ids that username organizes or is a member of"""
+    return {
+        group_id for (group_id,) in Group.query
+        .with_entities(Group.id)
+        .filter(
+            Group.id.in_(group_ids),
+            or_(Group.organizer == username, Group.members.any(GroupMember.username == username)),
+        )
+    }
+
+
+def _public_plan(plan):
+    """
+    A route plan without anything that locates a member
+
+    Stops keep their opaque id, group, order and timing; coordinates and leg
+    distances stay on the server.
+    """
+    keep = ('stop_id', 'group_id', 'sequence', 'arrival_minutes', 'on_time', 'eta')
+    return {
+        **plan,
+        'routes': [
+            {**route, 'stops': [{k: stop[k] for k in keep} for stop in route['stops']]}
+            for route in plan['routes']
+        ]
+    }
+
+
+@delivery_bp.route('/optimize-route', methods=['POST'])
+@jwt_required()
+def optimize_route():
+    """
+    Order the drop-offs of a pooled delivery run
+    
+    The caller must organize or belong to every group on the run. Stops are
+    identified as "<group_id>-<n>" and carry no coordinates or usernames.
+    
+    Request body:
+    {
+        "restaurant": {"lat": 35.7796, "lng": -78.6382, "restaurant_id": 1},
+        "group_ids": [1, 2],     // at most MAX_ROUTE_GROUPS
+        "num_vehicles": 1,       // optional
+        "time_limit_ms": 1000    // optional, at most MAX_ROUTE_TIME_LIMIT_MS
+    }
+    
+    Returns the RouteOptimizer result: stop order per vehicle, total km and
+    a predicted ETA per stop. Repeated calls for the same run start from the
+    previous plan.
+    """
+    try:
+        data = request.json or {}
+        restaurant = data.get('restaurant') or {}
+        group_ids = data.get('group_ids') or []
+        
+        try:
+            restaurant = {
+                'lat': float(restaurant['lat']),
+                'lng': float(restaurant['lng']),
+                'restaurant_id': (int(restaurant['restaurant_id'])
+                                  if restaurant.get('restaurant_id') is not None else None)
+            }
+            group_ids = sorted({int(g) for g in group_ids})
+            num_vehicles = int(data.get('num_vehicles', 1))
+            time_limit_ms = int(data.get('time_limit_ms', route_optimizer.time_limit_ms))
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'restaurant lat/lng and integer group_ids are required'}), 400
+        
+        if not group_ids:
+            return jsonify({'error': 'group_ids required'}), 400
+        if len(group_ids) > MAX_ROUTE_GROUPS:
+            return jsonify({'error': f'At most {MAX_ROUTE_GROUPS} groups per run'}), 400
+        if not 1 <= num_vehicles <= 10:
+            return jsonify({'error': 'num_vehicles must be between 1 and 10'}), 400
+        if not 1 <= time_limit_ms <= MAX_ROUTE_TIME_LIMIT_MS:
+            return jsonify({'error': f'time_limit_ms must be between 1 and {MAX_ROUTE_TIME_LIMIT_MS}'}), 400
+        
+        username = get_jwt().get('username')
+        if groups_visible_to(username, group_ids) != set(group_ids):
+            return jsonify({'error': 'You can only route groups you organize or belong to'}), 403
+        
+        stops = route_stops_for_groups(group_ids)
+        if not stops:
+            return jsonify({'error': 'No drop-off locations for these groups'}), 400
+        if len(stops) > MAX_ROUTE_STOPS:
+            return jsonify({'error': f'At most {MAX_ROUTE_STOPS} drop-offs per run'}), 400
+        
+        # Register the run's points; unchanged ones keep their cached distances
+        restaurant_key = ('restaurant', restaurant['restaurant_id']
+                          or (restaurant['lat'], restaurant['lng']))
+        distances_km = location_service.track(
+            [(restaurant_key, restaurant['lat'], restaurant['lng'])]
+            + [(stop['location_key'], stop['lat'], stop['lng']) for stop in stops]
+        )
+        
+        plan_key = (restaurant['lat'], restaurant['lng'], tuple(group_ids), num_vehicles)
+        plan = route_optimizer.optimize(
+            restaurant, stops, num_vehicles=num_vehicles, distances_km=distances_km,
+            previous=route_plans.get(plan_key), time_limit_ms=time_limit_ms
+        )
+        route_plans.set(plan_key, plan)
+        
+        return jsonify(_public_plan(plan)), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @delivery_bp.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
         'service': 'AI Delivery Optimization',
-        'features': ['eta_prediction', 'demand_clustering']
+        'features': ['eta_prediction', 'demand_clustering', 'route_optimization'],
+        'eta_model': eta_predictor.model_source,
+        'cluster_cache': cluster_cache.stats(),
+        'location_service': location_service.stats()
     }), 200
\ No newline at end of file
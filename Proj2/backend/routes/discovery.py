@@ -3,11 +3,15 @@ Discovery routes for proximity-based pool search
 """
 from flask import request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt
+from sqlalchemy.orm import selectinload
 from datetime import datetime, timezone
+import numpy as np
 from extensions import db
 from models import Group, GroupMember, User
-from utils.distance import calculate_distance
+from utils.distance import distances_from
+from utils.spatial_index import default_index
 from . import bp
+from .delivery import track_user_location
 
 
 @bp.route("/discovery/nearby-pools", methods=["GET"])
@@ -30,7 +34,7 @@ def get_nearby_pools():
         if lat is None or lon is None:
             return jsonify({"error": "Latitude and longitude required"}), 400
         
-        # Get all active groups
+        # Get active groups, narrowed to the grid cells around the user
         query = Group.query.filter(
             Group.next_order_time > datetime.now(timezone.utc),
             Group.visibility == 'public'
@@ -39,31 +43,35 @@ def get_nearby_pools():
         if restaurant_id:
             query = query.filter(Group.restaurant_id == restaurant_id)
         
-        groups = query.all()
+        query = default_index.filter_query(
+            query, Group.latitude, Group.longitude, Group.geo_cell, lat, lon, radius
+        )
+        # Load members for all candidates in one query instead of one per group
+        groups = query.options(selectinload(Group.members)).all()
+        
+        # Calculate exact distances for all candidates in one pass
+        distances = distances_from(
+            lat, lon, [g.latitude for g in groups], [g.longitude for g in groups]
+        )
         
-        # Filter by distance and enrich with distance data
+        # The user's memberships in one query, instead of scanning each pool's members
+        my_group_ids = {
+            group_id for (group_id,) in
+            db.session.query(GroupMember.group_id).filter(GroupMember.username == username)
+        }
+        
+        # Keep those within radius, closest first
         nearby_pools = []
-        for group in groups:
-            # Skip if group doesn't have location
-            if not group.latitude or not group.longitude:
-                continue
+        for idx in np.argsort(distances, kind="stable"):
+            if distances[idx] > radius:
+                break
+            pool_data = groups[idx].to_dict()
+            pool_data['distance_km'] = round(float(distances[idx]), 2)
             
-            # Calculate distance
-            distance = calculate_distance(lat, lon, group.latitude, group.longitude)
+            # Check if user is already a member
+            pool_data['is_member'] = groups[idx].id in my_group_ids
             
-            # Only include if within radius
-            if distance <= radius:
-                pool_data = group.to_dict()
-                pool_data['distance_km'] = distance
-                
-                # Check if user is already a member
-                is_member = any(m.username == username for m in group.members)
-                pool_data['is_member'] = is_member
-                
-                nearby_pools.append(pool_data)
-        
-        # Sort by distance (closest first)
-        nearby_pools.sort(key=lambda x: x['distance_km'])
+            nearby_pools.append(pool_data)
         
         return jsonify(nearby_pools), 200
         
@@ -92,6 +100,7 @@ def update_user_location():
         user.location_updated_at = datetime.now(timezone.utc)
         
         db.session.commit()
+        track_user_location(user)
         
         return jsonify({
             "message": "Location updated successfully",
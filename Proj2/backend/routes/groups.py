@@ -1,19 +1,72 @@
 from flask import request, jsonify
 from datetime import datetime
 from flask_jwt_extended import jwt_required, get_jwt
+from sqlalchemy.orm import selectinload
 from extensions import db
 from models import Group, GroupMember
 from . import bp
 from .orders import parse_iso_utc
+from .delivery import track_group_location
 from datetime import timezone
+from utils.pagination import keyset_page, parse_page_size
+
+GROUP_FIELDS = {
+    "id", "name", "organizer", "restaurant_id", "deliveryType", "deliveryLocation",
+    "maxMembers", "latitude", "longitude", "visibility", "searchRadiusKm",
+    "members", "nextOrderTime", "createdAt", "updatedAt",
+}
 
 
 # Get all groups
+# Always paginated: one page of DEFAULT_PAGE_SIZE groups unless limit is given.
+# Query params (all optional):
+#   limit, cursor   keyset pagination on (created_at, id), newest first; the
+#                   next page's cursor is returned in the X-Next-Cursor header
+#   status          "active" or "expired" (by nextOrderTime)
+#   visibility      "public" or "private"
+#   fields          comma-separated subset of group keys, e.g. "id,name"
 @bp.route("/groups", methods=["GET"])
 def get_all_groups():
     try:
-        groups = Group.query.all()
-        return jsonify([g.to_dict() for g in groups]), 200
+        query = Group.query
+
+        status = request.args.get("status")
+        now = datetime.now(timezone.utc)
+        if status == "active":
+            query = query.filter(Group.next_order_time > now)
+        elif status == "expired":
+            query = query.filter(Group.next_order_time <= now)
+        elif status:
+            return jsonify({"error": "status must be 'active' or 'expired'"}), 400
+
+        visibility = request.args.get("visibility")
+        if visibility:
+            query = query.filter(Group.visibility == visibility)
+
+        fields = None
+        if request.args.get("fields"):
+            fields = [f.strip() for f in request.args["fields"].split(",") if f.strip()]
+            unknown = set(fields) - GROUP_FIELDS
+            if unknown:
+                return jsonify({"error": f"Unknown fields: {', '.join(sorted(unknown))}"}), 400
+
+        # Only pay for the members query when members are part of the response
+        if fields is None or "members" in fields:
+            query = query.options(selectinload(Group.members))
+
+        groups, next_cursor = keyset_page(
+            query,
+            Group.created_at,
+            Group.id,
+            request.args.get("cursor"),
+            parse_page_size(request.args.get("limit", type=int)),
+        )
+        response = jsonify([g.to_dict(fields) for g in groups])
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response, 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -26,9 +79,12 @@ def get_user_groups():
         claims = get_jwt()
         username = claims.get("username")  # Get username from JWT token
 
-        member_records = GroupMember.query.filter_by(username=username).all()
-        group_ids = [m.group_id for m in member_records]
-        groups = Group.query.filter(Group.id.in_(group_ids)).all()
+        groups = (
+            Group.query.join(GroupMember, GroupMember.group_id == Group.id)
+            .filter(GroupMember.username == username)
+            .options(selectinload(Group.members))
+            .all()
+        )
         return jsonify([g.to_dict() for g in groups]), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -63,12 +119,16 @@ def create_group():
             next_order_time=parse_iso_utc(data["nextOrderTime"]),
             max_members=data.get("maxMembers", 10),
         )
+        if data.get("latitude") is not None and data.get("longitude") is not None:
+            new_group.latitude = float(data["latitude"])
+            new_group.longitude = float(data["longitude"])
         db.session.add(new_group)
         db.session.flush()
 
         member = GroupMember(group_id=new_group.id, username=username)
         db.session.add(member)
         db.session.commit()
+        track_group_location(new_group)
 
         return jsonify(new_group.to_dict()), 201
     except Exception as e:
@@ -91,6 +151,10 @@ def update_group(group_id):
             return jsonify({"error": "Only organizer can update group"}), 403
 
         data = request.json
+        latitude = data.get("latitude", group.latitude)
+        longitude = data.get("longitude", group.longitude)
+        if (latitude is None) != (longitude is None):
+            return jsonify({"error": "latitude and longitude must be set together"}), 400
 
         if "name" in data:
             group.name = data["name"]
@@ -102,9 +166,14 @@ def update_group(group_id):
             group.next_order_time = parse_iso_utc(data["nextOrderTime"])
         if "maxMembers" in data:
             group.max_members = data["maxMembers"]
+        if "latitude" in data or "longitude" in data:
+            # Move the pool; null for both clears its location
+            group.latitude = float(latitude) if latitude is not None else None
+            group.longitude = float(longitude) if longitude is not None else None
 
         group.updated_at = datetime.utcnow().replace(tzinfo=timezone.utc)
         db.session.commit()
+        track_group_location(group)
 
         return jsonify(group.to_dict()), 200
 
@@ -1,9 +1,10 @@
 from flask import request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
 from extensions import db
-from models import Group, GroupOrder, GroupOrderItem, GroupMember, User, MenuItem, Restaurant, LoyaltyLedger, Coupon
+from models import Group, GroupOrder, GroupOrderItem, GroupMember, User, MenuItem, Restaurant, LoyaltyLedger, Coupon, find_active_coupon
 from . import bp
 from datetime import datetime, timezone, timedelta
+from sqlalchemy import func, insert, or_, select, update
 import json
 
 def calculate_points(total_price: float, pool_size: int = 1, multiplier: float = 1.0, user : User = None) -> int:
@@ -20,53 +21,178 @@ def calculate_points(total_price: float, pool_size: int = 1, multiplier: float =
         return int(base + total_multiplier)
 
 
-def evaluate_group_goal(group):
-    if group.goal_reach:
+def lock_group_for_order(group_id):
+    """
+    Take the group's row lock before any other write of an order transaction
+
+    Reward payouts update every member's user row while holding the group
+    row, so grabbing the group first keeps the lock order the same for all
+    concurrent orders into a pool and avoids deadlocks.
+    """
+    db.session.execute(
+        select(Group.id).where(Group.id == group_id).with_for_update()
+    )
+
+
+def add_to_group_total(group_id, cents):
+    """Atomically add cents to the pool total and return the new total"""
+    return db.session.execute(
+        update(Group)
+        .where(Group.id == group_id)
+        .values(total_cents=func.coalesce(Group.total_cents, 0) + cents)
+        .returning(Group.total_cents)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+
+
+def spend_loyalty_points(user_id, points):
+    """Atomically deduct points if the balance covers them; True if deducted"""
+    result = db.session.execute(
+        update(User)
+        .where(User.id == user_id, User.loyalty_points >= points)
+        .values(loyalty_points=User.loyalty_points - points)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def credit_loyalty_points(user_id, points):
+    """Atomically add points to a user's balance and return the new balance"""
+    return db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(loyalty_points=func.coalesce(User.loyalty_points, 0) + points)
+        .returning(User.loyalty_points)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+
+
+def claim_group_goal(group_id):
+    """Flip goal_reach with a conditional update; True only for the one caller that wins"""
+    result = db.session.execute(
+        update(Group)
+        .where(Group.id == group_id, or_(Group.goal_reach.is_(False), Group.goal_reach.is_(None)))
+        .values(goal_reach=True)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def evaluate_group_goal(group, total_cents):
+    """
+    Hand out the group reward once the pool total crosses a milestone
+
+    Args:
+        group (Group): The pool
+        total_cents (int): Pool total returned by add_to_group_total
+
+    Runs inside the caller's transaction and does not commit.
+    """
+    if group.goal_reach or total_cents < 5000:
+        return
+    if not claim_group_goal(group.id):
         return
 
-    achieved = None
-    
-    if group.total_cents >= 10000:
+    # One query for every member's user id; payouts below are bulk statements
+    member_ids = [
+        user_id for (user_id,) in db.session.query(User.id)
+        .join(GroupMember, GroupMember.username == User.username)
+        .filter(GroupMember.group_id == group.id)
+    ]
+
+    if total_cents >= 10000:
         achieved = {"type": "coupon", "milestone": 10000, "reward": "10% off coupon"}
         reward_value = 10
-        for member in group.members:
-            coupon = Coupon(
-                code=f"GROUP10-{member.username[:3].upper()}",
-                user_id = member.user.id,
-                type="percent_off",
-                value=reward_value,
-                expires_at=datetime.utcnow() + timedelta(days=7)
-            )
-            db.session.add(coupon)
-            db.session.add(LoyaltyLedger(
-                user_id = member.user.id,
-                type="bonus",
-                points=0,
-                amount_cents=0,
-                meta={"reason":"group_goal","coupon_code":coupon.code,"reward_type":"coupon","milestone":10000,"group_name":group.name}
-            ))
-        group.goal_reach = True
-
-    elif group.total_cents >= 5000:
+        expires_at = datetime.utcnow() + timedelta(days=7)
+        # Group and user ids make the code unique: a group pays out only once
+        codes = {user_id: f"GROUP10-G{group.id}U{user_id}" for user_id in member_ids}
+        if member_ids:
+            db.session.execute(insert(Coupon), [
+                {
+                    "code": codes[user_id],
+                    "user_id": user_id,
+                    "type": "percent_off",
+                    "value": reward_value,
+                    "expires_at": expires_at,
+                }
+                for user_id in member_ids
+            ])
+            db.session.execute(insert(LoyaltyLedger), [
+                {
+                    "user_id": user_id,
+                    "type": "bonus",
+                    "points": 0,
+                    "amount_cents": 0,
+                    "meta": {"reason":"group_goal","coupon_code":codes[user_id],"reward_type":"coupon","milestone":10000,"group_name":group.name},
+                }
+                for user_id in member_ids
+            ])
+
+    else:
         achieved = {"type": "points", "milestone": 5000, "reward": "+100 points"}
         reward_value = 100
-        for member in group.members:
-            user = member.user
-            user.loyalty_points += reward_value
-            db.session.add(LoyaltyLedger(
-                user_id = user.id,
-                type="bonus",
-                points=reward_value,
-                amount_cents=0,
-                meta={"reason":"group_goal_points","group_name":group.name,"milestone":5000,"reward_type":"points"}
-            ))
-        group.goal_reach = True
+        if member_ids:
+            db.session.execute(
+                update(User)
+                .where(User.id.in_(member_ids))
+                .values(loyalty_points=func.coalesce(User.loyalty_points, 0) + reward_value)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.execute(insert(LoyaltyLedger), [
+                {
+                    "user_id": user_id,
+                    "type": "bonus",
+                    "points": reward_value,
+                    "amount_cents": 0,
+                    "meta": {"reason":"group_goal_points","group_name":group.name,"milestone":5000,"reward_type":"points"},
+                }
+                for user_id in member_ids
+            ])
     
-    if achieved:
-        db.session.add(group)
-        db.session.commit()
     return achieved
 
+def resolve_menu_items(group, items):
+    """
+    Load every menu item referenced by an order with one IN query
+
+    Returns:
+        tuple: (menu_items_by_id, error_response); error_response is a
+        (response, status) pair when an item is unknown or belongs to
+        another restaurant, otherwise None
+    """
+    item_ids = {int(item["menuItemId"]) for item in items}
+    menu_items = {}
+    if item_ids:
+        menu_items = {m.id: m for m in MenuItem.query.filter(MenuItem.id.in_(item_ids))}
+
+    for item in items:
+        menu_item = menu_items.get(int(item["menuItemId"]))
+        if not menu_item:
+            return None, (jsonify({
+                "error": f"Menu item with ID {item['menuItemId']} not found"
+            }), 404)
+        if group.restaurant_id and menu_item.restaurant_id != group.restaurant_id:
+            return None, (jsonify({
+                "error": f"Menu item with ID {item['menuItemId']} is not on this restaurant's menu"
+            }), 400)
+    return menu_items, None
+
+
+def insert_order_items(order, items, default_instructions=None):
+    """Bulk insert the order's line items in a single executemany"""
+    if not items:
+        return
+    db.session.execute(insert(GroupOrderItem), [
+        {
+            "order_id": order.id,
+            "menu_item_id": int(item["menuItemId"]),
+            "quantity": item.get("quantity", 1),
+            "special_instructions": item.get("specialInstructions", default_instructions),
+        }
+        for item in items
+    ])
+
+
 def parse_iso_utc(dt_str: str):
     """Parse ISO datetime string, ensure UTC-aware."""
     if not dt_str:
@@ -122,41 +248,37 @@ def add_or_update_order(group_id):
     if datetime.now(timezone.utc) > next_order_time_utc:
         return jsonify({"error": "Group order time has expired"}), 400
 
-    # Get or create user's order
-    order = GroupOrder.query.filter_by(group_id=group_id, username=username).first()
-    if not order:
-        order = GroupOrder(group_id=group_id, username=username)
-        db.session.add(order)
-        db.session.flush()  # Assign order.id
-
-    # Clear previous items
-    GroupOrderItem.query.filter_by(order_id=order.id).delete()
-
-    # Add new items
     inner = data.get("items")
 
     # If nested structure like {'items': {...}}, unpack it
     if isinstance(inner, dict) and "items" in inner:
         data = inner
 
+    # Price every line item with one query before writing anything
     items = data.get("items", [])
+    menu_items, error = resolve_menu_items(group, items)
+    if error:
+        return error
+
     total_cents = 0
     for item in items:
-        menu_item = MenuItem.query.get(item["menuItemId"])
-        if not menu_item:
-            return jsonify({
-                "error": f"Menu item with ID {item["menuItemId"]} not found"
-            }), 404
+        menu_item = menu_items[int(item["menuItemId"])]
         quantity = item.get("quantity",1)
         total_cents += int(menu_item.price * 100 * quantity)
-        db.session.add(
-            GroupOrderItem(
-                order_id=order.id,
-                menu_item_id=item["menuItemId"],
-                quantity=item.get("quantity", 1),
-                special_instructions=item.get("specialInstructions", ""),
-            )
-        )
+
+    # Lock the pool row before the first write (see lock_group_for_order)
+    lock_group_for_order(group_id)
+
+    # Get or create user's order
+    order = GroupOrder.query.filter_by(group_id=group_id, username=username).first()
+    if not order:
+        order = GroupOrder(group_id=group_id, username=username)
+        db.session.add(order)
+        db.session.flush()  # Assign order.id
+
+    # Replace previous items
+    GroupOrderItem.query.filter_by(order_id=order.id).delete()
+    insert_order_items(order, items, default_instructions="")
 
     user = User.query.get(user_id)
     restaurant = Restaurant.query.get(group.restaurant_id)
@@ -166,10 +288,12 @@ def add_or_update_order(group_id):
     POINTS_PER_DOLLAR = 100
     MIN_REDEEM_POINTS = 200
 
-    if redeem_points and redeem_points >= MIN_REDEEM_POINTS and redeem_points <= user.loyalty_points:
+    # Balance changes are SQL increments so a concurrent payout to this user
+    # (e.g. another pool's goal) is never overwritten
+    if (redeem_points and redeem_points >= MIN_REDEEM_POINTS
+            and spend_loyalty_points(user.id, redeem_points)):
         redeem_value_cents = int(redeem_points / POINTS_PER_DOLLAR * 100)
         total_cents = max(total_cents - redeem_value_cents, 0)
-        user.loyalty_points -= redeem_points
         db.session.add(LoyaltyLedger(
             user_id = user.id,
             order_id = order.id,
@@ -181,9 +305,11 @@ def add_or_update_order(group_id):
 
     coupon_code = data.get("coupon_code")
     if coupon_code:
-        coupon = Coupon.query.filter_by(code=coupon_code,user_id=user.id,used=False).first()
+        coupon = find_active_coupon(user.id, coupon_code)
 
-        if not coupon or not coupon.is_valid():
+        if not coupon:
+            # Discard the order and items written so far
+            db.session.rollback()
             return jsonify({
                 "error":"Invalid or expired coupon code"
             }), 400
@@ -215,7 +341,7 @@ def add_or_update_order(group_id):
         user=user
     )
 
-    user.loyalty_points += earned_points
+    new_balance = credit_loyalty_points(user.id, earned_points)
     db.session.add(LoyaltyLedger(
         user_id = user.id,
         order_id = order.id,
@@ -228,13 +354,11 @@ def add_or_update_order(group_id):
         }
     ))
 
-    db.session.commit()
-
+    new_total = add_to_group_total(group.id, total_cents)
+    goal_achievement = evaluate_group_goal(group, new_total)
 
-    group.total_cents += total_cents
-    db.session.add(group)
+    # Single commit for the whole order: items, ledger, balance, group total, rewards
     db.session.commit()
-    goal_achievement = evaluate_group_goal(group)
 
 
     return jsonify({
@@ -242,7 +366,7 @@ def add_or_update_order(group_id):
         "order":order.to_dict(),
         "earned_points":earned_points,
         "redeemed_points":redeem_points,
-        "new_balance":user.loyalty_points,
+        "new_balance":new_balance,
         "pool_size":pool_size,
         "group_goal_achieved":bool(goal_achievement),
         "group_details":goal_achievement
@@ -286,54 +410,48 @@ def place_immediate_order(group_id):
     restaurant = Restaurant.query.get(group.restaurant_id) if group.restaurant_id else None
     multiplier = restaurant.reward_multiplier if restaurant and restaurant.reward_multiplier else 1.0
 
-    # Immediate orders ignore next_order_time
-    order = GroupOrder.query.filter_by(group_id=group_id, username=username).first()
-    if not order:
-        order = GroupOrder(group_id=group_id, username=username)
-        db.session.add(order)
-        db.session.flush()  # To get order.id
-
-    # Clear previous items
-    GroupOrderItem.query.filter_by(order_id=order.id).delete()
-
-    # Add new items
-    total_price, total_cents = 0, 0
     inner = data.get("items")
 
     # If nested structure like {'items': {...}}, unpack it
     if isinstance(inner, dict) and "items" in inner:
         data = inner
 
+    # Price every line item with one query before writing anything
     items = data.get("items", [])
+    menu_items, error = resolve_menu_items(group, items)
+    if error:
+        return error
 
-
+    total_price, total_cents = 0, 0
     for item in items:
-        print(item)
+        menu_item = menu_items[int(item["menuItemId"])]
         quantity = item.get("quantity", 1)
-        menu_item = MenuItem.query.get(item["menuItemId"])
-        if not menu_item:
-            return jsonify({
-                "error":f"Menu item with ID {item["menuItemId"]} not found"
-            }) , 404
-        
         total_cents += int(menu_item.price * 100 * quantity)
         total_price += menu_item.price * quantity
-        db.session.add(
-            GroupOrderItem(
-                order_id=order.id,
-                menu_item_id=item["menuItemId"],
-                quantity=item.get("quantity", 1),
-                special_instructions=item.get("specialInstructions"),
-            )
-        )
+
+    # Lock the pool row before the first write (see lock_group_for_order)
+    lock_group_for_order(group_id)
+
+    # Immediate orders ignore next_order_time
+    order = GroupOrder.query.filter_by(group_id=group_id, username=username).first()
+    if not order:
+        order = GroupOrder(group_id=group_id, username=username)
+        db.session.add(order)
+        db.session.flush()  # To get order.id
+
+    # Replace previous items
+    GroupOrderItem.query.filter_by(order_id=order.id).delete()
+    insert_order_items(order, items)
 
     user = User.query.get(user_id)
 
     coupon_code = data.get("coupon_code")
     if coupon_code:
-        coupon = Coupon.query.filter_by(code=coupon_code,user_id=user.id,used=False).first()
+        coupon = find_active_coupon(user.id, coupon_code)
 
-        if not coupon or not coupon.is_valid():
+        if not coupon:
+            # Discard the order and items written so far
+            db.session.rollback()
             return jsonify({
                 "error":"Invalid or expired coupon code"
             }), 400
@@ -359,10 +477,10 @@ def place_immediate_order(group_id):
         ))
     
     redeem_points = int(data.get("redeemPoints", 0))
-    if redeem_points and redeem_points <= user.loyalty_points:
+    # Balance changes are SQL increments (see add_or_update_order)
+    if redeem_points > 0 and spend_loyalty_points(user.id, redeem_points):
         redeem_value_cents = int(redeem_points / 100 * 100)
         total_cents = max(total_cents - redeem_value_cents, 0)
-        user.loyalty_points -= redeem_points
         db.session.add(
             LoyaltyLedger(
                 user_id = user.id,
@@ -381,7 +499,7 @@ def place_immediate_order(group_id):
         user=user
     )
 
-    user.loyalty_points += earned
+    new_balance = credit_loyalty_points(user.id, earned)
 
     db.session.add(LoyaltyLedger(
         user_id=user.id,
@@ -392,13 +510,11 @@ def place_immediate_order(group_id):
         meta={"restaurant":restaurant.name if restaurant else None}
     ))
 
-    db.session.commit()
-
+    new_total = add_to_group_total(group.id, total_cents)
+    goal_achievement = evaluate_group_goal(group, new_total)
 
-    group.total_cents += total_cents
-    db.session.add(group)
+    # Single commit for the whole order: items, ledger, balance, group total, rewards
     db.session.commit()
-    goal_achievement = evaluate_group_goal(group)
 
 
     return jsonify({
@@ -406,7 +522,7 @@ def place_immediate_order(group_id):
         "order": order.to_dict(),
         "earned_points": earned,
         "redeemed_points":redeem_points,
-        "new_balance": user.loyalty_points,
+        "new_balance": new_balance,
         "group_goal_achieved":bool(goal_achievement),
         "group_details":goal_achievement
     }) , 201
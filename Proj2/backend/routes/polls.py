@@ -1,15 +1,25 @@
 from flask import request, jsonify
+from datetime import datetime
+from sqlalchemy import select, update
+from sqlalchemy.orm import selectinload
 from extensions import db
-from models import Poll, PollOption, PollVote
+from models import Poll, PollOption, PollVote, serialize_polls, adjust_vote_count
 from . import bp
 
+# Times a vote change is retried when other requests keep moving the same vote
+VOTE_MOVE_ATTEMPTS = 3
+
 
 # Get group polls
 @bp.route("/groups/<int:group_id>/polls", methods=["GET"])
 def get_group_polls(group_id):
     try:
-        polls = Poll.query.filter_by(group_id=group_id).all()
-        return jsonify([p.to_dict() for p in polls]), 200
+        polls = (
+            Poll.query.filter_by(group_id=group_id)
+            .options(selectinload(Poll.options))
+            .all()
+        )
+        return jsonify(serialize_polls(polls)), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -47,15 +57,46 @@ def vote_on_poll(poll_id):
         existing_vote = PollVote.query.filter_by(
             poll_id=poll_id, username=username
         ).first()
-        if existing_vote:
-            db.session.delete(existing_vote)
 
-        vote = PollVote(poll_id=poll_id, option_id=option_id, username=username)
-        db.session.add(vote)
+        # Counter updates are atomic UPDATEs in the same transaction as the vote
+        if not existing_vote:
+            if not adjust_vote_count(option_id, poll_id, 1):
+                db.session.rollback()
+                return jsonify({"error": "Option does not belong to this poll"}), 400
+            db.session.add(
+                PollVote(poll_id=poll_id, option_id=option_id, username=username)
+            )
+        else:
+            # Move the vote only if it still points at the option we read, so
+            # of two concurrent changes only one adjusts the counters. If
+            # another request moved it first, re-read it and try again.
+            current_option, attempts = existing_vote.option_id, 0
+            while current_option != option_id:
+                # None: the vote was deleted meanwhile
+                if current_option is None or attempts == VOTE_MOVE_ATTEMPTS:
+                    db.session.rollback()
+                    return jsonify({"error": "Vote was changed concurrently, please retry"}), 409
+                attempts += 1
+                moved = db.session.execute(
+                    update(PollVote)
+                    .where(PollVote.id == existing_vote.id,
+                           PollVote.option_id == current_option)
+                    .values(option_id=option_id, voted_at=datetime.utcnow())
+                    .execution_options(synchronize_session=False)
+                ).rowcount == 1
+                if moved:
+                    if not adjust_vote_count(option_id, poll_id, 1):
+                        db.session.rollback()
+                        return jsonify({"error": "Option does not belong to this poll"}), 400
+                    adjust_vote_count(current_option, poll_id, -1)
+                    break
+                current_option = db.session.execute(
+                    select(PollVote.option_id).where(PollVote.id == existing_vote.id)
+                ).scalar()
         db.session.commit()
 
         poll = Poll.query.get(poll_id)
-        return jsonify(poll.to_dict()), 200
+        return jsonify(serialize_polls([poll])[0]), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 400
@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import User, LoyaltyLedger, Coupon
+from models.loyalty_ledger import LEDGER_TYPES
 from extensions import db
+from utils.pagination import keyset_page, parse_page_size
 import random, string
 from datetime import datetime, timedelta
 
@@ -174,21 +176,87 @@ def redeem_coupon():
     }), 201
 
 
+# Ledger rows shown inline by /summary; older ones via /ledger
+SUMMARY_LEDGER_ROWS = 20
+
+
 @bp.route("/summary", methods=["GET"])
 @jwt_required()
 def get_summary():
-    user_id = get_jwt_identity()
+    user_id = int(get_jwt_identity())
     user = User.query.get(user_id)
 
-    coupons = Coupon.query.filter_by(user_id=user_id,used=False).all()
-    ledger = (LoyaltyLedger.query
-              .filter_by(user_id=user_id)
-              .order_by(LoyaltyLedger.created_at.desc())).limit(20).all()
+    # Only the columns in ix_coupons_user_id_expires_at_unused, so the
+    # lookup never touches the table
+    coupons = (Coupon.query
+               .with_entities(Coupon.code, Coupon.type, Coupon.value,
+                              Coupon.restaurant_id, Coupon.expires_at)
+               .filter_by(user_id=user_id, used=False)
+               .filter(Coupon.expires_at > datetime.utcnow())
+               .order_by(Coupon.expires_at)
+               .all())
+    ledger, next_cursor = keyset_page(
+        LoyaltyLedger.query.filter(LoyaltyLedger.user_id == user_id),
+        LoyaltyLedger.created_at,
+        LoyaltyLedger.id,
+        None,
+        SUMMARY_LEDGER_ROWS,
+    )
     
     return jsonify({
         "points":user.loyalty_points,
         "tier": user.tier or "Bronze",
         "streak": user.streak_count or 0,
-        "coupons": [c.to_dict() for c in coupons],
-        "ledger": [l.to_dict() for l in ledger]
-    })
\ No newline at end of file
+        "coupons": [
+            {
+                "code": c.code,
+                "type": c.type,
+                "value": c.value,
+                "restaurant_id": c.restaurant_id,
+                "expires_at": c.expires_at.isoformat(),
+                "used": False,
+            }
+            for c in coupons
+        ],
+        "ledger": [l.to_dict() for l in ledger],
+        "ledger_next_cursor": next_cursor
+    })
+
+
+@bp.route("/ledger", methods=["GET"])
+@jwt_required()
+def get_ledger():
+    """
+    Page through the user's loyalty ledger, newest first
+
+    Query params (all optional):
+        type: Only entries of this type (earn, redeem or bonus)
+        limit: Page size (default 50, max 200)
+        cursor: X-Next-Cursor header from the previous page
+    """
+    user_id = int(get_jwt_identity())
+
+    query = LoyaltyLedger.query.filter(LoyaltyLedger.user_id == user_id)
+    entry_type = request.args.get("type")
+    if entry_type:
+        if entry_type not in LEDGER_TYPES:
+            return jsonify({
+                "error": f"type must be one of: {', '.join(LEDGER_TYPES)}"
+            }), 400
+        query = query.filter(LoyaltyLedger.type == entry_type)
+
+    try:
+        entries, next_cursor = keyset_page(
+            query,
+            LoyaltyLedger.created_at,
+            LoyaltyLedger.id,
+            request.args.get("cursor"),
+            parse_page_size(request.args.get("limit", type=int)),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    response = jsonify([e.to_dict() for e in entries])
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response, 200
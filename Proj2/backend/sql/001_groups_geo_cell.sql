@@ -0,0 +1,8 @@
+-- groups.geo_cell: grid cell of latitude/longitude for nearby-pool discovery.
+--
+-- db.create_all() does not add columns to an existing table. Apply this to
+-- databases created before the column existed (PostgreSQL), then fill it in:
+--     flask --app app backfill-geo-cells
+
+ALTER TABLE groups ADD COLUMN IF NOT EXISTS geo_cell VARCHAR(24);
+CREATE INDEX IF NOT EXISTS ix_groups_geo_cell ON groups (geo_cell);
@@ -0,0 +1,8 @@
+-- poll_options.vote_count: denormalized number of poll_votes per option.
+--
+-- db.create_all() does not add columns to an existing table. Apply this to
+-- databases created before the column existed (PostgreSQL); existing options
+-- read 0 votes until the counters are rebuilt:
+--     flask --app app recount-poll-votes
+
+ALTER TABLE poll_options ADD COLUMN IF NOT EXISTS vote_count INTEGER NOT NULL DEFAULT 0;
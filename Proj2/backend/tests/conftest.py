@@ -19,4 +19,25 @@ def client():
         db.create_all()
         yield app.test_client()
         db.session.remove()
-        db.drop_all()
\ No newline at end of file
+        db.drop_all()
+
+@pytest.fixture()
+def count_queries(client):
+    """Return a context manager that records SQL statements executed inside it."""
+    from contextlib import contextmanager
+    from sqlalchemy import event
+
+    @contextmanager
+    def counter():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+
+    return counter
@@ -0,0 +1,1059 @@
+"""
+AI Optimization Test Suite
+--------------------------
+Covers the delivery optimization helpers and their endpoints:
+✅ Batch ETA prediction
+✅ Learned ETA model (fit, artifact loading, training command)
+✅ Hour-of-week traffic table and timezone-aware rush-hour ETAs
+✅ DBSCAN demand clustering (euclidean and haversine metrics)
+✅ Vectorized cluster centroids and radii
+✅ Incremental clustering of active pools (consistency with batch DBSCAN)
+✅ Cluster endpoint validation
+✅ Server-side find-my-cluster from cached assignments
+✅ LRU/TTL cache for cluster-locations results
+✅ OR-Tools route optimization with deadlines and warm starts
+✅ Cached distance matrices with per-point invalidation
+"""
+
+import numpy as np
+import pytest
+from datetime import datetime, timedelta, timezone
+from ai_optimization.clustering import DemandClusterer
+from ai_optimization.eta_predictor import ETAPredictor
+from ai_optimization.incremental_clustering import IncrementalClusterer
+from extensions import db
+from models import Group
+from utils.distance import distances_from
+
+
+@pytest.fixture
+def auth_header(client):
+    """Register + login to get JWT token header for delivery tests."""
+    client.post(
+        "/api/auth/register",
+        json={"username": "deliveryuser", "email": "delivery@example.com", "password": "testpass"},
+    )
+    login_resp = client.post(
+        "/api/auth/login", json={"username": "deliveryuser", "password": "testpass"}
+    )
+    token = login_resp.get_json().get("token")
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _east_west_pair(lat, gap_km):
+    """Two locations gap_km apart along a parallel at the given latitude"""
+    from math import cos, radians
+
+    gap_deg = gap_km / (111.195 * cos(radians(lat)))
+    return [
+        {"lat": lat, "lng": 10.0, "group_id": 1, "group_name": "West"},
+        {"lat": lat, "lng": 10.0 + gap_deg, "group_id": 2, "group_name": "East"},
+    ]
+
+
+# ------------------- ETA PREDICTION -------------------
+
+
+def test_predict_eta_batch_matches_single_predictions():
+    predictor = ETAPredictor()
+    trips = [(5.0, 1, 1.0), (0.3, 3, 1.25), (12.7, 2, 2.4), (40.0, 1, 0.5)]
+    batch = predictor.predict_eta_batch(*zip(*trips))
+    assert len(batch) == len(trips)
+    for result, trip in zip(batch, trips):
+        single = predictor.predict_eta(*trip)
+        for key in ("total_minutes", "breakdown", "confidence", "traffic_status"):
+            assert result[key] == single[key]
+        assert datetime.fromisoformat(result["eta"]) == pytest.approx(
+            datetime.fromisoformat(single["eta"]), abs=timedelta(seconds=1)
+        )
+
+
+def test_predict_eta_batch_broadcasts_scalars():
+    results = ETAPredictor().predict_eta_batch([1.0, 2.0, 3.0])
+    assert [r["breakdown"]["stop_time"] for r in results] == [3, 3, 3]
+    assert {r["traffic_status"] for r in results} == {"normal"}
+
+
+def test_predict_eta_batch_endpoint_reports_item_errors(client, auth_header):
+    res = client.post(
+        "/api/delivery/predict-eta/batch",
+        json={"trips": [
+            {"distance_km": 5.0, "num_stops": 2},
+            {"distance_km": -1},
+            {"distance_km": "far"},
+            {"distance_km": 3.0, "traffic_factor": 9},
+            "not a trip",
+            {"distance_km": 10.0, "traffic_factor": 1.5},
+        ]},
+        headers=auth_header,
+    )
+    assert res.status_code == 200
+    data = res.get_json()
+    assert data["count"] == 6
+    assert data["error_count"] == 4
+    results = data["results"]
+    assert results[0]["total_minutes"] == ETAPredictor().predict_eta(5.0, 2)["total_minutes"]
+    assert results[1] == {"error": "Distance must be positive"}
+    assert results[2]["error"].startswith("Invalid input")
+    assert results[3] == {"error": "Traffic factor must be between 0.5 and 3.0"}
+    assert results[4] == {"error": "Each trip must be an object"}
+    assert results[5]["traffic_status"] == "heavy"
+
+
+def test_predict_eta_batch_endpoint_limits(client, auth_header):
+    from routes.delivery import MAX_ETA_BATCH
+
+    res = client.post("/api/delivery/predict-eta/batch", json={"trips": []}, headers=auth_header)
+    assert res.status_code == 400
+    res = client.post(
+        "/api/delivery/predict-eta/batch",
+        json={"trips": [{"distance_km": 1.0}] * (MAX_ETA_BATCH + 1)},
+        headers=auth_header,
+    )
+    assert res.status_code == 400
+    res = client.post(
+        "/api/delivery/predict-eta/batch",
+        json={"trips": [{"distance_km": 1.0 + i / 100} for i in range(MAX_ETA_BATCH)]},
+        headers=auth_header,
+    )
+    assert res.status_code == 200
+    assert res.get_json()["error_count"] == 0
+
+def _synthetic_deliveries(n=4000, seed=17):
+    """Deliveries from a known process: prep 10/25 min, 2 min/km (4 at Mon 17:00), 3 min/stop"""
+    rng = np.random.default_rng(seed)
+    restaurant_ids = rng.choice([1, 2], n)
+    prep = np.where(restaurant_ids == 1, 10.0, 25.0) + rng.normal(0, 1, n)
+    distances = rng.uniform(0.5, 10.0, n)
+    stops = rng.integers(1, 4, n)
+    slots = rng.integers(0, 168, n)
+    slots[: n // 4] = 17  # plenty of Monday-evening samples
+    pace = np.where(slots == 17, 4.0, 2.0)
+    travel = distances * pace + stops * 3.0 + rng.normal(0, 1, n)
+    return restaurant_ids, prep, distances, stops, slots, travel
+
+
+def test_learned_eta_model_recovers_components():
+    from ai_optimization.eta_model import LearnedETAModel
+
+    model = LearnedETAModel.fit(*_synthetic_deliveries())
+    prep, travel, stops = model.predict_components([1, 2, None, 99], [5.0] * 4, [2] * 4, [17, 40, 17, 40])
+    assert prep[:2] == pytest.approx([10.0, 25.0], abs=0.5)
+    # Unknown restaurants fall back to the overall mean prep
+    assert prep[2] == prep[3] == pytest.approx(17.5, abs=0.5)
+    assert travel == pytest.approx([20.0, 10.0, 20.0, 10.0], abs=1.0)
+    assert stops == pytest.approx([6.0] * 4, abs=0.3)
+
+
+def test_eta_predictor_loads_artifact_and_falls_back(tmp_path):
+    from ai_optimization.eta_model import LearnedETAModel
+
+    assert ETAPredictor.from_artifact(str(tmp_path / "missing.npz")).model_source == "constant"
+
+    path = str(tmp_path / "eta_model.npz")
+    LearnedETAModel.fit(*_synthetic_deliveries()).save(path)
+    predictor = ETAPredictor.from_artifact(path)
+    assert predictor.model_source == "learned"
+
+    monday_5pm = datetime(2025, 11, 24, 17, 30, tzinfo=timezone.utc)
+    slow = predictor.predict_eta(5.0, 1, restaurant_id=2, when=monday_5pm)
+    fast = predictor.predict_eta(5.0, 1, restaurant_id=1, when=monday_5pm + timedelta(days=1))
+    assert slow["model"] == "learned"
+    assert slow["breakdown"]["prep_time"] in (24, 25)
+    assert fast["breakdown"]["prep_time"] in (9, 10)
+    assert slow["breakdown"]["travel_time"] in (19, 20)
+    assert fast["breakdown"]["travel_time"] in (9, 10)
+
+    batch = predictor.predict_eta_batch([5.0, 5.0], 1, 1.0, restaurant_ids=[2, 1], when=monday_5pm)
+    assert [r["breakdown"]["prep_time"] for r in batch] == [
+        slow["breakdown"]["prep_time"], fast["breakdown"]["prep_time"]
+    ]
+
+
+def test_train_eta_model_command(client, tmp_path):
+    import csv
+    from zoneinfo import ZoneInfo
+    from models import Delivery
+
+    restaurant_ids, prep, distances, stops, slots, travel = _synthetic_deliveries(n=200)
+    # Pickup hours are New York wall-clock hours, exported as UTC
+    new_york = ZoneInfo("America/New_York")
+    monday = datetime(2025, 11, 24, tzinfo=new_york)
+    group = Group(
+        name="History Pool", organizer="someone", delivery_type="Delivery",
+        delivery_location="Library", next_order_time=monday,
+    )
+    db.session.add(group)
+    db.session.commit()
+
+    export = tmp_path / "deliveries.csv"
+    with open(export, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["group_id", "restaurant_id", "distance_km", "num_stops",
+                         "ordered_at", "picked_up_at", "delivered_at"])
+        for p, d, s, slot, t in zip(prep, distances, stops, slots, travel):
+            picked_up = monday + timedelta(hours=int(slot), minutes=5)
+            writer.writerow([
+                group.id, "", float(d), int(s),
+                (picked_up - timedelta(minutes=float(p))).astimezone(timezone.utc).isoformat(),
+                picked_up.astimezone(timezone.utc).isoformat(),
+                (picked_up + timedelta(minutes=float(t))).astimezone(timezone.utc).isoformat(),
+            ])
+
+    runner = client.application.test_cli_runner()
+    result = runner.invoke(args=["import-deliveries", str(export)])
+    assert result.exit_code == 0, result.output
+    assert "Imported 200" in result.output
+    assert Delivery.query.count() == 200
+
+    path = str(tmp_path / "trained.npz")
+    result = runner.invoke(args=["train-eta-model", "--output", path, "--min-samples", "500"])
+    assert result.exit_code != 0
+    assert "need at least 500" in result.output
+
+    result = runner.invoke(args=["train-eta-model", "--output", path, "--timezone", "America/New_York"])
+    assert result.exit_code == 0, result.output
+    assert "200 deliveries" in result.output
+    predictor = ETAPredictor.from_artifact(path)
+    assert predictor.model_source == "learned"
+
+    # The slow slot is Monday 17:00 New York time, as with the traffic table
+    monday_5pm = datetime(2025, 11, 24, 17, 30, tzinfo=new_york)
+    slow = predictor.predict_eta(5.0, 1, when=monday_5pm)
+    fast = predictor.predict_eta(5.0, 1, when=monday_5pm.astimezone(timezone.utc))
+    assert slow["breakdown"]["travel_time"] > fast["breakdown"]["travel_time"]
+
+
+def test_import_deliveries_rejects_bad_rows(client, tmp_path):
+    from models import Delivery
+
+    export = tmp_path / "deliveries.csv"
+    export.write_text(
+        "group_id,distance_km,ordered_at\n"
+        "1,2.5,2025-11-24T12:00:00\n"
+        "1,far,2025-11-24T12:00:00\n"
+    )
+    result = client.application.test_cli_runner().invoke(args=["import-deliveries", str(export)])
+    assert result.exit_code != 0
+    assert "Row 2" in result.output
+    assert Delivery.query.count() == 0
+
+
+# ------------------- TIME-OF-DAY TRAFFIC -------------------
+
+
+def test_default_traffic_table_matches_rush_hours():
+    from ai_optimization.traffic import TrafficTable
+
+    table = TrafficTable.default()
+    assert table.factors.shape == (168,)
+    wednesday = datetime(2025, 11, 26)
+    factors = [table.factor_at(wednesday.replace(hour=h)) for h in (3, 8, 12, 18, 22)]
+    assert factors == [1.0, 1.3, 1.2, 1.3, 1.0]
+
+
+def test_traffic_table_from_file(tmp_path, monkeypatch):
+    import json
+    from ai_optimization.traffic import TrafficTable
+
+    weekly = [1.0] * 168
+    weekly[5 * 24 + 20] = 1.6  # Saturday 20:00
+    path = tmp_path / "traffic.json"
+    path.write_text(json.dumps(weekly))
+    monkeypatch.setenv("TRAFFIC_TABLE_PATH", str(path))
+    table = ETAPredictor().traffic_table
+    assert table.factor_at(datetime(2025, 11, 29, 20, 15)) == 1.6
+    assert table.factor_at(datetime(2025, 11, 30, 20, 15)) == 1.0
+
+    path.write_text(json.dumps([1.1] * 24))
+    assert TrafficTable.from_file(str(path)).factor_at(datetime(2025, 11, 30, 3)) == 1.1
+
+    with pytest.raises(ValueError):
+        TrafficTable([1.0] * 100)
+    with pytest.raises(ValueError):
+        TrafficTable([0.0] * 24)
+
+
+def test_time_of_day_factor_applied_in_one_pass():
+    predictor = ETAPredictor()
+    rush = datetime(2025, 11, 26, 18, 0, tzinfo=timezone.utc)
+    eta = predictor.predict_eta(7.0, 2, when=rush, time_of_day=True)
+    travel = 7.0 / 25 * 1.3 * 60  # 21.84 minutes
+    assert eta["breakdown"]["travel_time"] == 21
+    # The total is built from unrounded components, not from rounded parts
+    assert eta["total_minutes"] == int(15 + travel + 6)
+    assert eta["adjusted_for_rush_hour"] is True
+    assert eta["time_of_day_factor"] == 1.3
+    assert eta["traffic_status"] == "moderate"
+    assert eta["confidence"] == "medium"
+
+    quiet = predictor.predict_eta(7.0, 2, when=rush.replace(hour=3), time_of_day=True)
+    assert quiet["adjusted_for_rush_hour"] is False
+    assert "adjusted_for_rush_hour" not in predictor.predict_eta(7.0, 2, when=rush)
+
+
+def test_time_of_day_uses_local_wall_clock():
+    from zoneinfo import ZoneInfo
+
+    predictor = ETAPredictor()
+    # 18:00 in New York is 23:00 UTC: rush hour locally, quiet in UTC
+    new_york = datetime(2025, 11, 26, 18, 0, tzinfo=ZoneInfo("America/New_York"))
+    assert predictor.predict_eta(5.0, when=new_york, time_of_day=True)["adjusted_for_rush_hour"] is True
+    as_utc = new_york.astimezone(timezone.utc)
+    assert predictor.predict_eta(5.0, when=as_utc, time_of_day=True)["adjusted_for_rush_hour"] is False
+
+
+def test_learned_model_reports_hour_of_week_factor():
+    from ai_optimization.eta_model import LearnedETAModel
+
+    predictor = ETAPredictor(LearnedETAModel.fit(*_synthetic_deliveries()))
+    monday_5pm = datetime(2025, 11, 24, 17, 30, tzinfo=timezone.utc)
+    slow = predictor.predict_eta(5.0, 1, when=monday_5pm, time_of_day=True)
+    plain = predictor.predict_eta(5.0, 1, when=monday_5pm)
+    # The learned pace already covers the hour; the factor is only reported
+    assert slow["breakdown"] == plain["breakdown"]
+    assert slow["adjusted_for_rush_hour"] is True
+    assert slow["time_of_day_factor"] == pytest.approx(2.0, abs=0.2)
+
+
+def test_rush_hour_endpoint_timezones(client, auth_header, monkeypatch):
+    import routes.delivery as delivery_routes
+
+    monkeypatch.setattr(delivery_routes, "eta_predictor", ETAPredictor())
+
+    def predict(**body):
+        return client.post(
+            "/api/delivery/predict-eta-with-rush-hour",
+            json={"distance_km": 5.0, "num_stops": 1, **body},
+            headers=auth_header,
+        )
+
+    res = predict(hour=18, timezone="America/New_York")
+    assert res.status_code == 200
+    assert res.get_json()["adjusted_for_rush_hour"] is True
+    assert predict(hour=3, timezone="Asia/Tokyo").get_json()["adjusted_for_rush_hour"] is False
+
+    # An aware time is converted into the requested zone before lookup
+    res = predict(time="2025-11-26T23:00:00+00:00", timezone="America/New_York")
+    assert res.get_json()["adjusted_for_rush_hour"] is True
+    res = predict(time="2025-11-26T23:00:00+00:00", timezone="UTC")
+    assert res.get_json()["adjusted_for_rush_hour"] is False
+
+    for body in ({"timezone": "Mars/Olympus"}, {"hour": 24}, {"hour": "soon"}, {"time": "tomorrow"}):
+        res = predict(**body)
+        assert res.status_code == 400, body
+        assert "error" in res.get_json()
+
+
+# ------------------- CLUSTERING -------------------
+
+
+def test_clusterer_rejects_unknown_metric():
+    with pytest.raises(ValueError):
+        DemandClusterer(metric="manhattan")
+
+
+def test_haversine_uses_true_km_away_from_equator():
+    # 1.5 km apart at 60°N is ~0.027° of longitude, beyond the 2 km euclidean eps in degrees
+    locations = _east_west_pair(60.0, 1.5)
+
+    euclidean = DemandClusterer(max_distance_km=2.0).cluster_deliveries(locations)
+    assert all(c["is_noise"] for c in euclidean)
+
+    haversine = DemandClusterer(max_distance_km=2.0, metric="haversine").cluster_deliveries(locations)
+    assert len(haversine) == 1
+    assert haversine[0]["is_noise"] is False
+    assert haversine[0]["size"] == 2
+
+
+def test_haversine_keeps_distant_points_apart():
+    locations = _east_west_pair(60.0, 2.5)
+    clusters = DemandClusterer(max_distance_km=2.0, metric="haversine").cluster_deliveries(locations)
+    assert all(c["is_noise"] for c in clusters)
+
+
+def test_metrics_agree_near_equator():
+    locations = _east_west_pair(0.0, 1.0) + [
+        {"lat": 0.5, "lng": 10.5, "group_id": 3, "group_name": "Far"},
+    ]
+    labels = {
+        metric: sorted((c["size"], c["is_noise"]) for c in DemandClusterer(metric=metric).cluster_deliveries(locations))
+        for metric in DemandClusterer.METRICS
+    }
+    assert labels["euclidean"] == labels["haversine"] == [(1, True), (2, False)]
+
+def test_cluster_metadata_matches_geodesic():
+    rng = np.random.default_rng(0)
+    coords = np.vstack([
+        [35.78, -78.64] + rng.normal(0, 0.004, (30, 2)),
+        [35.99, -78.90] + rng.normal(0, 0.004, (20, 2)),
+    ])
+    locations = [
+        {"lat": float(lat), "lng": float(lng), "group_id": i, "group_name": f"Pool {i}"}
+        for i, (lat, lng) in enumerate(coords)
+    ]
+
+    fast = DemandClusterer(metric="haversine").cluster_deliveries(locations)
+    exact = DemandClusterer(metric="haversine", exact_radius=True).cluster_deliveries(locations)
+
+    assert [c["cluster_id"] for c in fast] == [c["cluster_id"] for c in exact]
+    for f, e in zip(fast, exact):
+        assert f["size"] == e["size"] == len(f["groups"])
+        assert f["center"] == e["center"]
+        assert f["radius_km"] == pytest.approx(e["radius_km"], rel=0.01, abs=0.01)
+        ids = [g["group_id"] for g in f["groups"]]
+        assert f["center"]["lat"] == pytest.approx(coords[ids, 0].mean())
+        assert ids == sorted(ids)
+
+
+def test_clusters_keep_first_appearance_order():
+    locations = _east_west_pair(0.0, 0.5) + [
+        {"lat": 5.0, "lng": 5.0, "group_id": 3, "group_name": "Lonely"},
+        {"lat": 1.0, "lng": 1.0, "group_id": 4, "group_name": "North"},
+        {"lat": 1.0, "lng": 1.001, "group_id": 5, "group_name": "North 2"},
+    ]
+    locations.insert(0, locations.pop(3))
+    clusters = DemandClusterer().cluster_deliveries(locations)
+    assert [c["cluster_id"] for c in clusters] == [0, 1, -1]
+    assert [g["group_id"] for g in clusters[0]["groups"]] == [4, 5]
+    assert clusters[2]["is_noise"] is True
+
+
+# ------------------- INCREMENTAL CLUSTERING -------------------
+
+
+def _batch_partition(points, max_distance_km=2.0, min_cluster_size=2):
+    """Core-point clusters, noise and border points from a batch DBSCAN run"""
+    ids = sorted(points)
+    coords = np.radians([points[g] for g in ids])
+    dbscan = DemandClusterer(
+        max_distance_km=max_distance_km, min_cluster_size=min_cluster_size, metric="haversine"
+    )._dbscan().fit(coords)
+    core = {ids[i] for i in dbscan.core_sample_indices_}
+    clusters = {}
+    for group_id, label in zip(ids, dbscan.labels_):
+        if label != -1 and group_id in core:
+            clusters.setdefault(label, set()).add(group_id)
+    noise = {g for g, label in zip(ids, dbscan.labels_) if label == -1}
+    return {frozenset(c) for c in clusters.values()}, noise, core
+
+
+def _assert_matches_batch(online, points, **params):
+    expected_clusters, expected_noise, core = _batch_partition(points, **params)
+    labels = online.labels()
+    assert set(labels) == set(points)
+    assert {g for g, label in labels.items() if label == -1} == expected_noise
+
+    clusters = {}
+    for group_id, label in labels.items():
+        if group_id in core:
+            clusters.setdefault(label, set()).add(group_id)
+    assert {frozenset(c) for c in clusters.values()} == expected_clusters
+    # Border points sit in the cluster of one of their core neighbours
+    max_distance_km = params.get("max_distance_km", 2.0)
+    for group_id, label in labels.items():
+        if label != -1 and group_id not in core:
+            cores = sorted(clusters[label])
+            distances = distances_from(*points[group_id], *zip(*(points[m] for m in cores)))
+            assert distances.min() <= max_distance_km
+
+
+@pytest.mark.parametrize("min_cluster_size", [2, 4])
+def test_incremental_clusters_match_batch_dbscan(min_cluster_size):
+    rng = np.random.default_rng(13)
+    centers = np.array([[35.78, -78.64], [35.80, -78.60], [35.99, -78.90], [60.0, 10.0]])
+    online = IncrementalClusterer(min_cluster_size=min_cluster_size)
+    points = {}
+
+    for group_id in range(300):
+        lat, lng = centers[rng.integers(len(centers))] + rng.normal(0, 0.02, 2)
+        online.upsert(group_id, lat, lng, f"Pool {group_id}")
+        points[group_id] = (float(lat), float(lng))
+    _assert_matches_batch(online, points, min_cluster_size=min_cluster_size)
+
+    # Move a third of the pools and drop a sixth, checking along the way
+    for step, group_id in enumerate(rng.permutation(300)[:150]):
+        if step % 3 == 0:
+            online.remove(int(group_id))
+            del points[int(group_id)]
+        else:
+            lat, lng = centers[rng.integers(len(centers))] + rng.normal(0, 0.02, 2)
+            online.upsert(int(group_id), lat, lng)
+            points[int(group_id)] = (float(lat), float(lng))
+        if step % 25 == 0:
+            _assert_matches_batch(online, points, min_cluster_size=min_cluster_size)
+    _assert_matches_batch(online, points, min_cluster_size=min_cluster_size)
+
+
+def test_incremental_load_keeps_updates_made_while_loading():
+    online = IncrementalClusterer(max_distance_km=2.0)
+    online.upsert(1, 0.0, 0.0, "Pool 1")
+
+    def rows():
+        yield 1, 0.0, 0.0, "Pool 1", None
+        # Another request moves pool 1 and adds pool 3 while the reload reads
+        online.upsert(1, 0.0, 0.0135, "Pool 1")
+        online.upsert(3, 0.0, 0.027, "Pool 3")
+        yield 2, 0.0, 0.0, "Pool 2", None
+
+    online.load(rows())
+    assert online.loaded
+    assert [g["group_id"] for g in online.locations()] == [1, 2, 3]
+    assert online.cluster_id(2) == online.cluster_id(3) != -1
+
+
+def test_incremental_cluster_lookup_and_split():
+    online = IncrementalClusterer(max_distance_km=2.0)
+    # A chain A - B - C, each hop ~1.5 km: one cluster through B
+    for group_id, lng in [(1, 0.0), (2, 0.0135), (3, 0.027)]:
+        online.upsert(group_id, 0.0, lng, f"Pool {group_id}")
+    assert online.cluster_id(1) == online.cluster_id(3) != -1
+    cluster = online.cluster_for(3)
+    assert [g["group_id"] for g in cluster["groups"]] == [1, 2, 3]
+    assert cluster["is_noise"] is False
+
+    online.remove(2)
+    assert online.cluster_id(1) == online.cluster_id(3) == -1
+    assert online.cluster_for(1)["is_noise"] is True
+    assert online.cluster_id(2) is None
+    assert online.cluster_for(2) is None
+
+
+def test_incremental_expiry_drops_pools():
+    online = IncrementalClusterer()
+    online.upsert(1, 0.0, 0.0, expires_at=100.0)
+    online.upsert(2, 0.0, 0.001, expires_at=200.0)
+    # Extending a pool's deadline supersedes the old heap entry
+    online.upsert(1, 0.0, 0.0, expires_at=300.0)
+
+    assert online.expire(150.0) == 0
+    assert online.expire(250.0) == 1
+    assert 2 not in online
+    assert online.cluster_id(1) == -1
+    assert online.expire(300.0) == 1
+    assert len(online) == 0
+
+
+@pytest.fixture
+def pool_clusters():
+    """The shared incremental clusterer, emptied so it reloads from this test's database."""
+    from routes.delivery import pool_clusters as clusters
+
+    clusters.clear()
+    yield clusters
+    clusters.clear()
+
+
+def test_group_routes_keep_pool_clusters_current(client, auth_header, pool_clusters):
+    from routes.delivery import lookup_pool_cluster
+
+    next_order_time = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+    existing = Group(
+        name="Existing Pool",
+        organizer="someone",
+        delivery_type="Delivery",
+        delivery_location="Library",
+        next_order_time=datetime.now(timezone.utc) + timedelta(hours=1),
+        latitude=35.7796,
+        longitude=-78.6382,
+    )
+    db.session.add(existing)
+    db.session.commit()
+
+    # First lookup loads active located groups from the database
+    assert lookup_pool_cluster(existing.id)["is_noise"] is True
+    assert pool_clusters.loaded
+
+    res = client.post(
+        "/api/groups",
+        json={
+            "name": "Neighbour Pool",
+            "restaurant_id": None,
+            "deliveryType": "Delivery",
+            "deliveryLocation": "Library",
+            "nextOrderTime": next_order_time,
+            "latitude": 35.7800,
+            "longitude": -78.6390,
+        },
+        headers=auth_header,
+    )
+    assert res.status_code == 201
+    new_id = res.get_json()["id"]
+    cluster = lookup_pool_cluster(existing.id)
+    assert {g["group_id"] for g in cluster["groups"]} == {existing.id, new_id}
+
+    # Moving the new pool across town splits the cluster again
+    res = client.put(
+        f"/api/groups/{new_id}",
+        json={"latitude": 35.9940, "longitude": -78.8986},
+        headers=auth_header,
+    )
+    assert res.status_code == 200
+    assert lookup_pool_cluster(existing.id)["is_noise"] is True
+
+    res = client.put(f"/api/groups/{new_id}", json={"latitude": 35.0}, headers=auth_header)
+    assert res.status_code == 200
+    res = client.put(f"/api/groups/{new_id}", json={"longitude": None}, headers=auth_header)
+    assert res.status_code == 400
+
+    # Clearing the location drops the pool
+    res = client.put(
+        f"/api/groups/{new_id}", json={"latitude": None, "longitude": None}, headers=auth_header
+    )
+    assert res.status_code == 200
+    assert lookup_pool_cluster(new_id) is None
+
+
+# ------------------- ENDPOINTS -------------------
+
+
+def test_cluster_locations_accepts_metric(client, auth_header):
+    res = client.post(
+        "/api/delivery/cluster-locations",
+        json={"locations": _east_west_pair(60.0, 1.5), "metric": "haversine"},
+        headers=auth_header,
+    )
+    assert res.status_code == 200
+    data = res.get_json()
+    assert data["parameters"]["metric"] == "haversine"
+    assert data["statistics"]["total_clusters"] == 1
+
+
+def test_cluster_locations_rejects_unknown_metric(client, auth_header):
+    res = client.post(
+        "/api/delivery/cluster-locations",
+        json={"locations": _east_west_pair(60.0, 1.5), "metric": "manhattan"},
+        headers=auth_header,
+    )
+    assert res.status_code == 400
+
+
+def _located_group(name, lat, lng, hours=1, organizer="someone"):
+    group = Group(
+        name=name,
+        organizer=organizer,
+        delivery_type="Delivery",
+        delivery_location="Library",
+        next_order_time=datetime.now(timezone.utc) + timedelta(hours=hours),
+        latitude=lat,
+        longitude=lng,
+    )
+    db.session.add(group)
+    db.session.flush()
+    return group
+
+
+def test_find_my_cluster_by_group_id(client, auth_header, pool_clusters):
+    a = _located_group("Pizza Lovers", 35.7796, -78.6382)
+    b = _located_group("Taco Tuesday", 35.7806, -78.6392)
+    lonely = _located_group("Far Away", 36.0726, -79.7920)
+    expired = _located_group("Yesterday", 35.7797, -78.6383, hours=-1)
+    db.session.commit()
+
+    res = client.get(f"/api/delivery/find-my-cluster/{a.id}", headers=auth_header)
+    assert res.status_code == 200
+    data = res.get_json()
+    assert data["in_cluster"] is True
+    assert data["cluster_mates"] == ["Taco Tuesday"]
+    assert data["cluster"]["size"] == 2
+
+    # The POST variant without all_locations answers from the same cache
+    res = client.post("/api/delivery/find-my-cluster", json={"group_id": b.id}, headers=auth_header)
+    assert res.get_json()["cluster_mates"] == ["Pizza Lovers"]
+    res = client.post("/api/delivery/find-my-cluster", json={"group_id": str(b.id)}, headers=auth_header)
+    assert res.get_json()["cluster_mates"] == ["Pizza Lovers"]
+    res = client.post("/api/delivery/find-my-cluster", json={"group_id": "abc"}, headers=auth_header)
+    assert res.status_code == 400
+
+    res = client.get(f"/api/delivery/find-my-cluster/{lonely.id}", headers=auth_header)
+    assert res.status_code == 200
+    assert res.get_json()["in_cluster"] is False
+
+    res = client.get(f"/api/delivery/find-my-cluster/{expired.id}", headers=auth_header)
+    assert res.status_code == 404
+
+    res = client.get("/api/delivery/active-groups-for-clustering", headers=auth_header)
+    assert res.status_code == 200
+    assert [loc["group_name"] for loc in res.get_json()["locations"]] == [
+        "Pizza Lovers", "Taco Tuesday", "Far Away",
+    ]
+
+
+def test_pool_clusters_reload_after_refresh_interval(client, auth_header, pool_clusters, monkeypatch):
+    import routes.delivery
+
+    a = _located_group("Pizza Lovers", 35.7796, -78.6382)
+    db.session.commit()
+    res = client.get(f"/api/delivery/find-my-cluster/{a.id}", headers=auth_header)
+    assert res.get_json()["in_cluster"] is False
+
+    # Written without the route hooks (another worker, or straight to the database)
+    _located_group("Taco Tuesday", 35.7806, -78.6392)
+    db.session.commit()
+    res = client.get(f"/api/delivery/find-my-cluster/{a.id}", headers=auth_header)
+    assert res.get_json()["in_cluster"] is False
+
+    # A stale cache is reloaded in the background; requests don't wait for it
+    monkeypatch.setattr(routes.delivery, "POOL_CLUSTERS_REFRESH_SECONDS", 0)
+    res = client.get(f"/api/delivery/find-my-cluster/{a.id}", headers=auth_header)
+    assert res.status_code == 200
+    routes.delivery.pool_clusters_reloader.join()
+
+    monkeypatch.setattr(routes.delivery, "POOL_CLUSTERS_REFRESH_SECONDS", 60)
+    res = client.get(f"/api/delivery/find-my-cluster/{a.id}", headers=auth_header)
+    assert res.get_json()["cluster_mates"] == ["Taco Tuesday"]
+
+
+def test_find_my_cluster_cached_lookup_skips_database(client, auth_header, pool_clusters, count_queries):
+    group = _located_group("Pizza Lovers", 35.7796, -78.6382)
+    _located_group("Taco Tuesday", 35.7806, -78.6392)
+    db.session.commit()
+    client.get(f"/api/delivery/find-my-cluster/{group.id}", headers=auth_header)
+
+    with count_queries() as queries:
+        res = client.get(f"/api/delivery/find-my-cluster/{group.id}", headers=auth_header)
+    assert res.get_json()["in_cluster"] is True
+    assert queries == []
+
+
+def test_find_my_cluster_with_locations_reports_noise_as_isolated(client, auth_header):
+    res = client.post(
+        "/api/delivery/find-my-cluster",
+        json={"group_id": 1, "all_locations": _east_west_pair(60.0, 5.0)},
+        headers=auth_header,
+    )
+    assert res.status_code == 200
+    assert res.get_json()["in_cluster"] is False
+
+
+# ------------------- CLUSTER CACHE -------------------
+
+
+def test_ttl_cache_evicts_least_recently_used_and_expired():
+    from utils.cache import TTLCache
+
+    now = [0.0]
+    cache = TTLCache(maxsize=2, ttl_seconds=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+    now[0] = 10.0
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["expirations"]) == (2, 2, 1, 1)
+    assert stats["size"] == 1
+
+
+@pytest.fixture
+def cluster_cache():
+    """The shared cluster-locations cache, emptied around each test."""
+    from routes.delivery import cluster_cache as cache
+
+    cache.clear()
+    yield cache
+    cache.clear()
+
+
+def test_cluster_locations_cache_hit_skips_dbscan(client, auth_header, cluster_cache, monkeypatch):
+    fits = []
+    original_fit = DemandClusterer._fit
+    monkeypatch.setattr(DemandClusterer, "_fit", lambda self, coords: fits.append(1) or original_fit(self, coords))
+
+    body = {"locations": _east_west_pair(0.0, 1.0)}
+    first = client.post("/api/delivery/cluster-locations", json=body, headers=auth_header)
+    # Same points with float noise and a renamed group: reuses the labels, keeps the new name
+    body["locations"][0]["lat"] += 1e-9
+    body["locations"][0]["group_name"] = "Renamed"
+    second = client.post("/api/delivery/cluster-locations", json=body, headers=auth_header)
+
+    assert first.status_code == second.status_code == 200
+    assert len(fits) == 1
+    assert second.get_json()["clusters"][0]["groups"][0]["group_name"] == "Renamed"
+    assert first.get_json()["statistics"] == second.get_json()["statistics"]
+
+    # Different parameters are a different key
+    body["max_distance_km"] = 0.5
+    client.post("/api/delivery/cluster-locations", json=body, headers=auth_header)
+    assert len(fits) == 2
+
+    health = client.get("/api/delivery/health").get_json()["cluster_cache"]
+    assert (health["hits"], health["misses"], health["size"]) == (1, 2, 2)
+
+
+
+# ------------------- ROUTE OPTIMIZATION -------------------
+
+
+RESTAURANT = {"lat": 35.7796, "lng": -78.6382}
+
+
+def _stop(stop_id, km_east, deadline=None):
+    """Drop-off km_east kilometres east (negative: west) of RESTAURANT"""
+    from math import cos, radians
+
+    lng = RESTAURANT["lng"] + km_east / (111.195 * cos(radians(RESTAURANT["lat"])))
+    return {"stop_id": stop_id, "lat": RESTAURANT["lat"], "lng": lng, "group_id": 1, "deadline": deadline}
+
+
+@pytest.fixture
+def route_plans():
+    """The endpoint's warm-start plan cache, emptied around each test."""
+    from routes.delivery import route_plans as plans
+
+    plans.clear()
+    yield plans
+    plans.clear()
+
+
+def test_route_visits_stops_in_distance_order():
+    from ai_optimization.routing import RouteOptimizer
+
+    predictor = ETAPredictor()
+    stops = [_stop("c", 3.0), _stop("a", 1.0), _stop("d", 4.0), _stop("b", 2.0)]
+    plan = RouteOptimizer(predictor, time_limit_ms=200).optimize(RESTAURANT, stops)
+
+    route = plan["routes"][0]["stops"]
+    assert [s["stop_id"] for s in route] == ["a", "b", "c", "d"]
+    assert plan["total_km"] == pytest.approx(4.0, abs=0.02)
+    assert [s["cumulative_km"] for s in route] == pytest.approx([1.0, 2.0, 3.0, 4.0], abs=0.02)
+    assert plan["late_stops"] == 0
+    # Per-stop ETAs are the solver's arrival times: prep, then travel and a hand-off per stop
+    prep, travel, stop, _ = predictor.predict_components(np.array([1.0, 2.0, 3.0, 4.0]), time_of_day=True)
+    expected = prep + travel + stop * np.arange(1, 5)
+    assert [s["arrival_minutes"] for s in route] == pytest.approx(expected, abs=0.1)
+    assert [s["eta"]["total_minutes"] for s in route] == [int(a) for a in expected]
+
+
+def test_route_meets_deadlines_before_distance():
+    from ai_optimization.routing import RouteOptimizer
+
+    now = datetime.now(timezone.utc)
+    stops = [_stop("near", -1.0), _stop("urgent", 5.0, deadline=now + timedelta(minutes=30))]
+    plan = RouteOptimizer(time_limit_ms=200).optimize(RESTAURANT, stops, when=now)
+
+    route = plan["routes"][0]["stops"]
+    assert [s["stop_id"] for s in route] == ["urgent", "near"]
+    assert route[0]["on_time"] is True
+    # The reported ETA is the arrival the deadline was checked against
+    assert datetime.fromisoformat(route[0]["eta"]["eta"]) <= stops[1]["deadline"]
+
+    # Impossible deadlines still produce a route, with the late stop flagged
+    stops = [_stop("late", 8.0, deadline=now + timedelta(minutes=5))]
+    plan = RouteOptimizer(time_limit_ms=200).optimize(RESTAURANT, stops, when=now)
+    assert plan["late_stops"] == 1
+    assert plan["routes"][0]["stops"][0]["on_time"] is False
+
+
+def test_route_warm_start_from_previous_plan():
+    from ai_optimization.routing import RouteOptimizer
+
+    optimizer = RouteOptimizer(time_limit_ms=200)
+    first = optimizer.optimize(RESTAURANT, [_stop(i, i + 1.0) for i in range(6)])
+    assert first["warm_started"] is False
+
+    # One stop gone, one new: the old order seeds the solve and every stop is visited once
+    stops = [_stop(i, i + 1.0) for i in range(1, 6)] + [_stop("new", 2.5)]
+    second = optimizer.optimize(RESTAURANT, stops, previous=first)
+    assert second["warm_started"] is True
+    assert [s["stop_id"] for s in second["routes"][0]["stops"]] == [1, "new", 2, 3, 4, 5]
+
+    with pytest.raises(ValueError):
+        optimizer.optimize(RESTAURANT, [_stop(1, 1.0), _stop(1, 2.0)])
+
+
+def test_optimize_route_endpoint(client, auth_header, route_plans):
+    from models import GroupMember
+
+    group = _located_group("Pizza Lovers", 35.7806, -78.6392)
+    db.session.add(GroupMember(group_id=group.id, username="deliveryuser"))
+    db.session.add(GroupMember(group_id=group.id, username="nolocation"))
+    fallback = _located_group("Taco Tuesday", 35.7900, -78.6400, organizer="deliveryuser")
+    client.put(
+        "/api/discovery/update-location",
+        json={"latitude": 35.7700, "longitude": -78.6300},
+        headers=auth_header,
+    )
+    db.session.commit()
+
+    body = {"restaurant": RESTAURANT, "group_ids": [group.id, fallback.id]}
+    res = client.post("/api/delivery/optimize-route", json=body, headers=auth_header)
+    assert res.status_code == 200, res.get_json()
+    plan = res.get_json()
+    # Located members get their own stop; a group without any uses its own location
+    stops = plan["routes"][0]["stops"]
+    assert sorted(s["stop_id"] for s in stops) == sorted([f"{fallback.id}-1", f"{group.id}-1"])
+    assert plan["warm_started"] is False
+    # Order and timing only: nothing that names or locates a member
+    assert all(set(s) == {"stop_id", "group_id", "sequence", "arrival_minutes", "on_time", "eta"}
+               for s in stops)
+    assert "deliveryuser" not in res.get_data(as_text=True)
+
+    res = client.post("/api/delivery/optimize-route", json=body, headers=auth_header)
+    assert res.get_json()["warm_started"] is True
+
+    for bad in ({"group_ids": [group.id]}, {"restaurant": RESTAURANT, "group_ids": []},
+                {**body, "time_limit_ms": 60_000}, {**body, "num_vehicles": 0},
+                {"restaurant": RESTAURANT, "group_ids": list(range(1, 100))}):
+        res = client.post("/api/delivery/optimize-route", json=bad, headers=auth_header)
+        assert res.status_code == 400, bad
+
+
+def test_optimize_route_requires_membership(client, auth_header, route_plans):
+    mine = _located_group("Mine", 35.7806, -78.6392, organizer="deliveryuser")
+    other = _located_group("Not Mine", 35.7900, -78.6400)
+    db.session.commit()
+
+    for group_ids in ([other.id], [mine.id, other.id], [mine.id, 999999]):
+        res = client.post("/api/delivery/optimize-route",
+                          json={"restaurant": RESTAURANT, "group_ids": group_ids}, headers=auth_header)
+        assert res.status_code == 403, group_ids
+    assert len(route_plans) == 0
+
+
+# ------------------- LOCATION SERVICE -------------------
+
+
+class _CountingProvider:
+    """HaversineProvider that records how many distances it computed."""
+
+    symmetric = True
+
+    def __init__(self):
+        from ai_optimization.location_service import HaversineProvider
+
+        self.inner = HaversineProvider()
+        self.computed = 0
+
+    def distances(self, points_a, points_b):
+        result = self.inner.distances(points_a, points_b)
+        self.computed += result.size
+        return result
+
+
+def _tracked_points(service, n, seed=20):
+    rng = np.random.default_rng(seed)
+    keys = [("user", i) for i in range(n)]
+    coords = np.column_stack([35.78 + rng.normal(0, 0.05, n), -78.64 + rng.normal(0, 0.05, n)])
+    for key, (lat, lng) in zip(keys, coords):
+        service.set_point(key, lat, lng)
+    return keys, coords
+
+
+def test_location_service_matrix_is_cached_float32():
+    from ai_optimization.location_service import LocationService
+    from utils.distance import distance_matrix
+
+    provider = _CountingProvider()
+    service = LocationService(provider, initial_capacity=4)
+    keys, coords = _tracked_points(service, 50)
+
+    matrix = service.matrix(keys)
+    assert matrix.dtype == np.float32
+    assert matrix == pytest.approx(distance_matrix(coords, coords), abs=1e-3)
+    computed = provider.computed
+
+    # Sub-blocks and repeats are served from the cache
+    block = service.matrix(keys[:5], keys[40:])
+    assert block == pytest.approx(matrix[:5, 40:])
+    assert provider.computed == computed
+    assert service.stats()["capacity"] == 64
+
+
+def test_location_service_moves_only_recompute_row_and_column():
+    from ai_optimization.location_service import LocationService
+    from utils.distance import distance_matrix
+
+    provider = _CountingProvider()
+    service = LocationService(provider)
+    keys, coords = _tracked_points(service, 40)
+    before = service.matrix(keys)
+    computed = provider.computed
+
+    assert service.set_point(keys[7], *coords[7]) is False
+    assert provider.computed == computed
+
+    coords[7] = (35.90, -78.50)
+    assert service.set_point(keys[7], *coords[7]) is True
+    after = service.matrix(keys)
+    assert provider.computed - computed <= 2 * len(keys)
+    assert after == pytest.approx(distance_matrix(coords, coords), abs=1e-3)
+    untouched = np.ones(len(keys), dtype=bool)
+    untouched[7] = False
+    assert np.array_equal(after[np.ix_(untouched, untouched)], before[np.ix_(untouched, untouched)])
+
+
+def test_location_service_evicts_least_recently_used():
+    from ai_optimization.location_service import LocationService
+
+    service = LocationService(max_points=3, initial_capacity=2)
+    for i in range(3):
+        service.set_point(("group", i), 35.0 + i * 0.01, -78.0)
+    service.matrix([("group", 0)])
+    service.set_point(("group", 3), 35.05, -78.0)
+
+    assert ("group", 1) not in service
+    assert ("group", 0) in service and ("group", 3) in service
+    assert service.stats()["evictions"] == 1
+    assert service.matrix([("group", 0)], [("group", 3)])[0, 0] == pytest.approx(5.56, abs=0.01)
+
+    service.remove_point(("group", 0))
+    with pytest.raises(KeyError):
+        service.matrix([("group", 0)])
+
+
+def test_road_graph_provider_follows_edges():
+    from ai_optimization.location_service import LocationService, RoadGraphProvider
+
+    # Square of roads with the direct diagonal missing; one-way from 0 to 1
+    nodes = [(35.0, -78.0), (35.0, -77.99), (35.01, -77.99), (35.01, -78.0)]
+    edges = [(0, 1, 1.0), (1, 2, 1.0), (2, 3, 1.0), (3, 0, 1.0)]
+    service = LocationService(RoadGraphProvider(nodes, edges, directed=True))
+    service.set_point("a", *nodes[0])
+    service.set_point("c", *nodes[2])
+    matrix = service.matrix(["a", "c"])
+    assert matrix[0, 1] == pytest.approx(2.0)
+    assert matrix[1, 0] == pytest.approx(2.0)
+
+    partial = edges[:2]
+    assert RoadGraphProvider(nodes, partial).distances([nodes[2]], [nodes[0]])[0, 0] == pytest.approx(2.0)
+    one_way = RoadGraphProvider(nodes, partial, directed=True)
+    assert np.isinf(one_way.distances([nodes[2]], [nodes[0]])[0, 0])
+
+
+def test_location_service_track_keeps_the_whole_batch():
+    from ai_optimization.location_service import LocationService
+
+    service = LocationService(max_points=3, initial_capacity=3)
+    service.set_point("old", 0.0, 0.0)
+    matrix = service.track([("a", 0.0, 0.0), ("b", 0.0, 0.01), ("c", 0.0, 0.02)])
+    # "old" is evicted to make room; the batch itself never is
+    assert "old" not in service and all(key in service for key in "abc")
+    assert matrix[0, 2] == pytest.approx(2.22, abs=0.01)
+
+    with pytest.raises(ValueError):
+        service.track([(i, 0.0, 0.0) for i in range(4)])
+
+
+def test_user_location_update_moves_tracked_point(client, auth_header, route_plans):
+    from models import GroupMember, User
+    from routes.delivery import location_service
+
+    location_service.clear()
+    group = _located_group("Pizza Lovers", 35.7806, -78.6392)
+    db.session.add(GroupMember(group_id=group.id, username="deliveryuser"))
+    db.session.commit()
+    client.put("/api/discovery/update-location", json={"latitude": 35.77, "longitude": -78.63},
+               headers=auth_header)
+    client.post("/api/delivery/optimize-route", json={"restaurant": RESTAURANT, "group_ids": [group.id]},
+                headers=auth_header)
+
+    key = ("user", User.query.filter_by(username="deliveryuser").one().id)
+    assert location_service.point(key) == (35.77, -78.63)
+    client.put("/api/discovery/update-location", json={"latitude": 35.80, "longitude": -78.60},
+               headers=auth_header)
+    assert location_service.point(key) == (35.80, -78.60)
+    location_service.clear()
@@ -0,0 +1,194 @@
+"""
+Discovery Test Suite
+--------------------
+Covers proximity-based pool search:
+✅ Vectorized haversine distances
+✅ Grid-cell spatial index
+✅ Nearby pools filtering and ordering
+"""
+
+import pytest
+from datetime import datetime, timedelta, timezone
+from models import Group, GroupMember
+from extensions import db
+from utils.distance import calculate_distance, distances_from, distance_matrix
+from utils.spatial_index import GridCellIndex
+
+
+@pytest.fixture
+def auth_header(client):
+    """Register + login to get JWT token header for discovery tests."""
+    client.post(
+        "/api/auth/register",
+        json={
+            "username": "discoveryuser",
+            "email": "discovery@example.com",
+            "password": "testpass",
+        },
+    )
+    login_resp = client.post(
+        "/api/auth/login", json={"username": "discoveryuser", "password": "testpass"}
+    )
+    token = login_resp.get_json().get("token")
+    return {"Authorization": f"Bearer {token}"}
+
+
+def make_group(name, lat, lon, visibility="public", hours=1):
+    group = Group(
+        name=name,
+        organizer="someone",
+        delivery_type="Delivery",
+        delivery_location="Somewhere",
+        next_order_time=datetime.now(timezone.utc) + timedelta(hours=hours),
+        visibility=visibility,
+        latitude=lat,
+        longitude=lon,
+    )
+    db.session.add(group)
+    db.session.flush()
+    db.session.add(GroupMember(group_id=group.id, username="someone"))
+    return group
+
+
+# ------------------- DISTANCES -------------------
+
+
+def test_calculate_distance_scalar():
+    # Raleigh -> Durham, roughly 33 km
+    assert calculate_distance(35.7796, -78.6382, 35.9940, -78.8986) == pytest.approx(33.2, abs=0.5)
+    assert calculate_distance(35.0, -78.0, 35.0, -78.0) == 0.0
+
+
+def test_distances_from_matches_scalar():
+    lats = [35.7796, 35.9940, 36.0726]
+    lons = [-78.6382, -78.8986, -79.7920]
+    distances = distances_from(35.7796, -78.6382, lats, lons)
+    assert distances.dtype.name == "float64"
+    for d, la, lo in zip(distances, lats, lons):
+        assert round(float(d), 2) == calculate_distance(35.7796, -78.6382, la, lo)
+
+
+def test_distance_matrix_shape_and_symmetry():
+    points = [(35.7796, -78.6382), (35.9940, -78.8986), (36.0726, -79.7920)]
+    matrix = distance_matrix(points, points)
+    assert matrix.shape == (3, 3)
+    assert matrix.diagonal() == pytest.approx([0, 0, 0])
+    assert matrix == pytest.approx(matrix.T)
+    assert distance_matrix(points[:1], points).shape == (1, 3)
+
+
+# ------------------- SPATIAL INDEX -------------------
+
+
+def test_group_geo_cell_tracks_location(client):
+    group = make_group("Cell Pool", 35.7796, -78.6382)
+    index = GridCellIndex()
+    assert group.geo_cell == index.cell_for(35.7796, -78.6382)
+
+    group.longitude = -80.0
+    assert group.geo_cell == index.cell_for(35.7796, -80.0)
+
+    group.latitude = None
+    assert group.geo_cell is None
+
+
+def test_groups_without_geo_cell_are_found_and_backfilled(client, auth_header):
+    from sqlalchemy import update
+    from models import backfill_geo_cells
+
+    legacy = make_group("Legacy Pool", 35.7800, -78.6390)
+    make_group("Far Legacy Pool", 36.0726, -79.7920)
+    db.session.commit()
+    # Rows from before the column existed, or written by bulk statements
+    db.session.execute(update(Group).values(geo_cell=None))
+    db.session.commit()
+
+    params = {"lat": 35.7796, "lon": -78.6382, "radius": 5}
+    res = client.get("/api/discovery/nearby-pools", query_string=params, headers=auth_header)
+    assert [p["name"] for p in res.get_json()] == ["Legacy Pool"]
+
+    assert backfill_geo_cells(batch_size=1) == 2
+    db.session.expire_all()
+    assert legacy.geo_cell == GridCellIndex().cell_for(35.7800, -78.6390)
+    res = client.get("/api/discovery/nearby-pools", query_string=params, headers=auth_header)
+    assert [p["name"] for p in res.get_json()] == ["Legacy Pool"]
+
+    result = client.application.test_cli_runner().invoke(args=["backfill-geo-cells"])
+    assert "0 group(s) updated" in result.output
+
+
+def test_cells_within_covers_search_circle():
+    index = GridCellIndex(cell_size_deg=0.05)
+    cells = index.cells_within(35.7796, -78.6382, 5.0)
+    # A point 4.9 km due north must fall in one of the candidate cells
+    assert index.cell_for(35.7796 + 4.9 / 111.195, -78.6382) in cells
+    assert index.cell_for(35.7796, -78.6382) in cells
+
+
+def test_bounding_box_wraps_antimeridian():
+    index = GridCellIndex(cell_size_deg=0.05)
+    min_lat, max_lat, min_lon, max_lon = index.bounding_box(0.0, 179.99, 5.0)
+    assert min_lon > max_lon
+    cells = index.cells_within(0.0, 179.99, 5.0)
+    assert index.cell_for(0.0, -179.99) in cells
+
+
+def test_huge_radius_falls_back_to_bounding_box():
+    index = GridCellIndex(cell_size_deg=0.05)
+    assert index.cells_within(35.0, -78.0, 500.0) is None
+
+
+# ------------------- NEARBY POOLS -------------------
+
+
+def test_nearby_pools_requires_location(client, auth_header):
+    res = client.get("/api/discovery/nearby-pools", headers=auth_header)
+    assert res.status_code == 400
+
+
+def test_nearby_pools_filters_by_radius(client, auth_header):
+    make_group("Close Pool", 35.7800, -78.6390)
+    make_group("Walkable Pool", 35.7900, -78.6382)
+    make_group("Far Pool", 36.0726, -79.7920)
+    make_group("Private Pool", 35.7797, -78.6383, visibility="private")
+    make_group("Expired Pool", 35.7797, -78.6383, hours=-1)
+    make_group("Unlocated Pool", None, None)
+    db.session.commit()
+
+    res = client.get(
+        "/api/discovery/nearby-pools",
+        query_string={"lat": 35.7796, "lon": -78.6382, "radius": 5},
+        headers=auth_header,
+    )
+    assert res.status_code == 200
+    data = res.get_json()
+    assert [p["name"] for p in data] == ["Close Pool", "Walkable Pool"]
+    assert data[0]["distance_km"] <= data[1]["distance_km"]
+    assert data[0]["is_member"] is False
+
+
+def test_nearby_pools_query_count_is_constant(client, auth_header, count_queries):
+    make_group("Pool 0", 35.7800, -78.6390)
+    db.session.commit()
+    with count_queries() as few:
+        client.get(
+            "/api/discovery/nearby-pools",
+            query_string={"lat": 35.7796, "lon": -78.6382, "radius": 5},
+            headers=auth_header,
+        )
+
+    for i in range(1, 6):
+        group = make_group(f"Pool {i}", 35.7800 + i * 0.001, -78.6390)
+        db.session.add(GroupMember(group_id=group.id, username="discoveryuser"))
+    db.session.commit()
+    with count_queries() as many:
+        res = client.get(
+            "/api/discovery/nearby-pools",
+            query_string={"lat": 35.7796, "lon": -78.6382, "radius": 5},
+            headers=auth_header,
+        )
+
+    data = res.get_json()
+    assert len(data) == 6
+    assert sum(p["is_member"] for p in data) == 5
+    assert len(many) == len(few)
@@ -176,3 +176,128 @@ def test_vote_on_poll(client):
     if response.status_code == 200:
         data = response.get_json()
         assert "id" in data
+
+
+# ------------------- QUERY COUNTS -------------------
+
+
+def _add_groups(count, member="groupuser"):
+    from models import Group, GroupMember
+    from extensions import db
+
+    for i in range(count):
+        group = Group(
+            name=f"Bulk Group {i}",
+            organizer=member,
+            delivery_type="pickup",
+            delivery_location="Library",
+            next_order_time=datetime.now(UTC) + timedelta(hours=1),
+        )
+        db.session.add(group)
+        db.session.flush()
+        db.session.add(GroupMember(group_id=group.id, username=member))
+        db.session.add(GroupMember(group_id=group.id, username=f"friend{i}"))
+    db.session.commit()
+
+
+def test_list_groups_query_count_is_constant(client, count_queries):
+    """GET /groups must not issue one members query per group."""
+    _add_groups(1)
+    with count_queries() as few:
+        assert client.get("/api/groups").status_code == 200
+
+    _add_groups(5)
+    with count_queries() as many:
+        response = client.get("/api/groups")
+    assert response.status_code == 200
+    assert len(response.get_json()) == 6
+    assert len(many) == len(few)
+
+
+def test_my_groups_query_count_is_constant(client, auth_header, count_queries):
+    """GET /groups/my-groups must not issue one members query per group."""
+    _add_groups(1)
+    with count_queries() as few:
+        assert client.get("/api/groups/my-groups", headers=auth_header).status_code == 200
+
+    _add_groups(5)
+    with count_queries() as many:
+        response = client.get("/api/groups/my-groups", headers=auth_header)
+    assert response.status_code == 200
+    assert len(response.get_json()) == 6
+    assert all(len(g["members"]) == 2 for g in response.get_json())
+    assert len(many) == len(few)
+
+
+# ------------------- PAGINATION -------------------
+
+
+def test_groups_keyset_pagination(client):
+    """Walk GET /groups page by page via X-Next-Cursor."""
+    _add_groups(5)
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/groups", query_string=params)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page) <= 2
+        seen.extend(g["id"] for g in page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert len(seen) == 5
+    assert seen == sorted(seen, reverse=True)
+
+
+def test_groups_default_page_size(client, monkeypatch):
+    """Without limit/cursor GET /groups still returns one bounded page."""
+    import utils.pagination
+
+    monkeypatch.setattr(utils.pagination, "DEFAULT_PAGE_SIZE", 3)
+    _add_groups(5)
+    response = client.get("/api/groups")
+    assert response.status_code == 200
+    assert len(response.get_json()) == 3
+    rest = client.get("/api/groups", query_string={"cursor": response.headers["X-Next-Cursor"]})
+    assert len(rest.get_json()) == 2
+    assert "X-Next-Cursor" not in rest.headers
+
+
+def test_groups_invalid_cursor(client):
+    response = client.get("/api/groups", query_string={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_groups_status_filter_and_projection(client, count_queries):
+    from models import Group
+    from extensions import db
+
+    _add_groups(2)
+    expired = Group(
+        name="Expired Group",
+        organizer="groupuser",
+        delivery_type="pickup",
+        delivery_location="Library",
+        visibility="private",
+        next_order_time=datetime.now(UTC) - timedelta(hours=1),
+    )
+    db.session.add(expired)
+    db.session.commit()
+
+    response = client.get("/api/groups", query_string={"status": "expired"})
+    assert [g["name"] for g in response.get_json()] == ["Expired Group"]
+
+    response = client.get("/api/groups", query_string={"status": "active", "visibility": "public"})
+    assert len(response.get_json()) == 2
+
+    with count_queries() as statements:
+        response = client.get("/api/groups", query_string={"fields": "id,name"})
+    assert all(set(g) == {"id", "name"} for g in response.get_json())
+    assert not any("group_members" in s for s in statements)
+
+    response = client.get("/api/groups", query_string={"fields": "id,bogus"})
+    assert response.status_code == 400
@@ -188,3 +188,201 @@ def test_redeem_points_minimum(client, user_token):
                       json={"points_to_use": 50},
                       headers=user_token)
     assert res.status_code == 400
+
+
+# -----------------------------------------------------------
+# LOYALTY BALANCE SNAPSHOTS
+# -----------------------------------------------------------
+
+def _ledger_users(count, entries, age=timedelta(hours=1)):
+    """Users whose loyalty_points match `entries` ledger rows of +10 points each"""
+    from extensions import db
+    from models import LoyaltyLedger, User
+
+    created_at = datetime.utcnow() - age
+    users = []
+    for i in range(count):
+        user = User(f"ledger{i}", f"ledger{i}@example.com", "pass123")
+        user.loyalty_points = 10 * entries
+        db.session.add(user)
+        db.session.flush()
+        db.session.add_all(
+            LoyaltyLedger(user_id=user.id, type="earn", points=10, created_at=created_at)
+            for _ in range(entries)
+        )
+        users.append(user)
+    db.session.commit()
+    return users
+
+
+def test_loyalty_snapshot_plus_tail(client):
+    from extensions import db
+    from models import LoyaltyLedger, LoyaltySnapshot, ledger_balance, take_loyalty_snapshots
+
+    user, idle = _ledger_users(2, entries=3)
+    result = client.application.test_cli_runner().invoke(
+        args=["snapshot-loyalty-balances", "--batch-size", "1"]
+    )
+    assert "Wrote 2 loyalty balance snapshot(s)" in result.output
+    # Nothing new since: no further snapshots
+    assert take_loyalty_snapshots() == 0
+
+    db.session.add(LoyaltyLedger(user_id=user.id, type="redeem", points=-5,
+                                 created_at=datetime.utcnow() - timedelta(hours=1)))
+    # Too recent to snapshot yet, but still counted by the audit
+    db.session.add(LoyaltyLedger(user_id=user.id, type="earn", points=7))
+    db.session.commit()
+    assert ledger_balance(user.id) == 32
+    assert take_loyalty_snapshots() == 1
+
+    latest = LoyaltySnapshot.query.filter_by(user_id=user.id).order_by(LoyaltySnapshot.id.desc()).first()
+    assert latest.balance == 25
+    assert ledger_balance(user.id) == 32
+    assert ledger_balance(idle.id) == 30
+
+
+def test_verify_loyalty_balances_reports_drift(client):
+    from extensions import db
+    from models import take_loyalty_snapshots, verify_loyalty_balances
+
+    users = _ledger_users(5, entries=2)
+    take_loyalty_snapshots(batch_size=2)
+    users[3].loyalty_points += 50
+    db.session.commit()
+
+    assert list(verify_loyalty_balances(batch_size=2)) == [(users[3].id, 70, 20)]
+
+    runner = client.application.test_cli_runner()
+    result = runner.invoke(args=["verify-loyalty-balances", "--batch-size", "2"])
+    assert result.exit_code == 1
+    assert f"user {users[3].id}: stored 70, ledger 20 (drift +50)" in result.output
+    assert "1 user(s) drifted" in result.output
+
+    users[3].loyalty_points = 20
+    db.session.commit()
+    result = runner.invoke(args=["verify-loyalty-balances"])
+    assert result.exit_code == 0
+    assert "0 user(s) drifted" in result.output
+
+
+# -----------------------------------------------------------
+# LEDGER HISTORY
+# -----------------------------------------------------------
+
+def _alice_ledger(count):
+    """`count` ledger rows for alice, alternating earn/redeem, one minute apart"""
+    from extensions import db
+    from models import LoyaltyLedger, User
+
+    alice = User.query.filter_by(username="alice").one()
+    start = datetime(2025, 1, 1, 12, 0)
+    db.session.add_all(
+        LoyaltyLedger(user_id=alice.id, type="earn" if i % 2 == 0 else "redeem",
+                      points=i, created_at=start + timedelta(minutes=i))
+        for i in range(count)
+    )
+    db.session.commit()
+    return alice
+
+
+def test_ledger_history_pages_newest_first(client, user_token):
+    _alice_ledger(25)
+
+    points, cursor = [], None
+    while True:
+        params = {"limit": 10, **({"cursor": cursor} if cursor else {})}
+        res = client.get("/api/rewards/ledger", query_string=params, headers=user_token)
+        assert res.status_code == 200
+        points += [e["points"] for e in res.get_json()]
+        cursor = res.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert points == list(range(24, -1, -1))
+
+    res = client.get("/api/rewards/ledger", query_string={"type": "redeem", "limit": 5},
+                     headers=user_token)
+    assert [e["points"] for e in res.get_json()] == [23, 21, 19, 17, 15]
+    assert all(e["type"] == "redeem" for e in res.get_json())
+
+    assert client.get("/api/rewards/ledger", query_string={"type": "refund"},
+                      headers=user_token).status_code == 400
+    assert client.get("/api/rewards/ledger", query_string={"cursor": "nope"},
+                      headers=user_token).status_code == 400
+
+
+def test_rewards_summary_hides_expired_coupons(client, user_token):
+    from extensions import db
+    from models import Coupon
+
+    alice = _alice_ledger(25)
+    now = datetime.utcnow()
+    db.session.add_all([
+        Coupon(code="LIVE", user_id=alice.id, type="flat", value=4, expires_at=now + timedelta(days=1)),
+        Coupon(code="OLD", user_id=alice.id, type="flat", value=4, expires_at=now - timedelta(days=1)),
+        Coupon(code="USED", user_id=alice.id, type="flat", value=4, expires_at=now + timedelta(days=1),
+               used=True),
+    ])
+    db.session.commit()
+
+    data = client.get("/api/rewards/summary", headers=user_token).get_json()
+    assert [c["code"] for c in data["coupons"]] == ["LIVE"]
+    assert [e["points"] for e in data["ledger"]] == list(range(24, 4, -1))
+
+    # The summary's cursor continues into the ledger endpoint
+    res = client.get("/api/rewards/ledger", query_string={"cursor": data["ledger_next_cursor"]},
+                     headers=user_token)
+    assert [e["points"] for e in res.get_json()] == [4, 3, 2, 1, 0]
+
+
+# -----------------------------------------------------------
+# EXPIRED COUPONS
+# -----------------------------------------------------------
+
+def _alice_coupons(client):
+    """Two live, five expired and one used-but-expired coupon for alice"""
+    from extensions import db
+    from models import Coupon, User
+
+    client.post("/api/auth/register", json={
+        "username": "alice", "email": "alice@example.com", "password": "pass123"
+    })
+    alice = User.query.filter_by(username="alice").one()
+    now = datetime.utcnow()
+    db.session.add_all(
+        [Coupon(code=f"LIVE{i}", user_id=alice.id, type="flat", value=4,
+                expires_at=now + timedelta(days=1)) for i in range(2)]
+        + [Coupon(code=f"OLD{i}", user_id=alice.id, type="flat", value=4,
+                  expires_at=now - timedelta(days=i + 1)) for i in range(5)]
+        + [Coupon(code="USED", user_id=alice.id, type="flat", value=4,
+                  expires_at=now - timedelta(days=1), used=True)]
+    )
+    db.session.commit()
+    return alice
+
+
+def test_find_active_coupon_checks_owner_and_expiry(client):
+    from models import find_active_coupon
+
+    alice = _alice_coupons(client)
+    assert find_active_coupon(alice.id, "LIVE0").code == "LIVE0"
+    assert find_active_coupon(alice.id, "OLD0") is None
+    assert find_active_coupon(alice.id, "USED") is None
+    assert find_active_coupon(alice.id + 1, "LIVE0") is None
+
+
+def test_archive_expired_coupons_in_batches(client):
+    from models import Coupon, ExpiredCoupon, archive_expired_coupons
+
+    alice = _alice_coupons(client)
+    old_ids = {c.id for c in Coupon.query.filter(Coupon.code.like("OLD%"))}
+
+    assert archive_expired_coupons(batch_size=2) == 5
+    assert sorted(c.code for c in Coupon.query) == ["LIVE0", "LIVE1", "USED"]
+    archived = ExpiredCoupon.query.all()
+    assert {c.id for c in archived} == old_ids
+    assert all(c.user_id == alice.id and c.archived_at for c in archived)
+
+    runner = client.application.test_cli_runner()
+    result = runner.invoke(args=["archive-expired-coupons"])
+    assert result.exit_code == 0
+    assert "Archived 0 expired coupon(s)" in result.output
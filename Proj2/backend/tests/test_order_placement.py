@@ -0,0 +1,354 @@
+"""
+Order Placement Test Suite
+--------------------------
+Covers placing group and immediate orders against a seeded restaurant:
+✅ Batched menu-item pricing and validation
+✅ Bulk line-item inserts
+✅ Single-transaction placement with rollback on failure
+✅ Atomic loyalty balance updates under concurrent payouts
+"""
+
+import pytest
+from datetime import datetime, timedelta, timezone
+from extensions import db
+from models import Group, GroupMember, GroupOrder, GroupOrderItem, LoyaltyLedger, MenuItem, Restaurant, User
+
+
+@pytest.fixture
+def auth_header(client):
+    """Register + login to get JWT token header for order tests."""
+    client.post(
+        "/api/auth/register",
+        json={"username": "orderuser", "email": "order@example.com", "password": "testpass"},
+    )
+    login_resp = client.post(
+        "/api/auth/login", json={"username": "orderuser", "password": "testpass"}
+    )
+    token = login_resp.get_json().get("token")
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def menu(client):
+    """Two restaurants with menu items; returns {name: MenuItem}."""
+    pizza = Restaurant(name="Pizza Palace", reward_multiplier=1.5)
+    burger = Restaurant(name="Burger Barn", reward_multiplier=1.0)
+    db.session.add_all([pizza, burger])
+    db.session.flush()
+    items = {
+        "margherita": MenuItem(restaurant_id=pizza.id, name="Margherita", price=12.50),
+        "pepperoni": MenuItem(restaurant_id=pizza.id, name="Pepperoni", price=15.00),
+        "knots": MenuItem(restaurant_id=pizza.id, name="Garlic Knots", price=0.50),
+        "burger": MenuItem(restaurant_id=burger.id, name="Classic Burger", price=10.00),
+    }
+    db.session.add_all(items.values())
+    db.session.commit()
+    return items
+
+
+@pytest.fixture
+def group_id(client, auth_header, menu):
+    """An active group at the pizza restaurant that orderuser belongs to."""
+    group = Group(
+        name="Pizza Pool",
+        organizer="orderuser",
+        restaurant_id=menu["margherita"].restaurant_id,
+        delivery_type="delivery",
+        delivery_location="Library",
+        next_order_time=datetime.now(timezone.utc) + timedelta(hours=1),
+    )
+    db.session.add(group)
+    db.session.flush()
+    db.session.add(GroupMember(group_id=group.id, username="orderuser"))
+    db.session.commit()
+    return group.id
+
+
+# ------------------- PRICING & ITEMS -------------------
+
+
+def test_order_with_items(client, auth_header, menu, group_id):
+    res = client.post(
+        f"/api/groups/{group_id}/orders",
+        json={"items": [
+            {"menuItemId": menu["margherita"].id, "quantity": 2},
+            {"menuItemId": menu["pepperoni"].id, "specialInstructions": "extra cheese"},
+        ]},
+        headers=auth_header,
+    )
+    assert res.status_code == 201
+    items = res.get_json()["order"]["items"]
+    assert [(i["menuItemId"], i["quantity"]) for i in items] == [
+        (menu["margherita"].id, 2),
+        (menu["pepperoni"].id, 1),
+    ]
+    assert items[1]["specialInstructions"] == "extra cheese"
+    assert db.session.get(Group, group_id).total_cents == 4000
+
+
+def test_order_replaces_previous_items(client, auth_header, menu, group_id):
+    client.post(
+        f"/api/groups/{group_id}/orders/immediate",
+        json={"items": [{"menuItemId": menu["margherita"].id}]},
+        headers=auth_header,
+    )
+    res = client.post(
+        f"/api/groups/{group_id}/orders/immediate",
+        json={"items": [{"menuItemId": menu["pepperoni"].id}]},
+        headers=auth_header,
+    )
+    assert res.status_code == 201
+    assert [i["menuItemId"] for i in res.get_json()["order"]["items"]] == [menu["pepperoni"].id]
+
+
+@pytest.mark.parametrize("path", ["orders", "orders/immediate"])
+def test_unknown_menu_item_is_404_and_writes_nothing(client, auth_header, menu, group_id, path):
+    res = client.post(
+        f"/api/groups/{group_id}/{path}",
+        json={"items": [{"menuItemId": menu["margherita"].id}, {"menuItemId": 999999}]},
+        headers=auth_header,
+    )
+    assert res.status_code == 404
+    assert GroupOrder.query.count() == 0
+    assert GroupOrderItem.query.count() == 0
+
+
+@pytest.mark.parametrize("path", ["orders", "orders/immediate"])
+def test_item_from_other_restaurant_is_rejected(client, auth_header, menu, group_id, path):
+    res = client.post(
+        f"/api/groups/{group_id}/{path}",
+        json={"items": [{"menuItemId": menu["burger"].id}]},
+        headers=auth_header,
+    )
+    assert res.status_code == 400
+    assert GroupOrderItem.query.count() == 0
+
+
+def test_order_query_count_independent_of_line_count(client, auth_header, menu, group_id, count_queries):
+    with count_queries() as few:
+        client.post(
+            f"/api/groups/{group_id}/orders",
+            json={"items": [{"menuItemId": menu["knots"].id}]},
+            headers=auth_header,
+        )
+    lines = [{"menuItemId": menu["knots"].id, "quantity": 1} for _ in range(40)]
+    with count_queries() as many:
+        res = client.post(f"/api/groups/{group_id}/orders", json={"items": lines}, headers=auth_header)
+    assert res.status_code == 201
+    assert len(res.get_json()["order"]["items"]) == 40
+    assert len(many) <= len(few)
+
+
+# ------------------- TRANSACTIONS -------------------
+
+
+@pytest.mark.parametrize("path", ["orders", "orders/immediate"])
+def test_invalid_coupon_rolls_back_whole_order(client, auth_header, menu, group_id, path):
+    user = User.query.filter_by(username="orderuser").first()
+    user.loyalty_points = 1000
+    db.session.commit()
+
+    res = client.post(
+        f"/api/groups/{group_id}/{path}",
+        json={
+            "items": [{"menuItemId": menu["margherita"].id}],
+            "redeemPoints": 300,
+            "coupon_code": "NOPE-123",
+        },
+        headers=auth_header,
+    )
+    assert res.status_code == 400
+    db.session.expire_all()
+    assert GroupOrder.query.count() == 0
+    assert GroupOrderItem.query.count() == 0
+    assert LoyaltyLedger.query.count() == 0
+    assert db.session.get(User, user.id).loyalty_points == 1000
+    assert db.session.get(Group, group_id).total_cents == 0
+
+
+def test_order_commits_once(client, auth_header, menu, group_id):
+    from sqlalchemy import event
+
+    commits = []
+    record = lambda conn: commits.append(conn)  # noqa: E731
+    event.listen(db.engine, "commit", record)
+    try:
+        res = client.post(
+            f"/api/groups/{group_id}/orders",
+            json={"items": [{"menuItemId": menu["margherita"].id}]},
+            headers=auth_header,
+        )
+    finally:
+        event.remove(db.engine, "commit", record)
+    assert res.status_code == 201
+    assert len(commits) == 1
+    assert LoyaltyLedger.query.filter_by(type="earn").count() == 1
+    assert db.session.get(Group, group_id).total_cents == 1250
+
+
+# ------------------- CONCURRENCY -------------------
+
+
+@pytest.mark.parametrize("path", ["orders", "orders/immediate"])
+def test_concurrent_payout_to_orderer_is_not_lost(client, auth_header, menu, group_id, path):
+    from sqlalchemy import event
+
+    user = User.query.filter_by(username="orderuser").first()
+    user.loyalty_points = 1000
+    db.session.commit()
+
+    credited = []
+
+    def other_pool_pays_orderer(conn, cursor, statement, parameters, context, executemany):
+        # Another pool's goal credits the orderer after this order read their balance
+        if statement.startswith("INSERT INTO group_order_items") and not credited:
+            credited.append(statement)
+            cursor.execute(f"UPDATE users SET loyalty_points = loyalty_points + 100 WHERE id = {user.id}")
+
+    event.listen(db.engine, "before_cursor_execute", other_pool_pays_orderer)
+    try:
+        res = client.post(
+            f"/api/groups/{group_id}/{path}",
+            json={"items": [{"menuItemId": menu["margherita"].id}], "redeemPoints": 300},
+            headers=auth_header,
+        )
+    finally:
+        event.remove(db.engine, "before_cursor_execute", other_pool_pays_orderer)
+    assert credited and res.status_code == 201
+    data = res.get_json()
+    expected = 1000 + 100 - 300 + data["earned_points"]
+    assert data["new_balance"] == expected
+    db.session.expire_all()
+    assert db.session.get(User, user.id).loyalty_points == expected
+
+
+
+def test_concurrent_orders_keep_exact_total_and_pay_goal_once(client, menu, group_id):
+    """Hundreds of concurrent orders into one pool: no lost updates, one payout."""
+    from concurrent.futures import ThreadPoolExecutor
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import insert
+
+    if db.engine.dialect.name == "sqlite":
+        pytest.skip("needs a database with concurrent writers")
+
+    threads, orders_per_thread = 10, 20
+    usernames = [f"rush{i}" for i in range(threads)]
+    db.session.execute(insert(User), [
+        {"username": u, "email": f"{u}@example.com", "password": "x", "loyalty_points": 0}
+        for u in usernames
+    ])
+    db.session.execute(insert(GroupMember), [{"group_id": group_id, "username": u} for u in usernames])
+    db.session.commit()
+    headers = [
+        {"Authorization": "Bearer " + create_access_token(
+            identity=str(User.query.filter_by(username=u).first().id),
+            additional_claims={"username": u},
+        )}
+        for u in usernames
+    ]
+
+    app = client.application
+    payload = {"items": [{"menuItemId": menu["knots"].id, "quantity": 2}]}  # $1.00 each
+
+    def place_orders(header):
+        worker = app.test_client()
+        return [
+            worker.post(f"/api/groups/{group_id}/orders/immediate", json=payload, headers=header)
+            for _ in range(orders_per_thread)
+        ]
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = [r for batch in pool.map(place_orders, headers) for r in batch]
+
+    assert [r.status_code for r in results] == [201] * (threads * orders_per_thread)
+    assert sum(r.get_json()["group_goal_achieved"] for r in results) == 1
+
+    db.session.expire_all()
+    group = db.session.get(Group, group_id)
+    assert group.total_cents == threads * orders_per_thread * 100
+    assert group.goal_reach is True
+    # Exactly one bonus per member (10 rushers + orderuser)
+    assert LoyaltyLedger.query.filter_by(type="bonus").count() == threads + 1
+
+
+# ------------------- GROUP GOAL REWARDS -------------------
+
+
+def _add_members(group_id, usernames):
+    from sqlalchemy import insert
+
+    db.session.execute(insert(User), [
+        {"username": u, "email": f"{u}@example.com", "password": "x", "loyalty_points": 0}
+        for u in usernames
+    ])
+    db.session.execute(insert(GroupMember), [{"group_id": group_id, "username": u} for u in usernames])
+    db.session.commit()
+
+
+def test_points_goal_pays_every_member(client, auth_header, menu, group_id):
+    _add_members(group_id, ["ordermate1", "ordermate2"])
+    res = client.post(
+        f"/api/groups/{group_id}/orders",
+        json={"items": [{"menuItemId": menu["pepperoni"].id, "quantity": 4}]},  # $60
+        headers=auth_header,
+    )
+    assert res.status_code == 201
+    assert res.get_json()["group_details"]["type"] == "points"
+    for username in ("ordermate1", "ordermate2"):
+        assert User.query.filter_by(username=username).first().loyalty_points == 100
+    assert LoyaltyLedger.query.filter_by(type="bonus").count() == 3
+
+
+def test_coupon_goal_codes_do_not_collide(client, auth_header, menu, group_id):
+    from models import Coupon
+
+    # A second pool with the same members used to produce the same GROUP10-ORD code
+    other = Group(
+        name="Second Pool",
+        organizer="orderuser",
+        restaurant_id=menu["pepperoni"].restaurant_id,
+        delivery_type="delivery",
+        delivery_location="Library",
+        next_order_time=datetime.now(timezone.utc) + timedelta(hours=1),
+    )
+    db.session.add(other)
+    db.session.flush()
+    db.session.add(GroupMember(group_id=other.id, username="orderuser"))
+    db.session.commit()
+    _add_members(group_id, ["ordermate1", "ordermate2"])
+
+    big_order = {"items": [{"menuItemId": menu["pepperoni"].id, "quantity": 7}]}  # $105
+    for gid in (group_id, other.id):
+        res = client.post(f"/api/groups/{gid}/orders", json=big_order, headers=auth_header)
+        assert res.status_code == 201
+        assert res.get_json()["group_details"]["type"] == "coupon"
+
+    codes = [c.code for c in Coupon.query.all()]
+    assert len(codes) == 4
+    assert len(set(codes)) == 4
+
+
+def test_goal_payout_query_count_independent_of_members(client, auth_header, menu, group_id, count_queries):
+    order = {"items": [{"menuItemId": menu["pepperoni"].id, "quantity": 7}]}
+    with count_queries() as few:
+        client.post(f"/api/groups/{group_id}/orders", json=order, headers=auth_header)
+
+    second = Group(
+        name="Crowded Pool",
+        organizer="orderuser",
+        restaurant_id=menu["pepperoni"].restaurant_id,
+        delivery_type="delivery",
+        delivery_location="Library",
+        max_members=50,
+        next_order_time=datetime.now(timezone.utc) + timedelta(hours=1),
+    )
+    db.session.add(second)
+    db.session.flush()
+    db.session.add(GroupMember(group_id=second.id, username="orderuser"))
+    db.session.commit()
+    _add_members(second.id, [f"crowd{i}" for i in range(30)])
+    with count_queries() as many:
+        res = client.post(f"/api/groups/{second.id}/orders", json=order, headers=auth_header)
+    assert res.get_json()["group_details"]["type"] == "coupon"
+    assert len(many) == len(few)
@@ -27,3 +27,145 @@ def test_vote_on_poll(client):
     if response.status_code == 200:
         data = response.get_json()
         assert "id" in data
+
+
+def _make_group_with_polls(poll_count):
+    from datetime import datetime, timedelta, timezone
+    from extensions import db
+    from models import Group, Poll, PollOption, PollVote
+
+    group = Group(
+        name="Poll Group",
+        organizer="groupuser",
+        delivery_type="pickup",
+        delivery_location="Library",
+        next_order_time=datetime.now(timezone.utc) + timedelta(hours=1),
+    )
+    db.session.add(group)
+    db.session.flush()
+    for i in range(poll_count):
+        poll = Poll(group_id=group.id, question=f"Question {i}?", created_by="groupuser")
+        db.session.add(poll)
+        db.session.flush()
+        options = [PollOption(poll_id=poll.id, text=t) for t in ("Pizza", "Burger")]
+        db.session.add_all(options)
+        db.session.flush()
+        options[0].vote_count, options[1].vote_count = 2, 1
+        db.session.add(PollVote(poll_id=poll.id, option_id=options[0].id, username="a"))
+        db.session.add(PollVote(poll_id=poll.id, option_id=options[0].id, username="b"))
+        db.session.add(PollVote(poll_id=poll.id, option_id=options[1].id, username="c"))
+    db.session.commit()
+    return group.id
+
+
+def test_group_polls_results_shape(client):
+    group_id = _make_group_with_polls(1)
+    response = client.get(f"/api/groups/{group_id}/polls")
+    assert response.status_code == 200
+    poll = response.get_json()[0]
+    assert [(o["text"], o["votes"]) for o in poll["options"]] == [("Pizza", 2), ("Burger", 1)]
+    assert sorted(poll["votedUsers"]) == ["a", "b", "c"]
+
+
+def test_group_polls_query_count_is_constant(client, count_queries):
+    one = _make_group_with_polls(1)
+    many = _make_group_with_polls(5)
+    with count_queries() as few_statements:
+        client.get(f"/api/groups/{one}/polls")
+    with count_queries() as many_statements:
+        response = client.get(f"/api/groups/{many}/polls")
+    assert len(response.get_json()) == 5
+    assert len(many_statements) == len(few_statements)
+
+
+def _option_ids(client, group_id):
+    poll = client.get(f"/api/groups/{group_id}/polls").get_json()[0]
+    return poll["id"], [o["id"] for o in poll["options"]]
+
+
+def test_vote_updates_counters(client):
+    group_id = _make_group_with_polls(1)
+    poll_id, (pizza, burger) = _option_ids(client, group_id)
+
+    res = client.post(f"/api/polls/{poll_id}/vote", json={"username": "d", "option_id": burger})
+    assert [o["votes"] for o in res.get_json()["options"]] == [2, 2]
+
+    # Changing a vote moves the count, re-voting the same option is a no-op
+    res = client.post(f"/api/polls/{poll_id}/vote", json={"username": "a", "option_id": burger})
+    assert [o["votes"] for o in res.get_json()["options"]] == [1, 3]
+    res = client.post(f"/api/polls/{poll_id}/vote", json={"username": "a", "option_id": burger})
+    assert [o["votes"] for o in res.get_json()["options"]] == [1, 3]
+
+
+def test_concurrent_vote_change_counts_once(client):
+    from sqlalchemy import event
+    from extensions import db
+
+    group_id = _make_group_with_polls(1)
+    poll_id, (pizza, burger) = _option_ids(client, group_id)
+
+    raced = []
+
+    def other_request_moves_vote_first(conn, cursor, statement, parameters, context, executemany):
+        # Runs after this request read a's vote (pizza) but before it moves it
+        if statement.startswith("UPDATE poll_votes") and not raced:
+            raced.append(statement)
+            cursor.execute(f"UPDATE poll_votes SET option_id = {burger} WHERE username = 'a'")
+            cursor.execute(f"UPDATE poll_options SET vote_count = vote_count - 1 WHERE id = {pizza}")
+            cursor.execute(f"UPDATE poll_options SET vote_count = vote_count + 1 WHERE id = {burger}")
+
+    event.listen(db.engine, "before_cursor_execute", other_request_moves_vote_first)
+    try:
+        res = client.post(f"/api/polls/{poll_id}/vote", json={"username": "a", "option_id": burger})
+    finally:
+        event.remove(db.engine, "before_cursor_execute", other_request_moves_vote_first)
+    # The retry sees the vote already on burger and leaves the counters alone
+    assert raced and res.status_code == 200
+    assert [o["votes"] for o in res.get_json()["options"]] == [1, 2]
+
+
+def test_vote_change_conflicts_when_vote_disappears(client):
+    from sqlalchemy import event
+    from extensions import db
+
+    group_id = _make_group_with_polls(1)
+    poll_id, (pizza, burger) = _option_ids(client, group_id)
+
+    raced = []
+
+    def other_request_deletes_vote_first(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE poll_votes") and not raced:
+            raced.append(statement)
+            cursor.execute("DELETE FROM poll_votes WHERE username = 'a'")
+            cursor.execute(f"UPDATE poll_options SET vote_count = vote_count - 1 WHERE id = {pizza}")
+
+    event.listen(db.engine, "before_cursor_execute", other_request_deletes_vote_first)
+    try:
+        res = client.post(f"/api/polls/{poll_id}/vote", json={"username": "a", "option_id": burger})
+    finally:
+        event.remove(db.engine, "before_cursor_execute", other_request_deletes_vote_first)
+    assert raced and res.status_code == 409
+
+
+def test_vote_rejects_option_from_other_poll(client):
+    group_id = _make_group_with_polls(2)
+    polls = client.get(f"/api/groups/{group_id}/polls").get_json()
+    foreign_option = polls[1]["options"][0]["id"]
+    res = client.post(f"/api/polls/{polls[0]['id']}/vote", json={"username": "d", "option_id": foreign_option})
+    assert res.status_code == 400
+    after = client.get(f"/api/groups/{group_id}/polls").get_json()
+    assert after == polls
+
+
+def test_recount_poll_votes_command_repairs_drift(client):
+    from extensions import db
+    from models import PollOption
+
+    group_id = _make_group_with_polls(1)
+    PollOption.query.update({PollOption.vote_count: 42})
+    db.session.commit()
+
+    result = client.application.test_cli_runner().invoke(args=["recount-poll-votes"])
+    assert "2 option(s) corrected" in result.output
+    poll = client.get(f"/api/groups/{group_id}/polls").get_json()[0]
+    assert [o["votes"] for o in poll["options"]] == [2, 1]
@@ -5,6 +5,7 @@ Covers user profile management with stats, achievements, and leaderboard:
 ✅ Profile retrieval with stats
 ✅ Profile updates
 ✅ Stats calculation (total orders, pooled orders, score)
+✅ Paginated and incremental order history
 ✅ Validation & Security
 ✅ Authorization checks
 """
@@ -365,4 +366,115 @@ def test_update_profile_with_picture(client, auth_header):
     
     assert response.status_code == 200
     result = response.get_json()
-    assert "profile_picture" in result or "message" in result
\ No newline at end of file
+    assert "profile_picture" in result or "message" in result
+
+def test_profile_stats_query_count_is_constant(client, auth_header, count_queries):
+    """1️⃣6️⃣ Stats cost the same number of queries however many orders exist"""
+    from datetime import datetime, timezone
+
+    def add_orders(start, count, members):
+        for i in range(start, start + count):
+            group = Group(
+                name=f"Stats Group {i}", organizer="otheruser",
+                delivery_type="Delivery", delivery_location="Office",
+                next_order_time=datetime.now(timezone.utc),
+            )
+            db.session.add(group)
+            db.session.flush()
+            db.session.add_all(
+                [GroupMember(group_id=group.id, username=f"member{i}_{m}") for m in range(members)]
+                + [GroupOrder(group_id=group.id, username="profileuser")]
+            )
+        db.session.commit()
+
+    add_orders(0, 1, members=1)
+    with count_queries() as few:
+        client.get("/api/profile/me", headers=auth_header)
+
+    add_orders(1, 10, members=2)
+    with count_queries() as many:
+        response = client.get("/api/profile/me", headers=auth_header)
+    stats = response.get_json()["stats"]
+    assert stats["total_orders"] == 11
+    assert stats["pooled_orders"] == 10
+    assert len(many) == len(few)
+
+
+def _order_history(count, start=None):
+    """Create `count` orders for profileuser, one minute apart, each with an item"""
+    from datetime import datetime, timedelta
+
+    start = start or datetime(2025, 1, 1, 12, 0)
+    for i in range(count):
+        group = Group(
+            name=f"History Group {i}", organizer="otheruser",
+            delivery_type="Delivery", delivery_location="Office",
+            next_order_time=start,
+        )
+        db.session.add(group)
+        db.session.flush()
+        order = GroupOrder(group_id=group.id, username="profileuser", created_at=start + timedelta(minutes=i))
+        db.session.add(order)
+        db.session.flush()
+        db.session.add(GroupOrderItem(order_id=order.id, menu_item_id=i, quantity=1))
+    db.session.commit()
+
+
+def test_past_orders_pagination(client, auth_header, count_queries):
+    """1️⃣7️⃣ Order history pages by cursor, newest first, at a constant query cost"""
+    _order_history(7)
+
+    names, cursor, page_queries = [], None, []
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        with count_queries() as queries:
+            response = client.get("/api/profile/orders", query_string=params, headers=auth_header)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page) <= 3 and all(len(o["items"]) == 1 for o in page)
+        names += [o["groupName"] for o in page]
+        page_queries.append(len(queries))
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert names == [f"History Group {i}" for i in range(6, -1, -1)]
+    assert len(set(page_queries)) == 1
+
+
+    response = client.get("/api/profile/orders", query_string={"cursor": "garbage"}, headers=auth_header)
+    assert response.status_code == 400
+
+
+def test_past_orders_default_page_size(client, auth_header, monkeypatch):
+    """Without limit/cursor the order history still comes back one bounded page at a time"""
+    import utils.pagination
+
+    monkeypatch.setattr(utils.pagination, "DEFAULT_PAGE_SIZE", 4)
+    _order_history(7)
+    response = client.get("/api/profile/orders", headers=auth_header)
+    assert len(response.get_json()) == 4
+    rest = client.get(
+        "/api/profile/orders", query_string={"cursor": response.headers["X-Next-Cursor"]}, headers=auth_header
+    )
+    assert len(rest.get_json()) == 3
+    assert "X-Next-Cursor" not in rest.headers
+
+
+def test_past_orders_since(client, auth_header):
+    """1️⃣8️⃣ since= returns only orders created after the given time"""
+    _order_history(5)
+
+    response = client.get(
+        "/api/profile/orders", query_string={"since": "2025-01-01T12:02:00"}, headers=auth_header
+    )
+    assert [o["groupName"] for o in response.get_json()] == ["History Group 4", "History Group 3"]
+
+    # Aware timestamps are compared in UTC
+    response = client.get(
+        "/api/profile/orders", query_string={"since": "2025-01-01T13:03:00+01:00"}, headers=auth_header
+    )
+    assert [o["groupName"] for o in response.get_json()] == ["History Group 4"]
+
+    response = client.get("/api/profile/orders", query_string={"since": "yesterday"}, headers=auth_header)
+    assert response.status_code == 400
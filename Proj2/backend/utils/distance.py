@@ -1,36 +1,85 @@
 """Distance calculation utilities for proximity-based discovery"""
-from math import radians, sin, cos, sqrt, atan2
+import numpy as np
+
+# Earth's radius in kilometers
+EARTH_RADIUS_KM = 6371.0
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    """
+    Haversine distance on radians; broadcasts over NumPy arrays
+
+    Returns:
+        Distance in kilometers (ndarray or NumPy scalar), unrounded
+    """
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def distances_from(lat, lon, lats, lons):
+    """
+    Calculate distances from one GPS coordinate to many (one-to-many)
+
+    Args:
+        lat, lon: Origin coordinates in degrees
+        lats, lons: Array-likes of target coordinates in degrees
+
+    Returns:
+        ndarray of float64 distances in kilometers, one per target (unrounded)
+    """
+    lats = np.radians(np.ascontiguousarray(lats, dtype=np.float64))
+    lons = np.radians(np.ascontiguousarray(lons, dtype=np.float64))
+    return _haversine(np.radians(lat), np.radians(lon), lats, lons)
+
+
+def distances_between(lats_a, lons_a, lats_b, lons_b):
+    """
+    Calculate element-wise distances between two equal-length coordinate arrays
+
+    Args:
+        lats_a, lons_a: Array-likes of first coordinates in degrees
+        lats_b, lons_b: Array-likes of second coordinates in degrees
+
+    Returns:
+        ndarray of float64 distances in kilometers, one per pair (unrounded)
+    """
+    lats_a = np.radians(np.ascontiguousarray(lats_a, dtype=np.float64))
+    lons_a = np.radians(np.ascontiguousarray(lons_a, dtype=np.float64))
+    lats_b = np.radians(np.ascontiguousarray(lats_b, dtype=np.float64))
+    lons_b = np.radians(np.ascontiguousarray(lons_b, dtype=np.float64))
+    return _haversine(lats_a, lons_a, lats_b, lons_b)
+
+
+def distance_matrix(points_a, points_b):
+    """
+    Calculate pairwise distances between two sets of GPS coordinates (many-to-many)
+
+    Args:
+        points_a: (n, 2) array-like of (lat, lon) in degrees
+        points_b: (m, 2) array-like of (lat, lon) in degrees
+
+    Returns:
+        (n, m) ndarray of float64 distances in kilometers (unrounded)
+    """
+    a = np.radians(np.ascontiguousarray(points_a, dtype=np.float64).reshape(-1, 2))
+    b = np.radians(np.ascontiguousarray(points_b, dtype=np.float64).reshape(-1, 2))
+    return _haversine(a[:, 0:1], a[:, 1:2], b[:, 0], b[:, 1])
 
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     """
     Calculate distance between two GPS coordinates using Haversine formula
-    
+
     Args:
         lat1, lon1: First location coordinates
         lat2, lon2: Second location coordinates
-    
+
     Returns:
-        Distance in kilometers (float)
-    """
-    # Earth's radius in kilometers
-    R = 6371.0
-    
-    # Convert degrees to radians
-    lat1_rad = radians(lat1)
-    lon1_rad = radians(lon1)
-    lat2_rad = radians(lat2)
-    lon2_rad = radians(lon2)
-    
-    # Difference in coordinates
-    dlat = lat2_rad - lat1_rad
-    dlon = lon2_rad - lon1_rad
-    
-    # Haversine formula
-    a = sin(dlat / 2)**2 + cos(lat1_rad) * cos(lat2_rad) * sin(dlon / 2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    
-    # Distance in km
-    distance = R * c
-    
-    return round(distance, 2)
\ No newline at end of file
+        Distance in kilometers (float), rounded to 2 decimals
+    """
+    distance = _haversine(
+        np.radians(lat1), np.radians(lon1), np.radians(lat2), np.radians(lon2)
+    )
+    return round(float(distance), 2)
@@ -0,0 +1,73 @@
+"""Keyset (cursor) pagination helpers for list endpoints"""
+import base64
+from datetime import datetime
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(created_at, row_id):
+    """Build an opaque cursor pointing just past the given row"""
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """
+    Parse a cursor produced by encode_cursor
+
+    Returns:
+        tuple: (created_at, row_id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (UnicodeError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def parse_page_size(value):
+    """Clamp a requested page size to [1, MAX_PAGE_SIZE]"""
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(value), MAX_PAGE_SIZE))
+
+
+def keyset_page(query, created_column, id_column, cursor, limit):
+    """
+    Fetch one page of a query ordered newest-first by (created_at, id)
+
+    Args:
+        query: SQLAlchemy query to paginate
+        created_column, id_column: Columns forming the sort key
+        cursor (str): Cursor from the previous page, or None for the first page
+        limit (int): Page size
+
+    Returns:
+        tuple: (rows, next_cursor); next_cursor is None on the last page
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # Row-value comparison, so the database can seek the composite index
+        # instead of filtering every newer row
+        query = query.filter(tuple_(created_column, id_column) < tuple_(created_at, row_id))
+
+    rows = (
+        query.order_by(created_column.desc(), id_column.desc())
+        .limit(limit + 1)
+        .all()
+    )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(
+            getattr(last, created_column.key), getattr(last, id_column.key)
+        )
+    return rows, next_cursor
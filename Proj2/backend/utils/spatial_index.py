@@ -0,0 +1,121 @@
+"""Spatial indexing helpers for proximity-based discovery"""
+from math import cos, floor, radians
+
+from sqlalchemy import or_
+
+# Mean length of one degree of latitude in kilometers
+KM_PER_DEGREE = 111.195
+
+
+class GridCellIndex:
+    """
+    Buckets GPS coordinates into fixed-size latitude/longitude grid cells.
+
+    Each located row stores the key of the cell it falls in (an indexed
+    column), so a radius search only has to touch the handful of cells that
+    overlap the search circle instead of scanning every row.
+    """
+
+    # Above this many cells an IN (...) list stops paying for itself and the
+    # plain bounding-box predicate is used on its own.
+    max_cells_per_query = 256
+
+    def __init__(self, cell_size_deg=0.05):
+        """
+        Args:
+            cell_size_deg (float): Cell edge length in degrees (0.05 ≈ 5.5 km)
+        """
+        self.cell_size_deg = cell_size_deg
+        self.n_cols = int(round(360.0 / cell_size_deg))
+
+    def _row(self, lat):
+        return int(floor((lat + 90.0) / self.cell_size_deg))
+
+    def _col(self, lon):
+        return int(floor((lon + 180.0) / self.cell_size_deg)) % self.n_cols
+
+    def cell_for(self, lat, lon):
+        """Return the cell key for a coordinate, or None if it is missing"""
+        if lat is None or lon is None:
+            return None
+        return f"{self._row(lat)}:{self._col(lon)}"
+
+    def bounding_box(self, lat, lon, radius_km):
+        """
+        Get the lat/lon box that fully contains a search circle
+
+        Returns:
+            tuple: (min_lat, max_lat, min_lon, max_lon). The longitude bounds
+            are None when the circle covers a pole and every longitude matches.
+            When the box crosses the antimeridian, min_lon > max_lon.
+        """
+        dlat = radius_km / KM_PER_DEGREE
+        min_lat = max(lat - dlat, -90.0)
+        max_lat = min(lat + dlat, 90.0)
+
+        # Use the widest parallel inside the box so the box stays conservative
+        widest_lat = max(abs(min_lat), abs(max_lat))
+        if widest_lat >= 90.0:
+            return min_lat, max_lat, None, None
+        dlon = radius_km / (KM_PER_DEGREE * cos(radians(widest_lat)))
+        if dlon >= 180.0:
+            return min_lat, max_lat, None, None
+
+        min_lon = lon - dlon
+        max_lon = lon + dlon
+        if min_lon < -180.0:
+            min_lon += 360.0
+        if max_lon > 180.0:
+            max_lon -= 360.0
+        return min_lat, max_lat, min_lon, max_lon
+
+    def cells_within(self, lat, lon, radius_km):
+        """
+        List the cell keys overlapping a search circle
+
+        Returns:
+            list: Cell keys, or None if the circle spans too many cells for a
+            key lookup to be worthwhile
+        """
+        min_lat, max_lat, min_lon, max_lon = self.bounding_box(lat, lon, radius_km)
+        rows = range(self._row(min_lat), self._row(max_lat) + 1)
+        if min_lon is None:
+            return None
+
+        first_col, last_col = self._col(min_lon), self._col(max_lon)
+        if first_col <= last_col:
+            cols = list(range(first_col, last_col + 1))
+        else:
+            cols = list(range(first_col, self.n_cols)) + list(range(0, last_col + 1))
+
+        if len(rows) * len(cols) > self.max_cells_per_query:
+            return None
+        return [f"{row}:{col}" for row in rows for col in cols]
+
+    def filter_query(self, query, lat_column, lon_column, cell_column, lat, lon, radius_km):
+        """
+        Narrow a SQLAlchemy query to rows that may lie within radius_km
+
+        The result is a superset of the matches; callers still apply the
+        exact haversine check to the returned rows. Rows whose cell has not
+        been filled in yet (see `flask backfill-geo-cells`) are matched by the
+        bounding box alone.
+        """
+        min_lat, max_lat, min_lon, max_lon = self.bounding_box(lat, lon, radius_km)
+
+        cells = self.cells_within(lat, lon, radius_km)
+        if cells is not None:
+            query = query.filter(or_(cell_column.in_(cells), cell_column.is_(None)))
+
+        query = query.filter(lat_column.between(min_lat, max_lat))
+        if min_lon is not None:
+            if min_lon <= max_lon:
+                query = query.filter(lon_column.between(min_lon, max_lon))
+            else:
+                query = query.filter((lon_column >= min_lon) | (lon_column <= max_lon))
+        return query
+
+
+# Index used by the models and discovery routes. Swapping it out changes the
+# bucketing scheme; existing rows then need their stored cell keys recomputed.
+default_index = GridCellIndex()
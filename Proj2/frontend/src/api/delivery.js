@@ -31,8 +31,32 @@ const deliveryAPI = {
     }
   },
 
+  /**
+   * Predict ETAs for many trips in one request
+   * @param {Array} trips - Array of {distance_km, num_stops, traffic_factor}
+   * @returns {Promise} {results, count, error_count}; results[i] is an ETA
+   *   or {error} for trips that failed validation
+   */
+  predictETABatch: async (trips) => {
+    try {
+      const token = localStorage.getItem('token');
+      const response = await axios.post(
+        `${API_URL}/delivery/predict-eta/batch`,
+        { trips },
+        {
+          headers: { Authorization: `Bearer ${token}` }
+        }
+      );
+      return response.data;
+    } catch (error) {
+      console.error('Error predicting ETAs:', error);
+      throw error;
+    }
+  },
+
   /**
    * Predict ETA with automatic rush hour adjustment
+   * Rush hours are judged in the browser's timezone.
    * @param {number} distanceKm - Distance in kilometers
    * @param {number} numStops - Number of delivery stops
    * @returns {Promise} ETA prediction with rush hour adjustment
@@ -44,7 +68,8 @@ const deliveryAPI = {
         `${API_URL}/delivery/predict-eta-with-rush-hour`,
         {
           distance_km: distanceKm,
-          num_stops: numStops
+          num_stops: numStops,
+          timezone: Intl.DateTimeFormat().resolvedOptions().timeZone
         },
         {
           headers: { Authorization: `Bearer ${token}` }
@@ -87,16 +112,65 @@ const deliveryAPI = {
   /**
    * Find which cluster a specific group belongs to
    * @param {number} groupId - The group to find
-   * @param {Array} allLocations - All available locations
+   * @param {Array} [allLocations] - Locations to cluster; omit to use the
+   *   server's cached clusters of all active groups
    */
   findMyCluster: async (groupId, allLocations) => {
+    try {
+      const token = localStorage.getItem('token');
+      const headers = { Authorization: `Bearer ${token}` };
+      const response = allLocations
+        ? await axios.post(
+            `${API_URL}/delivery/find-my-cluster`,
+            {
+              group_id: groupId,
+              all_locations: allLocations
+            },
+            { headers }
+          )
+        : await axios.get(`${API_URL}/delivery/find-my-cluster/${groupId}`, { headers });
+      return response.data;
+    } catch (error) {
+      console.error('Error finding cluster:', error);
+      throw error;
+    }
+  },
+
+  /**
+   * List active groups with a location, ready to pass to clusterLocations
+   */
+  getActiveGroupsForClustering: async () => {
+    try {
+      const token = localStorage.getItem('token');
+      const response = await axios.get(
+        `${API_URL}/delivery/active-groups-for-clustering`,
+        {
+          headers: { Authorization: `Bearer ${token}` }
+        }
+      );
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching active groups:', error);
+      throw error;
+    }
+  },
+
+  /**
+   * Plan the drop-off order for a pooled delivery run
+   * @param {Object} restaurant - {lat, lng, restaurant_id}
+   * @param {Array} groupIds - Groups whose members are delivered on this run
+   * @param {number} numVehicles - Drivers available
+   * @returns {Promise} {routes, total_km, late_stops, ...}; each stop has an eta
+   */
+  optimizeRoute: async (restaurant, groupIds, numVehicles = 1) => {
     try {
       const token = localStorage.getItem('token');
       const response = await axios.post(
-        `${API_URL}/delivery/find-my-cluster`,
+        `${API_URL}/delivery/optimize-route`,
         {
-          group_id: groupId,
-          all_locations: allLocations
+          restaurant,
+          group_ids: groupIds,
+          num_vehicles: numVehicles
         },
         {
           headers: { Authorization: `Bearer ${token}` }
@@ -104,7 +178,7 @@ const deliveryAPI = {
       );
       return response.data;
     } catch (error) {
-      console.error('Error finding cluster:', error);
+      console.error('Error optimizing route:', error);
       throw error;
     }
   },
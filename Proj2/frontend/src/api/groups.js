@@ -2,12 +2,19 @@ import api from './axios';
 
 /**
  * Fetch all available groups.
- * Used on the "Find Groups" page to list all groups.
+ * Used on the "Find Groups" page to list all groups. GET /groups is paginated,
+ * so this follows the X-Next-Cursor header until the last page.
  * @returns {Promise<Array>} Array of group objects.
  */
 export const getAllGroups = async () => {
-  const response = await api.get('/groups');
-  return response.data;
+  const groups = [];
+  let cursor;
+  do {
+    const response = await api.get('/groups', { params: { limit: 200, cursor } });
+    groups.push(...response.data);
+    cursor = response.headers?.['x-next-cursor'];
+  } while (cursor);
+  return groups;
 };
 
 /**
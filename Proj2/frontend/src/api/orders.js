@@ -44,10 +44,19 @@ export const placeImmediateOrder = async (groupId, items) => {
 };
 
 /**
- * Fetch all past orders of the current user.
+ * Fetch past orders of the current user, newest first.
+ * GET /profile/orders is paginated, so this follows the X-Next-Cursor header
+ * until the last page.
+ * @param {string} [since] - ISO timestamp; only orders created after it are returned.
  * @returns {Promise<Object[]>} - List of past orders for the user.
  */
-export const getPastOrders = async () => {
-  const response = await api.get('/profile/orders');
-  return response.data;
+export const getPastOrders = async (since) => {
+  const orders = [];
+  let cursor;
+  do {
+    const response = await api.get('/profile/orders', { params: { limit: 200, since, cursor } });
+    orders.push(...response.data);
+    cursor = response.headers?.['x-next-cursor'];
+  } while (cursor);
+  return orders;
 };
@@ -76,8 +76,22 @@ describe('orders API', () => {
       api.get.mockResolvedValueOnce({ data: mockData });
 
       const result = await getPastOrders();
-      expect(api.get).toHaveBeenCalledWith('/profile/orders');
+      expect(api.get).toHaveBeenCalledWith('/profile/orders', {
+        params: { limit: 200, since: undefined, cursor: undefined },
+      });
       expect(result).toEqual(mockData);
     });
+
+    it('follows X-Next-Cursor until the last page', async () => {
+      api.get
+        .mockResolvedValueOnce({ data: [{ orderId: 2 }], headers: { 'x-next-cursor': 'abc' } })
+        .mockResolvedValueOnce({ data: [{ orderId: 1 }], headers: {} });
+
+      const result = await getPastOrders('2025-01-01T00:00:00Z');
+      expect(api.get).toHaveBeenLastCalledWith('/profile/orders', {
+        params: { limit: 200, since: '2025-01-01T00:00:00Z', cursor: 'abc' },
+      });
+      expect(result).toEqual([{ orderId: 2 }, { orderId: 1 }]);
+    });
   });
 });
@@ -33,3 +33,8 @@ export const redeemCoupon = async (type, restaurant_id = null) => {
   });
   return res.data;
 };
+
+export const getLedger = async ({ type, cursor, limit } = {}) => {
+  const res = await api.get('/rewards/ledger', { params: { type, cursor, limit } });
+  return { entries: res.data, nextCursor: res.headers['x-next-cursor'] || null };
+};